@@ -0,0 +1,185 @@
+"""
+Benchmarks of loading, CG computation and envelope checks
+
+$ python benchmarks/run_benchmarks.py --output bench.json
+$ python benchmarks/run_benchmarks.py --quick --compare bench.json
+
+Results (seconds per call, best of repeats) are saved as JSON so that runs
+can be compared.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+import numpy as np
+import yaml
+
+BENCHMARKS_PATH = os.path.dirname(os.path.abspath(__file__))
+ROOT_PATH = os.path.dirname(BENCHMARKS_PATH)
+DATA_PATH = os.path.join(ROOT_PATH, "data")
+sys.path.insert(0, ROOT_PATH)
+
+import wnb  # noqa: E402
+from synthetic import synthetic_aircraft, write_synthetic_fleet  # noqa: E402
+
+
+def measure(func, number=None, repeat=5, min_time=0.2):
+    """Best time per call (s) of `func()`, calibrating `number` if None"""
+    if number is None:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time / repeat or number >= 1 << 20:
+                break
+            number *= 2
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def random_values(model, n, seed=0):
+    rng = np.random.default_rng(seed)
+    values = np.tile(model.default_values(), (n, 1))
+    adjustable = model.adjustable
+    values[:, adjustable] = rng.uniform(
+        model.mins[adjustable], model.maxs[adjustable], (n, int(adjustable.sum()))
+    )
+    return values
+
+
+def bench_loading(results, tmp_dir, n_fleet):
+    filename = os.path.join(DATA_PATH, "f-bubk.yml")
+    results["load_aircraft_config"] = measure(lambda: wnb.load_aircraft_config(filename))
+    cache = wnb.ConfigCache(os.path.join(tmp_dir, "cache"))
+    wnb.load_aircraft_config(filename, cache=cache)
+    results["load_aircraft_config_warm_cache"] = measure(
+        lambda: wnb.load_aircraft_config(filename, cache=cache)
+    )
+    cfg = wnb.load_aircraft_config(filename)
+    results["compile_aircraft"] = measure(lambda: wnb.compile_aircraft(cfg))
+
+    index = write_synthetic_fleet(os.path.join(tmp_dir, "fleet"), n_fleet)
+    results["fleet_load_all_cold_%d" % n_fleet] = measure(
+        lambda: wnb.Fleet(index).load_all(), number=1, repeat=3
+    )
+    fleet_cache = wnb.ConfigCache(os.path.join(tmp_dir, "fleet_cache"))
+    wnb.Fleet(index, cache=fleet_cache).load_all()
+    results["fleet_load_all_warm_%d" % n_fleet] = measure(
+        lambda: wnb.Fleet(index, cache=fleet_cache).load_all(), number=1, repeat=3
+    )
+
+
+def bench_single(results):
+    cfg = wnb.load_aircraft_config(os.path.join(DATA_PATH, "f-bubk.yml"))
+    model = wnb.get_aircraft_model(cfg)
+    results["create_loads_list"] = measure(lambda: wnb.create_loads_list(cfg))
+    loads = wnb.create_loads_list(cfg)
+    G = wnb.calculate_cg(cfg, loads)
+    results["calculate_cg"] = measure(lambda: wnb.calculate_cg(cfg, loads))
+    values = model.default_values()
+    results["calculate_cg_model"] = measure(lambda: wnb.calculate_cg(model, values))
+    results["inside_centrogram_points_list"] = measure(
+        lambda: wnb.inside_centrogram(G, cfg.centrogram)
+    )
+    centrogram = wnb.get_centrogram(cfg)
+    results["inside_centrogram_cached"] = measure(
+        lambda: wnb.inside_centrogram(G, centrogram)
+    )
+
+
+def bench_batches(results, sizes, tmp_dir):
+    model = wnb.load_aircraft_model(os.path.join(DATA_PATH, "f-bubk.yml"))
+    big_filename = os.path.join(tmp_dir, "f-synt.yml")
+    with open(big_filename, "w") as file:
+        yaml.safe_dump(synthetic_aircraft(n_loads=50, n_vertices=500), file)
+    big_model = wnb.load_aircraft_model(big_filename)
+    for name, m in [("f-bubk", model), ("synthetic_50_loads_500_vertices", big_model)]:
+        for n in sizes:
+            values = random_values(m, n)
+            repeat = 3 if n >= 100000 else 5
+            results["calculate_cg_batch_%s_%d" % (name, n)] = measure(
+                lambda: wnb.calculate_cg_batch(m, values), repeat=repeat
+            )
+            mass, moment, lever_arm = wnb.calculate_cg_batch(m, values)
+            results["contains_%s_%d" % (name, n)] = measure(
+                lambda: m.centrogram.contains(lever_arm, mass), repeat=repeat
+            )
+            if n <= 100000:
+                results["margin_%s_%d" % (name, n)] = measure(
+                    lambda: m.centrogram.margin(lever_arm, mass), repeat=repeat
+                )
+
+
+def bench_console(results):
+    console = os.path.join(ROOT_PATH, "wnb", "wnb_console.py")
+    results["console_help"] = measure(
+        lambda: subprocess.run(
+            [sys.executable, console, "--help"], check=True, capture_output=True
+        ),
+        number=1,
+        repeat=5,
+    )
+    results["import_wnb"] = measure(
+        lambda: subprocess.run(
+            [sys.executable, "-c", "import wnb"],
+            check=True,
+            capture_output=True,
+            cwd=ROOT_PATH,
+        ),
+        number=1,
+        repeat=5,
+    )
+
+
+@click.command()
+@click.option("--output", default="", help="JSON file to save results to")
+@click.option("--compare", default="", help="JSON file of a previous run")
+@click.option("--quick/--full", default=False, help="Smaller sizes (up to 1e4)")
+def main(output, compare, quick):
+    sizes = [1000, 10000] if quick else [1000, 10000, 100000, 1000000]
+    n_fleet = 20 if quick else 200
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bench_loading(results, tmp_dir, n_fleet)
+        bench_single(results)
+        bench_batches(results, sizes, tmp_dir)
+    bench_console(results)
+
+    previous = {}
+    if compare != "":
+        with open(compare) as file:
+            previous = json.load(file)["results"]
+    for name, value in results.items():
+        line = "%-55s %12.3f us" % (name, value * 1e6)
+        if name in previous:
+            line += "  (x%.2f)" % (value / previous[name])
+        print(line)
+
+    if output != "":
+        run = {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version,
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "quick": quick,
+            "results": results,
+        }
+        with open(output, "w") as file:
+            json.dump(run, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
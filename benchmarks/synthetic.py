@@ -0,0 +1,95 @@
+"""
+Synthetic aircraft configs and fleets for benchmarks
+"""
+
+import math
+import os
+
+import numpy as np
+import yaml
+
+
+def synthetic_aircraft(immat="F-SYNT", n_loads=5, n_vertices=5, seed=0):
+    """Aircraft config data (dict) with `n_loads` loads (the last one being
+    fuel) and an elliptic centrogram with `n_vertices` vertices"""
+    rng = np.random.default_rng(seed)
+    n_vertices = max(n_vertices, 3)
+    angles = np.linspace(0, 2 * math.pi, n_vertices, endpoint=False)
+    centrogram = [
+        {
+            "designation": "Pt%d" % (i + 1),
+            "lever_arm": round(0.9 + 0.08 * math.cos(angle), 6),
+            "mass": round(500 + 250 * math.sin(angle), 3),
+        }
+        for i, angle in enumerate(angles)
+    ]
+    loads = [
+        {
+            "designation": "empty_aircraft",
+            "lever_arm": 0.86,
+            "mass": {"default": 450},
+            "comment": "",
+        }
+    ]
+    for i in range(1, n_loads - 1):
+        loads.append(
+            {
+                "designation": "load_%d" % i,
+                "lever_arm": round(float(rng.uniform(0.8, 1.6)), 3),
+                "mass": {"default": 10, "min": 0, "max": 200.0 / n_loads, "step": 1},
+                "comment": "",
+            }
+        )
+    loads.append(
+        {
+            "designation": "fuel",
+            "lever_arm": 1.07,
+            "liquid": "fuel_100LL",
+            "volume": {"default": 60, "min": 0, "max": 100, "step": 0.1},
+            "comment": "",
+        }
+    )
+    return {
+        "application": "wnb",
+        "usage": "aircraft-wnb-data",
+        "file_format_version": "0.0.1",
+        "weight_and_balance": {"date": "01/01/2020", "version": "1"},
+        "aircraft": {
+            "category": "airplane",
+            "designation": "Synthetic aircraft",
+            "type": "SYNT",
+            "immat": immat,
+            "picture": "",
+            "owner": "Benchmarks",
+            "owner_picture": "",
+            "comment": "",
+        },
+        "constants": {"liquids": {"fuel_100LL": {"density": 0.72}}},
+        "centrogram": centrogram,
+        "loads": loads,
+    }
+
+
+def write_synthetic_fleet(directory, n_aircrafts, n_loads=5, n_vertices=5):
+    """Write an index and `n_aircrafts` aircraft configs, return index path"""
+    os.makedirs(directory, exist_ok=True)
+    names = []
+    for i in range(n_aircrafts):
+        name = "f-s%03d.yml" % i
+        data = synthetic_aircraft(
+            immat="F-S%03d" % i, n_loads=n_loads, n_vertices=n_vertices, seed=i
+        )
+        with open(os.path.join(directory, name), "w") as file:
+            yaml.safe_dump(data, file, sort_keys=False, allow_unicode=True)
+        names.append(name)
+    index = {
+        "application": "wnb",
+        "usage": "aircrafts-index",
+        "file_format_version": "0.0.1",
+        "title": "Synthetic fleet",
+        "aircrafts": names,
+    }
+    filename = os.path.join(directory, "index.yml")
+    with open(filename, "w") as file:
+        yaml.safe_dump(index, file, sort_keys=False)
+    return filename
@@ -0,0 +1,109 @@
+import csv
+import io
+import json
+import os
+
+import numpy as np
+import pytest
+import wnb
+
+
+@pytest.mark.parametrize("filename", ["./data/f-bubk.yml", "./data/f-hppl.yml"])
+def test_calculate_cg_batch_matches_calculate_cg(filename):
+    cfg = wnb.load_aircraft_config(filename)
+    loads = wnb.create_loads_list(cfg)
+    rng = np.random.default_rng(0)
+    n_loads = len(loads)
+    values = np.tile(wnb.loads_to_values(loads), (50, 1))
+    values[1:, 1:] = rng.uniform(0, 100, size=(49, n_loads - 1)).round(1)
+
+    mass, moment, lever_arm = wnb.calculate_cg_batch(cfg, values)
+    assert mass.shape == moment.shape == lever_arm.shape == (50,)
+
+    for i, row in enumerate(values):
+        for j, load in enumerate(loads):
+            if hasattr(load, "mass"):
+                load.mass.current_value = float(row[j])
+            else:
+                load.volume.current_value = float(row[j])
+        G = wnb.calculate_cg(cfg, loads)
+        assert mass[i] == G.mass
+        assert moment[i] == G.moment
+        assert lever_arm[i] == G.lever_arm
+
+
+def test_calculate_cg_batch_wrong_shape():
+    cfg = wnb.load_aircraft_config("./data/f-bubk.yml")
+    with pytest.raises(ValueError):
+        wnb.calculate_cg_batch(cfg, np.zeros((3, 2)))
+
+
+def test_read_evaluate_write_scenarios():
+    fleet = wnb.Fleet("./data/index.yml")
+    models = {}
+    for name in fleet.names:
+        model = fleet.model(name)
+        models[name] = models[model.immat] = model
+
+    csv_input = io.StringIO(
+        "id,aircraft,pilot,passenger,luggage,fuel\n"
+        "1,F-BUBK,,,,\n"
+        "2,F-BUBK,90,60,54,85\n"
+        "3,f-hppl.yml,80,,,\n"
+    )
+    rows = list(wnb.read_scenarios(csv_input, "csv"))
+    results = wnb.evaluate_scenarios(models, rows)
+    assert [result["id"] for result in results] == ["1", "2", "3"]
+    assert results[0]["mass"] == 668.2
+    assert results[0]["inside"] and results[0]["margin"] > 0
+    assert not results[1]["inside"] and results[1]["margin"] < 0
+    assert results[2]["aircraft"] == "F-HPPL"
+
+    (result,) = wnb.evaluate_scenarios(models, [{"aircraft": "F-XXXX"}])
+    assert result["error"] == "unknown aircraft 'F-XXXX'" and result["mass"] is None
+
+    for workers in [None, 2]:
+        output = io.StringIO()
+        writer = wnb.ResultsWriter(output, "jsonl")
+        wnb.process_scenarios(models, iter(rows * 3), writer.write, chunk_size=2, workers=workers)
+        assert writer.count == 9
+        lines = output.getvalue().splitlines()
+        assert [json.loads(line)["id"] for line in lines] == ["1", "2", "3"] * 3
+
+
+def test_scenario_errors(tmp_path):
+    from wnb.wnb_console import run_batch
+
+    model = wnb.load_aircraft_model("./data/f-bubk.yml")
+    models = {"F-BUBK": model, "f-bubk.yml": model}
+    batch = tmp_path / "loads.csv"
+    batch.write_text(
+        "id,aircraft,pilot,fuel\n"
+        "1,F-BUBK,80,\n"
+        "2,F-BUBK,eighty,\n"
+        "3,F-XXXX,80,\n"
+        "4,,80,\n"
+        "5,f-bubk.yml,80,60\n"
+    )
+    for workers in [None, 2]:
+        output = tmp_path / "results.csv"
+        with wnb.HistoryStore(":memory:") as store:
+            # --index: no default aircraft
+            args = [str(batch), str(output), "", "", "lever_arm", workers, 2]
+            charts = str(tmp_path / "charts")
+            n = run_batch(models, None, *args, chart_dir=charts, history=store)
+            assert n == 5
+            assert [record["id"] for record in store.query()] == ["1", "5"]
+        rows = list(csv.DictReader(open(output, newline="")))
+        assert [row["id"] for row in rows] == ["1", "2", "3", "4", "5"]
+        assert [row["error"] for row in rows] == [
+            "",
+            "invalid pilot value 'eighty'",
+            "unknown aircraft 'F-XXXX'",
+            "no aircraft",
+            "",
+        ]
+        assert rows[1]["aircraft"] == "F-BUBK"
+        assert rows[1]["mass"] == rows[1]["inside"] == rows[1]["margin"] == ""
+        assert float(rows[4]["mass"]) < float(rows[0]["mass"])
+    assert sorted(os.listdir(tmp_path / "charts")) == ["1.png", "5.png"]
@@ -0,0 +1,53 @@
+import os
+import shutil
+
+import wnb
+
+
+def test_config_cache(tmp_path, monkeypatch):
+    filename = str(tmp_path / "f-bubk.yml")
+    shutil.copy("./data/f-bubk.yml", filename)
+    cache = wnb.ConfigCache(str(tmp_path / "cache"))
+
+    cfg = wnb.load_aircraft_config(filename, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert len(os.listdir(tmp_path / "cache")) == 1
+
+    def fail(*args, **kwargs):
+        raise AssertionError("YAML should not be parsed on a warm load")
+
+    with monkeypatch.context() as m:
+        m.setattr(wnb.wnb.yaml, "load", fail)
+        warm = wnb.load_aircraft_config(filename, cache=cache)
+        assert wnb.load_config(filename, cache=cache)[0] == "aircraft-wnb-data"
+    assert cache.hits == 2
+    assert warm == cfg
+    assert wnb.get_aircraft_model(warm).immat == "F-BUBK"
+    loads = wnb.create_loads_list(warm)
+    assert wnb.calculate_cg(warm, loads).mass == 668.2
+
+    # content change invalidates the entry
+    with open(filename, "a") as file:
+        file.write("\n# edited\n")
+    wnb.load_aircraft_config(filename, cache=cache)
+    assert cache.misses == 2
+
+
+def test_config_cache_next_to_data(tmp_path):
+    filename = str(tmp_path / "f-hppl.yml")
+    shutil.copy("./data/f-hppl.yml", filename)
+    model = wnb.load_aircraft_model(filename, cache=wnb.ConfigCache())
+    assert model.immat == "F-HPPL"
+    assert os.path.exists(tmp_path / ".wnb_cache" / "f-hppl.yml.pickle")
+
+
+def test_config_cache_unpicklable(tmp_path):
+    filename = str(tmp_path / "f-hppl.yml")
+    shutil.copy("./data/f-hppl.yml", filename)
+    cache = wnb.ConfigCache(str(tmp_path / "cache"))
+    content, stat, digest = wnb.cache.read_source(filename)
+    # best effort: no error, no partial file, a miss on next load
+    cache.put(filename, stat, digest, lambda: None)
+    assert os.listdir(tmp_path / "cache") == []
+    assert cache.get(filename, stat, digest) is None
+    assert cache.misses == 1
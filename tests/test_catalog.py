@@ -0,0 +1,77 @@
+import locale
+import shutil
+
+import wnb
+from wnb import catalog
+
+
+def test_catalog_messages():
+    fr = wnb.get_catalog("fr")
+    assert wnb.get_catalog("fr") is fr
+    assert fr.t("pilot") == "Pilote"
+    assert fr.t("unknown_key") == "unknown_key"
+    assert (
+        fr.t("unknown_xaxis", xaxis="x", allowed_xaxis=["lever_arm"])
+        == "Axe x du centrogramme 'x' inconnu - pas dans ['lever_arm']."
+    )
+    en = wnb.get_catalog("en")
+    assert en.t("luggage") == "Luggage"
+    assert set(fr.messages) == set(en.messages)
+
+
+def test_catalog_fallback_to_default_locale(tmp_path):
+    for name in ["loads.en.yml", "messages.en.yml"]:
+        shutil.copy(catalog.TRANSLATIONS_PATH + "/" + name, tmp_path / name)
+    with open(tmp_path / "loads.de.yml", "w") as file:
+        file.write("---\nde:\n  pilot: Pilot\n  passenger: Passagier\n")
+    de = catalog.compile_catalog("de", path=str(tmp_path))
+    assert de.t("passenger") == "Passagier"
+    assert de.t("fuel") == "Fuel"
+    assert catalog.available_locales(str(tmp_path)) == ["de", "en"]
+
+
+def test_catalog_disk_cache(tmp_path):
+    cache = wnb.ConfigCache(str(tmp_path))
+    fr = catalog.compile_catalog("fr", cache=cache)
+    assert cache.misses == 4  # 2 files per locale (fr + en fallback)
+    assert catalog.compile_catalog("fr", cache=cache).messages == fr.messages
+    assert cache.hits == 4
+
+
+def test_detect_locale(monkeypatch):
+    monkeypatch.setattr(locale, "getlocale", lambda: ("fr_FR", "UTF-8"))
+    assert catalog.detect_locale() == "fr"
+    monkeypatch.setattr(locale, "getlocale", lambda: ("xx_XX", "UTF-8"))
+    assert catalog.detect_locale() == "en"
+
+    monkeypatch.setattr(locale, "getlocale", lambda: (None, None))
+    for name in ["LC_ALL", "LC_MESSAGES", "LANG"]:
+        monkeypatch.delenv(name, raising=False)
+    assert catalog.detect_locale() == "en"
+    monkeypatch.setenv("LANG", "fr_FR.UTF-8")
+    assert catalog.detect_locale() == "fr"
+    monkeypatch.setenv("LANG", "C")
+    assert catalog.detect_locale() == "en"
+
+
+def test_console_catalog_cached(tmp_path, monkeypatch):
+    import yaml
+    from click.testing import CliRunner
+    from wnb.wnb_console import load
+
+    batch = tmp_path / "loads.csv"
+    batch.write_text("id,pilot\n1,80\n")
+    args = ["--config", "./data/f-bubk.yml", "--batch", str(batch)]
+    args += ["--output", str(tmp_path / "results.csv"), "--cache-dir", str(tmp_path / "cache")]
+    catalog._get_catalog.cache_clear()
+    assert CliRunner().invoke(load, args).exit_code == 0
+
+    def fail(*args, **kwargs):
+        raise AssertionError("YAML should not be parsed on a warm run")
+
+    # second run: catalog (and config) compiled files come from the cache
+    catalog._get_catalog.cache_clear()
+    monkeypatch.setattr(yaml, "load", fail)
+    result = CliRunner().invoke(load, args)
+    assert result.exit_code == 0, result.output
+    catalog._get_catalog.cache_clear()
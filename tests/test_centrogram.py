@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+import wnb
+
+
+@pytest.mark.parametrize("filename", ["./data/f-bubk.yml", "./data/f-hppl.yml"])
+@pytest.mark.parametrize("xaxis", ["lever_arm", "moment"])
+def test_centrogram_contains(filename, xaxis):
+    cfg = wnb.load_aircraft_config(filename)
+    centrogram = wnb.get_centrogram(cfg)
+    assert wnb.get_centrogram(cfg) is centrogram
+
+    rng = np.random.default_rng(1)
+    x_pts, y_pts = centrogram.x(xaxis), centrogram.mass
+    x = rng.uniform(x_pts.min() * 0.9, x_pts.max() * 1.1, 500)
+    y = rng.uniform(y_pts.min() * 0.9, y_pts.max() * 1.1, 500)
+    inside = centrogram.contains(x, y, xaxis=xaxis)
+    assert inside.shape == (500,)
+    assert inside.any() and not inside.all()
+
+    vertices = centrogram.vertices(xaxis)
+    for xi, yi, expected in zip(x, y, inside):
+        assert wnb.point_in_polygon(xi, yi, vertices) == expected
+        assert centrogram.contains_point(xi, yi, xaxis=xaxis) == expected
+
+
+def test_point_in_polygon_boundary():
+    square = [(0, 0), (0, 1), (1, 1), (1, 0)]
+    assert wnb.point_in_polygon(0.5, 0.5, square)
+    assert not wnb.point_in_polygon(0, 0.5, square)
+    assert not wnb.point_in_polygon(1, 1, square)
+    assert not wnb.point_in_polygon(1.5, 0.5, square)
+
+
+def test_inside_centrogram_accepts_points_list():
+    cfg = wnb.load_aircraft_config("./data/f-bubk.yml")
+    loads = wnb.create_loads_list(cfg)
+    G = wnb.calculate_cg(cfg, loads)
+    assert wnb.inside_centrogram(G, cfg.centrogram)
+    assert wnb.inside_centrogram(G, wnb.get_centrogram(cfg))
+
+
+@pytest.mark.parametrize("filename", ["./data/f-bubk.yml", "./data/f-hppl.yml"])
+@pytest.mark.parametrize("xaxis", ["lever_arm", "moment"])
+def test_margin_convex_matches_generic(filename, xaxis):
+    centrogram = wnb.get_centrogram(wnb.load_aircraft_config(filename))
+    edges = centrogram.edges(xaxis)
+    assert edges.convex
+    rng = np.random.default_rng(3)
+    x_pts = centrogram.x(xaxis)
+    x = rng.uniform(x_pts.min() * 0.9, x_pts.max() * 1.1, (20, 50))
+    y = rng.uniform(centrogram.mass.min() * 0.9, centrogram.mass.max() * 1.1, (20, 50))
+
+    margin, edge = centrogram.margin_and_edge(x, y, xaxis=xaxis)
+    assert margin.shape == edge.shape == (20, 50)
+    distance, nearest = edges.distance(x, y)
+    inside = centrogram.contains(x, y, xaxis=xaxis)
+    assert np.allclose(margin, np.where(inside, distance, -distance))
+    assert np.array_equal(margin > 0, inside)
+    assert np.array_equal(edge, nearest)
+
+
+def test_margin_non_convex_and_labels():
+    # L-shaped envelope
+    centrogram = wnb.Centrogram(
+        [0.0, 2.0, 2.0, 1.0, 1.0, 0.0], [0.0, 0.0, 1.0, 1.0, 2.0, 2.0]
+    )
+    assert not centrogram.edges().convex
+    assert centrogram.edge_labels() == [
+        "min_mass",
+        "aft",
+        "max_mass",
+        "aft",
+        "max_mass",
+        "forward",
+    ]
+    margin, edge = centrogram.margin_and_edge([0.5, 1.5, 1.5, 0.5], [1.5, 0.5, 1.5, -0.5])
+    # scaled by extent (2, 2)
+    assert margin == pytest.approx([0.25, 0.25, -0.25, -0.25])
+    assert edge[0] in [3, 4, 5] and edge[3] == 0
+
+
+def test_edge_labels_ignore_zero_length_edges():
+    centrogram = wnb.get_centrogram(wnb.load_aircraft_config("./data/f-hppl.yml"))
+    labels = centrogram.edge_labels()
+    assert labels[-1] is None
+    assert set(labels[:-1]) == {"min_mass", "aft", "max_mass", "forward"}
+    margin, edge = centrogram.margin_and_edge(0.2473, 374)
+    assert margin == 0 and edge != len(labels) - 1
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+import wnb
+from wnb import envelopes as envelopes_module
+
+ENVELOPES = """
+envelopes:
+  - name: utility
+    points:
+      - {designation: U1, lever_arm: 0.8, mass: 250}
+      - {designation: U2, lever_arm: 0.8, mass: 580}
+      - {designation: U3, lever_arm: 0.835, mass: 680}
+      - {designation: U4, lever_arm: 0.9, mass: 680}
+      - {designation: U5, lever_arm: 0.9, mass: 250}
+  - name: zero_fuel
+    condition: zero_fuel
+    points:
+      - {designation: Z1, moment: 200, mass: 250}
+      - {designation: Z2, moment: 528, mass: 660}
+      - {designation: Z3, moment: 607.2, mass: 660}
+      - {designation: Z4, moment: 230, mass: 250}
+"""
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    filename = tmp_path / "f-bubk.yml"
+    with open("./data/f-bubk.yml", encoding="utf-8") as file:
+        content = file.read()
+    filename.write_text(content + ENVELOPES, encoding="utf-8")
+    return str(filename)
+
+
+def test_load_envelopes(config_file):
+    cfg = wnb.load_aircraft_config(config_file)
+    model = wnb.get_aircraft_model(cfg)
+    assert model.envelopes.names == ["normal", "utility", "zero_fuel"]
+    assert model.envelopes["zero_fuel"].condition == "zero_fuel"
+    assert model.envelopes["zero_fuel"].centrogram.lever_arm[0] == 0.8
+    assert model.envelopes["normal"].centrogram is model.centrogram
+    # single envelope configs
+    model = wnb.load_aircraft_model("./data/f-bubk.yml")
+    assert model.envelopes.names == ["normal"]
+
+
+def test_inside_envelopes(config_file):
+    cfg = wnb.load_aircraft_config(config_file)
+    loads = wnb.create_loads_list(cfg)
+    assert wnb.inside_envelopes(cfg, loads) == {
+        "normal": True,
+        "utility": False,
+        "zero_fuel": True,
+    }
+    # luggage moves G aft of the zero fuel envelope only without fuel
+    values = wnb.loads_to_values(loads)
+    values[3] = 40
+    assert wnb.inside_envelopes(cfg, values) == {
+        "normal": True,
+        "utility": False,
+        "zero_fuel": False,
+    }
+
+
+def test_evaluate_envelopes_matches_single_checks(config_file, monkeypatch):
+    cfg = wnb.load_aircraft_config(config_file)
+    model = wnb.get_aircraft_model(cfg)
+    rng = np.random.default_rng(0)
+    values = np.tile(model.defaults, (300, 1))
+    values[:, 1:] = rng.uniform(model.mins[1:], model.maxs[1:], (300, len(model) - 1))
+
+    inside = wnb.evaluate_envelopes(model, values)
+    assert set(inside) == {"normal", "utility", "zero_fuel"}
+    for name in inside:
+        assert 0 < inside[name].sum() < 300
+    for k in range(0, 300, 17):
+        assert wnb.inside_envelopes(model, values[k]) == {
+            name: bool(result[k]) for name, result in inside.items()
+        }
+
+    # STRtree path
+    monkeypatch.setattr(envelopes_module, "STRTREE_MIN_ENVELOPES", 1)
+    model.envelopes._trees.clear()
+    for xaxis in ["lever_arm", "moment"]:
+        with_tree = wnb.evaluate_envelopes(model, values, xaxis=xaxis)
+        assert {name: r.tolist() for name, r in with_tree.items()} == {
+            name: r.tolist() for name, r in inside.items()
+        }
+
+
+def test_batch_outside_envelopes(config_file):
+    model = wnb.load_aircraft_model(config_file)
+    rows = [{"id": "1"}, {"id": "2", "luggage": "40"}, {"id": "3", "passenger": "150", "luggage": "54"}]
+    results = wnb.evaluate_scenarios({None: model}, rows)
+    assert [r["outside_envelopes"] for r in results] == [
+        "utility",
+        "utility zero_fuel",
+        "normal utility zero_fuel",
+    ]
+
+
+def test_envelope_errors():
+    centrogram = wnb.get_centrogram(wnb.load_aircraft_config("./data/f-bubk.yml"))
+    with pytest.raises(ValueError):
+        wnb.EnvelopeSet([wnb.Envelope("a", "loaded", centrogram)] * 2)
+    with pytest.raises(NotImplementedError):
+        wnb.EnvelopeSet([wnb.Envelope("a", "landing", centrogram)])
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+import wnb
+
+
+def sample_values(model, free, n, seed=0):
+    rng = np.random.default_rng(seed)
+    values = np.tile(model.default_values(), (n, 1))
+    for j in free:
+        values[:, j] = rng.uniform(model.mins[j], model.maxs[j], n)
+    return values
+
+
+def test_zonotope_vertices():
+    vertices = wnb.feasible.zonotope_vertices([0, 0], [[1, 1], [0, 1]])
+    assert vertices.tolist() == [[0, 0], [1, 1], [1, 2], [0, 1]]
+
+
+@pytest.mark.parametrize("filename", ["./data/f-bubk.yml", "./data/f-hppl.yml"])
+@pytest.mark.parametrize("xaxis", ["lever_arm", "moment"])
+def test_feasible_region_contains_samples(filename, xaxis):
+    model = wnb.load_aircraft_model(filename)
+    region = wnb.feasible_region(model)
+    free = np.flatnonzero(model.adjustable)
+    mass, moment, lever_arm = wnb.calculate_cg_batch(
+        model, sample_values(model, free, 2000)
+    )
+    x = moment if xaxis == "moment" else lever_arm
+
+    reachable = region.reachable(xaxis).buffer(1e-6)
+    assert all(reachable.covers(wnb.feasible.Point(*pt)) for pt in zip(x, mass))
+
+    inside = model.centrogram.contains(x, mass, xaxis=xaxis)
+    assert inside.any() and not inside.all()
+    assert not region.always_legal(xaxis) and not region.never_legal(xaxis)
+    legal = region.legal(xaxis).buffer(1e-6)
+    assert all(legal.covers(wnb.feasible.Point(*pt)) for pt in zip(x[inside], mass[inside]))
+    assert 0 < region.legal_fraction(xaxis) < 1
+    assert region.rings(xaxis)
+
+
+def test_feasible_region_degenerate():
+    model = wnb.load_aircraft_model("./data/f-bubk.yml")
+    region = wnb.feasible_region(model, free=[4])  # fuel only
+    assert region.is_degenerate
+    assert region.reachable().geom_type == "LineString"
+    assert region.always_legal()
+    assert region.legal_fraction() == pytest.approx(1)
+
+    values = model.default_values()
+    values[0] = 100  # too light whatever the luggage
+    values[1] = 0
+    region = wnb.feasible_region(model, values=values, free=[3])
+    assert region.never_legal()
+    assert region.legal_fraction() == 0
+
+    region = wnb.feasible_region(model, free=[])
+    assert region.reachable().geom_type == "Point"
+    assert region.always_legal()
+
+
+@pytest.mark.parametrize("filename", ["./data/f-bubk.yml", "./data/f-hppl.yml"])
+def test_feasible_region_tolerance(filename):
+    model = wnb.load_aircraft_model(filename)
+    coarse = wnb.feasible_region(model, samples_per_edge=2)
+    tolerance = coarse.tolerance()
+    assert coarse.tolerance("moment") == 0
+    assert 0 < wnb.feasible_region(model).tolerance() < tolerance
+    # lever arm boundary sampled densely: within the tolerance of the chords
+    dense = wnb.feasible_region(model, samples_per_edge=1000).vertices()
+    boundary = coarse.reachable().exterior
+    distances = [boundary.distance(wnb.feasible.Point(*pt)) for pt in dense]
+    assert max(distances) <= tolerance * (1 + 1e-6)
+    assert max(distances) == pytest.approx(tolerance, rel=1e-3)
+
+
+@pytest.mark.parametrize("side", ["forward", "aft"])
+def test_feasible_region_near_boundary(side):
+    # one load from (100, 400) to (500, 600) in moment space: lever arm arc
+    # 2 - 700 / mass, aft of its chord (a single one)
+    vertices = wnb.feasible.zonotope_vertices([100, 400], [[400, 200]])
+    model = wnb.compile_aircraft(wnb.load_aircraft_config("./data/f-bubk.yml"))
+    region = wnb.FeasibleRegion(model, vertices, samples_per_edge=1)
+    tolerance = region.tolerance()
+    assert tolerance == pytest.approx(700 * (600**0.5 - 20) ** 2 / 240000)
+
+    def chord(mass):
+        return 0.25 + (mass - 400) * (7 / 12) / 200
+
+    for shift, legal in [(0.5 * tolerance, False), (2 * tolerance, True)]:
+        # centrogram edge parallel to the chord, `shift` aft of it: forward
+        # or aft centrogram
+        if side == "forward":
+            lever_arm = [-1, chord(300) + shift, chord(700) + shift, -1]
+        else:
+            lever_arm = [chord(300) + shift, 5, 5, chord(700) + shift]
+        model.centrogram = wnb.centrogram.Centrogram(lever_arm, [300, 300, 700, 700])
+        region = wnb.FeasibleRegion(model, vertices, samples_per_edge=1)
+        if side == "forward":
+            # the chord is inside, the arc only if the edge is past it
+            assert model.centrogram.polygon().contains(region.reachable())
+            assert region.always_legal() == legal
+        else:
+            # the chord is outside, the arc too only if the edge is past it
+            assert region.legal().is_empty
+            assert region.never_legal() == legal
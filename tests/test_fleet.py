@@ -0,0 +1,41 @@
+import shutil
+
+import pytest
+import wnb
+
+
+def test_fleet_lazy():
+    fleet = wnb.Fleet("./data/index.yml")
+    assert fleet.title == "Aéro-Club du Poitou"
+    assert len(fleet) == 2
+    assert not fleet.is_loaded("f-bubk.yml")
+    cfg = fleet["f-bubk.yml"]
+    assert fleet.is_loaded("f-bubk.yml")
+    assert fleet[0] is cfg
+    assert not fleet.is_loaded("f-hppl.yml")
+    assert fleet.find("F-HPPL").aircraft.designation == "Evektor Sportstar"
+    assert fleet.model(1).immat == "F-HPPL"
+    with pytest.raises(KeyError):
+        fleet["unknown.yml"]
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_fleet_load_all(tmp_path, executor):
+    for name in ["index.yml", "f-bubk.yml", "f-hppl.yml"]:
+        shutil.copy("./data/" + name, tmp_path / name)
+    with open(tmp_path / "index.yml", "a") as file:
+        file.write("- missing.yml\n- broken.yml\n")
+    with open(tmp_path / "broken.yml", "w") as file:
+        file.write("application: wnb\nusage: aircraft-wnb-data\nfile_format_version: 0.0.2\n")
+
+    fleet = wnb.Fleet(str(tmp_path / "index.yml"))
+    calls = []
+    errors = fleet.load_all(
+        max_workers=2, executor=executor, progress=lambda *args: calls.append(args)
+    )
+    assert sorted(errors) == ["broken.yml", "missing.yml"]
+    assert isinstance(errors["missing.yml"], FileNotFoundError)
+    assert len(calls) == 4
+    assert sorted(call[0] for call in calls) == [1, 2, 3, 4]
+    assert fleet.is_loaded("f-bubk.yml") and fleet.is_loaded("f-hppl.yml")
+    assert wnb.get_aircraft_model(fleet["f-hppl.yml"]).immat == "F-HPPL"
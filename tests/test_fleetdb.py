@@ -0,0 +1,124 @@
+import asyncio
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pytest
+import wnb
+from wnb.wnb_service import LoadsheetService, ServiceClient
+
+ENVELOPE = """
+envelopes:
+  - name: zero_fuel
+    condition: zero_fuel
+    points:
+      - {designation: Z1, lever_arm: 0.8, mass: 250}
+      - {designation: Z2, lever_arm: 0.8, mass: 660}
+      - {designation: Z3, lever_arm: 0.92, mass: 660}
+      - {designation: Z4, lever_arm: 0.92, mass: 250}
+"""
+
+
+@pytest.fixture
+def index(tmp_path):
+    for name in ["index.yml", "f-bubk.yml", "f-hppl.yml"]:
+        shutil.copy("./data/" + name, tmp_path / name)
+    with open(tmp_path / "f-bubk.yml", "a") as file:
+        file.write(ENVELOPE)
+    return str(tmp_path / "index.yml")
+
+
+def assert_same_model(model, expected):
+    assert model.immat == expected.immat
+    assert model.designations == expected.designations
+    assert model.liquids == expected.liquids
+    assert np.array_equal(model.table, expected.table)
+    assert np.array_equal(model.kinds, expected.kinds)
+    assert np.array_equal(model.adjustable, expected.adjustable)
+    assert model.envelopes.names == expected.envelopes.names
+    for envelope, other in zip(model.envelopes, expected.envelopes):
+        assert envelope.condition == other.condition
+        assert np.array_equal(envelope.centrogram.moment, other.centrogram.moment)
+
+
+def test_build_and_read(index, tmp_path):
+    filename = str(tmp_path / "fleet.wnbdb")
+    report = wnb.build_fleet_database(index, filename)
+    assert report == {"built": ["f-bubk.yml", "f-hppl.yml"], "reused": [], "errors": {}}
+
+    fleet = wnb.Fleet(index)
+    with wnb.FleetDatabase(filename) as db:
+        assert db.title == fleet.title
+        assert db.names == fleet.names
+        assert db.immats == ["F-BUBK", "F-HPPL"]
+        assert "F-HPPL" in db and db.index("f-hppl.yml") == db.index("F-HPPL") == 1
+        assert db.metadata("F-BUBK")["densities"] == {"fuel_100LL": 0.72}
+        for name in fleet.names:
+            model = db.model(name)
+            assert_same_model(model, fleet.model(name))
+            # views of the mapping, not copies
+            assert not model.table.flags.writeable
+        assert db.model("F-BUBK") is db.model(0)
+        G = wnb.calculate_cg(db.model("F-BUBK"), wnb.create_loads_list(fleet[0]))
+        assert G.mass == 668.2
+        assert wnb.inside_envelopes(db.model("F-BUBK"), db.model(0).default_values())
+
+        copy = pickle.loads(pickle.dumps(db))
+        assert copy.filename == filename
+        assert_same_model(copy.model("F-HPPL"), db.model("F-HPPL"))
+        copy.close()
+
+
+def test_incremental_rebuild(index, tmp_path):
+    filename = str(tmp_path / "fleet.wnbdb")
+    wnb.build_fleet_database(index, filename)
+    report = wnb.build_fleet_database(index, filename)
+    assert report["built"] == [] and report["reused"] == ["f-bubk.yml", "f-hppl.yml"]
+
+    with open(tmp_path / "f-hppl.yml") as file:
+        content = file.read()
+    with open(tmp_path / "f-hppl.yml", "w") as file:
+        file.write(content.replace("default: 325", "default: 330"))
+    with open(tmp_path / "index.yml", "a") as file:
+        file.write("- broken.yml\n")
+    with open(tmp_path / "broken.yml", "w") as file:
+        file.write("application: wnb\nusage: aircraft-wnb-data\nfile_format_version: 0.0.2\n")
+
+    report = wnb.build_fleet_database(index, filename)
+    assert report["built"] == ["f-hppl.yml"]
+    assert report["reused"] == ["f-bubk.yml"]
+    assert list(report["errors"]) == ["broken.yml"]
+    with wnb.FleetDatabase(filename) as db:
+        assert len(db) == 2
+        assert db.model("F-HPPL").defaults[0] == 330
+        assert_same_model(db.model("F-BUBK"), wnb.load_aircraft_model(str(tmp_path / "f-bubk.yml")))
+
+
+def test_not_a_database(tmp_path):
+    filename = tmp_path / "fleet.wnbdb"
+    filename.write_bytes(b"not a fleet database at all")
+    with pytest.raises(ValueError):
+        wnb.FleetDatabase(str(filename))
+
+
+def test_process_scenarios_and_service_from_database(index, tmp_path):
+    filename = str(tmp_path / "fleet.wnbdb")
+    wnb.build_fleet_database(index, filename)
+    rows = [{"aircraft": aircraft, "luggage": i} for i in range(10) for aircraft in ["F-BUBK", "F-HPPL"]]
+    expected = wnb.evaluate_scenarios(wnb.FleetDatabase(filename).models(), rows)
+    results = []
+    wnb.process_scenarios(
+        wnb.FleetDatabase(filename), rows, results.extend, chunk_size=3, workers=2
+    )
+    assert results == expected
+
+    service = LoadsheetService.from_database(filename)
+    try:
+        status, response = asyncio.run(
+            ServiceClient(service).post("/cg", {"aircraft": "f-bubk.yml", "luggage": 0})
+        )
+    finally:
+        service.close()
+    assert status == 200
+    assert response["lever_arm"] == expected[0]["lever_arm"]
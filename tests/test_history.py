@@ -0,0 +1,112 @@
+import asyncio
+import csv
+import io
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+import wnb
+from wnb.wnb_console import run_batch
+from wnb.wnb_service import LoadsheetService, ServiceClient
+
+
+@pytest.fixture
+def models():
+    model = wnb.load_aircraft_model("./data/f-bubk.yml")
+    return {"F-BUBK": model}
+
+
+@pytest.fixture
+def store(tmp_path):
+    with wnb.HistoryStore(str(tmp_path / "history.sqlite")) as store:
+        yield store
+
+
+def append(store, models, rows, timestamp):
+    results = wnb.evaluate_scenarios(models, rows, aircraft="F-BUBK")
+    return store.append_scenarios(models, rows, results, aircraft="F-BUBK", timestamp=timestamp)
+
+
+def test_append_and_query(store, models):
+    assert append(store, models, [{"id": 1}, {"id": 2, "passenger": 60}], 1000.0) == 2
+    assert append(store, models, [{"id": 3, "pilot": 90}], datetime(2024, 1, 1)) == 1
+    assert len(store) == 3
+
+    records = list(store.query())
+    assert [record["id"] for record in records] == ["1", "2", "3"]
+    assert records[0]["inside"] and not records[1]["inside"]
+    assert records[1]["loads"]["passenger"] == 60
+    # loads missing from the scenario have their default value
+    assert records[0]["loads"] == dict(
+        zip(models["F-BUBK"].designations, models["F-BUBK"].defaults.tolist())
+    )
+
+    assert [record["id"] for record in store.query(outside=True)] == ["2"]
+    assert store.count(start=datetime(2023, 12, 31, tzinfo=timezone.utc)) == 1
+    assert store.count(start=1000.0, end=1000.5) == 2
+    assert store.count(aircraft="F-HPPL") == 0
+    assert len(list(store.query(limit=1))) == 1
+
+
+def test_indexes_and_append_only(store, models):
+    append(store, models, [{"id": 1}], 1000.0)
+    plan = store._connection.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM loadsheets WHERE timestamp >= 0 AND outside = 1"
+    ).fetchall()
+    assert "loadsheets_outside_time" in str(plan)
+    with pytest.raises(sqlite3.DatabaseError, match="append-only"):
+        store._connection.execute("DELETE FROM loadsheets")
+    with pytest.raises(sqlite3.DatabaseError, match="append-only"):
+        store._connection.execute("UPDATE loadsheets SET mass = 0")
+
+
+def test_export(store, models):
+    append(store, models, [{"id": 1}, {"id": 2, "passenger": 60}], 0.0)
+    file = io.StringIO()
+    assert store.export(file, "csv", outside=True) == 1
+    rows = list(csv.DictReader(io.StringIO(file.getvalue())))
+    assert rows[0]["timestamp"] == "1970-01-01T00:00:00+00:00"
+    assert json.loads(rows[0]["loads"])["passenger"] == 60
+    file = io.StringIO()
+    assert store.export(file, "jsonl") == 2
+    assert [json.loads(line)["id"] for line in file.getvalue().splitlines()] == ["1", "2"]
+    with pytest.raises(NotImplementedError):
+        store.export(file, "xml")
+
+
+def test_console_and_service_record(store, models, tmp_path):
+    batch = tmp_path / "loads.csv"
+    batch.write_text("id,passenger\n1,0\n2,60\n3,0\n")
+    output = str(tmp_path / "results.csv")
+    run_batch(
+        models, "F-BUBK", str(batch), output, "", "", "lever_arm", 0, 2, history=store
+    )
+    assert [record["loads"]["passenger"] for record in store.query()] == [0, 60, 0]
+
+    service = LoadsheetService(models, history=store)
+    client = ServiceClient(service)
+    status, _ = asyncio.run(client.post("/cg", {"aircraft": "F-BUBK", "id": "s"}))
+    assert status == 200
+    assert store.count() == 4
+
+
+def test_console_interactive_record(tmp_path, monkeypatch):
+    import matplotlib
+    from click.testing import CliRunner
+    from wnb import catalog
+    from wnb.wnb_console import load
+
+    matplotlib.use("Agg")
+    # designations are displayed translated but recorded as in the data file
+    monkeypatch.setattr(catalog, "detect_locale", lambda **kwargs: "fr")
+    catalog._get_catalog.cache_clear()
+    filename = str(tmp_path / "history.sqlite")
+    args = ["--config", "./data/f-bubk.yml", "--history", filename]
+    result = CliRunner().invoke(load, args, input="\n" * 5)
+    catalog._get_catalog.cache_clear()
+    assert result.exit_code == 0, result.output
+    assert "Pilote" in result.output
+    with wnb.HistoryStore(filename) as store:
+        (record,) = store.query()
+    assert "pilot" in record["loads"] and record["aircraft"] == "F-BUBK"
@@ -0,0 +1,53 @@
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ["numpy", "shapely", "matplotlib", "plotext", "i18n", "yaml", "termcolor"]
+
+# generous budgets (seconds): only a regression importing heavy
+# dependencies eagerly should exceed them
+IMPORT_WNB_BUDGET = 0.05
+IMPORT_CONSOLE_BUDGET = 0.5
+
+
+def run_python(code):
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def measure_import(statement):
+    return run_python(
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "%s\n"
+        "elapsed = time.perf_counter() - start\n"
+        "print(json.dumps({'elapsed': elapsed, 'modules': sorted(sys.modules)}))"
+        % statement
+    )
+
+
+def test_import_wnb_is_lazy():
+    result = measure_import("import wnb")
+    assert not set(HEAVY_MODULES) & set(result["modules"])
+    assert result["elapsed"] < IMPORT_WNB_BUDGET
+
+
+def test_console_import_is_lazy():
+    result = measure_import("import wnb.wnb_console")
+    assert not set(HEAVY_MODULES) & set(result["modules"])
+    assert result["elapsed"] < IMPORT_CONSOLE_BUDGET
+
+
+def test_shapely_not_needed_for_small_centrogram():
+    result = run_python(
+        "import json, sys\n"
+        "import wnb\n"
+        "cfg = wnb.load_aircraft_config('./data/f-bubk.yml')\n"
+        "G = wnb.calculate_cg(cfg, wnb.create_loads_list(cfg))\n"
+        "assert wnb.inside_centrogram(G, wnb.get_centrogram(cfg))\n"
+        "print(json.dumps(sorted(sys.modules)))"
+    )
+    assert "shapely" not in result
+    assert "matplotlib" not in result
@@ -0,0 +1,90 @@
+import gc
+
+import numpy as np
+import pytest
+import wnb
+
+
+@pytest.fixture
+def model():
+    return wnb.load_aircraft_model("./data/f-bubk.yml")
+
+
+def test_hits_and_same_results(model):
+    cache = wnb.ResultCache(maxsize=8)
+    values = model.default_values()
+    expected = wnb.evaluate_scenarios({"F-BUBK": model}, [{"aircraft": "F-BUBK"}])[0]
+    del expected["id"]
+    assert cache.evaluate(model, values) == expected
+    # within tolerance of the same step: same result, no evaluation
+    values[0] += 1e-9
+    assert cache.evaluate(model, values) == expected
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+    # x-axis is part of the key (margin differs)
+    cache.evaluate(model, values, xaxis="moment")
+    assert len(cache) == 2
+
+
+def test_off_grid_values_keyed_exactly(model):
+    cache = wnb.ResultCache()
+    values = np.tile(model.default_values(), (3, 1))
+    values[1, 0] += 0.5
+    values[2, 0] += 0.5
+    results = cache.evaluate_many(model, values)
+    assert results[0]["mass"] != results[1]["mass"] == results[2]["mass"]
+    assert cache.stats()["misses"] == 2 and cache.stats()["hits"] == 1
+
+
+def test_lru_eviction(model):
+    cache = wnb.ResultCache(maxsize=2)
+    values = np.tile(model.default_values(), (3, 1))
+    values[:, 0] = [60, 70, 80]
+    cache.evaluate(model, values[0])
+    cache.evaluate(model, values[1])
+    cache.evaluate(model, values[0])
+    cache.evaluate(model, values[2])
+    assert cache.stats()["evictions"] == 1
+    # 70 was the least recently used
+    cache.evaluate(model, values[0])
+    assert cache.stats()["hits"] == 2
+    cache.evaluate(model, values[1])
+    assert cache.stats()["misses"] == 4
+
+
+def test_invalidation(model):
+    cache = wnb.ResultCache()
+    cache.evaluate(model, model.default_values())
+    cache.invalidate(model)
+    assert len(cache) == 0
+    cache.evaluate(model, model.default_values())
+    assert cache.stats()["misses"] == 2
+
+    # reloading compiles a new model: results of the old one are dropped
+    cache.invalidate()
+    old = wnb.load_aircraft_model("./data/f-bubk.yml")
+    cache.evaluate(old, old.default_values())
+    reloaded = wnb.load_aircraft_model("./data/f-bubk.yml")
+    cache.evaluate(reloaded, reloaded.default_values())
+    assert cache.stats()["misses"] == 4
+    del old
+    gc.collect()
+    cache.evaluate(reloaded, reloaded.default_values())
+    assert len(cache) == 1
+
+
+def test_batch_with_cache(model):
+    rows = [{"id": i, "pilot": 60 + 10 * (i % 3)} for i in range(30)]
+    models = {"F-BUBK": model}
+    cache = wnb.ResultCache()
+    results = []
+    wnb.process_scenarios(models, rows, results.extend, aircraft="F-BUBK", chunk_size=7)
+    assert (
+        wnb.evaluate_scenarios(models, rows, aircraft="F-BUBK", result_cache=cache)
+        == results
+    )
+    assert cache.stats()["misses"] == 3
+    cached = []
+    wnb.process_scenarios(
+        models, rows, cached.extend, aircraft="F-BUBK", result_cache_size=16
+    )
+    assert cached == results
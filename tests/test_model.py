@@ -0,0 +1,56 @@
+import pickle
+
+import numpy as np
+import pytest
+import wnb
+
+
+def test_compile_aircraft():
+    model = wnb.load_aircraft_model("./data/f-bubk.yml")
+    assert isinstance(model, wnb.AircraftModel)
+    assert not hasattr(model, "__dict__")
+    assert model.immat == "F-BUBK"
+    assert model.designations == (
+        "empty_aircraft",
+        "pilot",
+        "passenger",
+        "luggage",
+        "fuel",
+    )
+    assert model.liquids == (None, None, None, None, "fuel_100LL")
+    assert list(model.kinds) == [0, 0, 0, 0, 1]
+    assert list(model.adjustable) == [False, True, True, True, True]
+    assert model.table.flags.c_contiguous
+    assert model.lever_arms[3] == 1.619
+    assert model.factors[4] == 0.72
+    assert model.mins[0] == model.maxs[0] == model.defaults[0] == 520
+    assert model.maxs[4] == 85
+    assert model.steps[3] == 0.1
+    assert len(model.centrogram) == 5
+
+
+@pytest.mark.parametrize("filename", ["./data/f-bubk.yml", "./data/f-hppl.yml"])
+def test_calculate_cg_with_model(filename):
+    cfg = wnb.load_aircraft_config(filename)
+    model = wnb.get_aircraft_model(cfg)
+    assert wnb.get_aircraft_model(cfg) is model
+    loads = wnb.create_loads_list(cfg)
+    G = wnb.calculate_cg(cfg, loads)
+    G_model = wnb.calculate_cg(model, model.default_values())
+    assert G_model == G
+    assert wnb.calculate_cg(model, loads) == G
+    assert wnb.inside_centrogram(G_model, model) == wnb.inside_centrogram(
+        G, cfg.centrogram
+    )
+    mass, moment, lever_arm = wnb.calculate_cg_batch(model, [model.default_values()])
+    assert (mass[0], moment[0], lever_arm[0]) == (G.mass, G.moment, G.lever_arm)
+
+
+def test_model_pickle():
+    model = wnb.load_aircraft_model("./data/f-hppl.yml")
+    model.centrogram.polygon()
+    other = pickle.loads(pickle.dumps(model))
+    assert other.immat == model.immat
+    assert np.array_equal(other.table, model.table)
+    assert np.array_equal(other.centrogram.moment, model.centrogram.moment)
+    assert other.centrogram.contains_point(0.33, 500)
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+import wnb
+from wnb.montecarlo import StreamingHistogram
+
+DISTRIBUTIONS = {
+    "pilot": {"distribution": "normal", "std": 15, "min": 40},
+    "passenger": {"distribution": "triangular", "low": 0, "mode": 70, "high": 120},
+    "luggage": {"distribution": "uniform", "low": 0, "high": 54},
+}
+DENSITIES = {"fuel_100LL": {"std": 0.01}}
+
+
+def test_monte_carlo_constant_loads():
+    cfg = wnb.load_aircraft_config("./data/f-bubk.yml")
+    G = wnb.calculate_cg(cfg, wnb.create_loads_list(cfg))
+    result = wnb.monte_carlo(cfg, n_samples=1000, seed=0)
+    assert result.n_samples == 1000
+    assert result.n_outside == 0
+    assert result.mean("mass") == pytest.approx(G.mass)
+    assert result.percentile([0, 50, 100], "lever_arm") == pytest.approx(
+        [G.lever_arm] * 3
+    )
+
+
+def test_monte_carlo_reproducible_and_sharded():
+    cfg = wnb.load_aircraft_config("./data/f-bubk.yml")
+    kwargs = dict(n_samples=20000, seed=42, chunk_size=3000)
+    result = wnb.monte_carlo(cfg, DISTRIBUTIONS, DENSITIES, **kwargs)
+    assert 0 < result.probability_outside < 1
+    again = wnb.monte_carlo(cfg, DISTRIBUTIONS, DENSITIES, **kwargs)
+    sharded = wnb.monte_carlo(cfg, DISTRIBUTIONS, DENSITIES, workers=2, **kwargs)
+    assert result.summary() == again.summary() == sharded.summary()
+    other = wnb.monte_carlo(cfg, DISTRIBUTIONS, DENSITIES, n_samples=20000, seed=43)
+    assert other.n_outside != result.n_outside
+
+
+def test_monte_carlo_matches_batch():
+    model = wnb.load_aircraft_model("./data/f-bubk.yml")
+    result = wnb.monte_carlo(model, DISTRIBUTIONS, n_samples=5000, seed=7)
+    sampler = wnb.montecarlo._Sampler(model, DISTRIBUTIONS, None, "lever_arm", 4096)
+    seed = np.random.SeedSequence(7).spawn(1)[0]
+    values, _ = sampler.sample(seed, 5000)
+    mass, _, lever_arm = wnb.calculate_cg_batch(model, values)
+    inside = model.centrogram.contains(lever_arm, mass)
+    assert result.n_outside == np.count_nonzero(~inside)
+    assert result.percentile(50, "mass") == pytest.approx(np.median(mass), abs=0.5)
+
+
+def test_monte_carlo_tanks_share_density(tmp_path):
+    content = open("./data/f-bubk.yml").read()
+    # fuel is the last load: add a second tank of the same liquid
+    tank = content[content.index("  - designation: fuel") :]
+    content += tank.replace("designation: fuel", "designation: fuel_aux")
+    filename = tmp_path / "f-bubk.yml"
+    filename.write_text(content)
+    model = wnb.load_aircraft_model(str(filename))
+    tanks = [j for j, name in enumerate(model.designations) if name.startswith("fuel")]
+    assert len(tanks) == 2
+
+    sampler = wnb.montecarlo._Sampler(model, None, DENSITIES, "lever_arm", 4096)
+    _, factors = sampler.sample(np.random.SeedSequence(3), 1000)
+    assert np.std(factors[:, tanks[0]]) > 0
+    assert np.array_equal(factors[:, tanks[0]], factors[:, tanks[1]])
+
+
+def test_monte_carlo_errors():
+    cfg = wnb.load_aircraft_config("./data/f-bubk.yml")
+    with pytest.raises(ValueError):
+        wnb.monte_carlo(cfg, {"copilot": 80})
+    with pytest.raises(NotImplementedError):
+        wnb.monte_carlo(cfg, {"pilot": {"distribution": "gamma"}})
+
+
+def test_streaming_histogram_percentiles():
+    rng = np.random.default_rng(0)
+    values = rng.normal(0, 1, 100000)
+    histogram = StreamingHistogram(-2, 2, bins=2000)
+    for chunk in np.array_split(values, 7):
+        histogram.add(chunk)
+    assert histogram.count == len(values)
+    # 5% and 95% percentiles are in [-2, 2), 0% and 100% are exact
+    q = [0, 5, 25, 50, 75, 95, 100]
+    assert histogram.percentile(q) == pytest.approx(
+        np.percentile(values, q), abs=0.01
+    )
+    assert histogram.percentile(0) == values.min()
+    assert histogram.percentile(100) == values.max()
+
+
+def test_monte_carlo_fleet():
+    fleet = wnb.Fleet("./data/index.yml")
+    models = {name: fleet.model(name) for name in fleet.names}
+    results = wnb.monte_carlo_fleet(models, DISTRIBUTIONS, n_samples=1000, seed=0)
+    assert set(results) == set(models)
+    assert all(result.n_samples == 1000 for result in results.values())
+
+
+def test_streaming_histogram_empty():
+    histogram = StreamingHistogram(-2, 2, bins=10)
+    assert np.isnan(histogram.mean)
+    assert np.isnan(histogram.percentile([5, 95])).all()
+    histogram.merge(StreamingHistogram(-2, 2, bins=10))
+    assert histogram.count == 0 and np.isnan(histogram.percentile(50))
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+import wnb
+from wnb.optimize import linprog
+
+
+def test_linprog():
+    # maximize x + y with x + 2 y <= 4, 3 x + y <= 6
+    x = linprog([1, 1], [[1, 2], [3, 1]], [4, 6], bounds=[(0, 10), (0, 10)])
+    assert x == pytest.approx([1.6, 1.2])
+    x = linprog([1, 0], A_eq=[[1, 1]], b_eq=[3], bounds=[(-1, 2), (0, 5)])
+    assert x == pytest.approx([2, 1])
+    assert linprog([1], [[1]], [-1], bounds=[(0, 1)]) is None
+
+
+def grid_margins(model, values, designations, grids):
+    # margins of every combination of the grids of `designations`
+    mesh = np.meshgrid(*grids, indexing="ij")
+    loadings = np.tile(values, (mesh[0].size, 1))
+    for designation, grid in zip(designations, mesh):
+        loadings[:, model.designations.index(designation)] = grid.ravel()
+    mass, moment, _ = wnb.calculate_cg_batch(model, loadings)
+    return model.centrogram.margin(moment, mass, xaxis="moment"), loadings
+
+
+@pytest.mark.parametrize("filename", ["./data/f-bubk.yml", "./data/f-hppl.yml"])
+def test_optimize_margin_matches_grid_search(filename):
+    model = wnb.load_aircraft_model(filename)
+    free = ["luggage", "fuel"]
+    result = wnb.optimize_loading(model, free=free)
+    assert result.method == "lp"
+    grids = [
+        np.arange(model.mins[j], model.maxs[j] + 1e-9, model.steps[j])
+        for j in (model.designations.index(d) for d in free)
+    ]
+    margins, _ = grid_margins(model, model.defaults, free, grids)
+    assert result.margin == pytest.approx(margins.max(), abs=1e-9)
+    G = wnb.calculate_cg(model, result.values)
+    assert (G.mass, G.moment) == pytest.approx((result.mass, result.moment))
+
+
+def test_optimize_totals():
+    model = wnb.load_aircraft_model("./data/f-hppl.yml")
+    values = model.default_values()
+    # 40 kg of bags on the passenger seat and/or in the luggage compartment
+    result = wnb.optimize_loading(
+        model, values, free=["passenger", "luggage"], totals={("passenger", "luggage"): 40}
+    )
+    passenger, luggage = result.values[2], result.values[3]
+    assert passenger + luggage == pytest.approx(40)
+    luggage_grid = np.arange(0, 26)
+    margins, _ = grid_margins(
+        model, values, ["passenger", "luggage"], [40 - luggage_grid, luggage_grid]
+    )
+    margins = np.diagonal(margins.reshape(26, 26))
+    assert result.margin == pytest.approx(margins.max())
+
+
+def test_optimize_fuel():
+    model = wnb.load_aircraft_model("./data/f-bubk.yml")
+    values = model.default_values()
+    values[2] = 60  # passenger
+    values[3] = 20  # luggage
+    result = wnb.optimize_loading(
+        model, values, free=["fuel"], objective="fuel", min_margin=0.01
+    )
+    fuel = np.arange(0, 85.05, 0.1)
+    margins, _ = grid_margins(model, values, ["fuel"], [fuel])
+    assert result.values[4] == pytest.approx(fuel[margins >= 0.01].max())
+    assert result.margin >= 0.01
+    assert (
+        wnb.optimize_loading(model, values, free=["fuel"], objective="fuel", min_margin=0.5)
+        is None
+    )
+
+
+def test_optimize_non_convex_centrogram():
+    cfg = wnb.load_aircraft_config("./data/f-bubk.yml")
+    # notch in the aft limit
+    notch = cfg.centrogram[3].copy()
+    notch.designation, notch.lever_arm, notch.mass = "notch", 0.9, 500
+    notch.moment = notch.lever_arm * notch.mass
+    cfg.centrogram.insert(4, notch)
+    model = wnb.compile_aircraft(cfg)
+    assert not model.centrogram.edges("moment").convex
+    result = wnb.optimize_loading(model, free=["luggage", "fuel"])
+    assert result.method == "search"
+    assert result.margin > 0
+    assert model.centrogram.contains_point(result.lever_arm, result.mass)
+
+
+def test_optimize_errors():
+    model = wnb.load_aircraft_model("./data/f-bubk.yml")
+    with pytest.raises(NotImplementedError):
+        wnb.optimize_loading(model, objective="range")
+    with pytest.raises(ValueError):
+        wnb.optimize_loading(model, free=["fuel"], totals={("fuel", "pilot"): 100})
+
+
+def test_optimize_legal_in_lever_arm_space():
+    model = wnb.load_aircraft_model("./data/f-hppl.yml")
+    # legal for the moment space chords, outside of the centrogram
+    result = wnb.optimize_loading(
+        model, [325, 4, 0, 24, 43], free=["pilot", "passenger"], objective="fuel"
+    )
+    assert result.margin > 0
+    assert wnb.inside_centrogram(wnb.calculate_cg(model, result.values), model)
+    # maximum fuel on the maximum mass limit: not inside the centrogram
+    values = [325, 127, 107, 5, 78]
+    result = wnb.optimize_loading(model, values, free=["fuel"], objective="fuel")
+    assert result.margin > 0 and result.mass < 600
+    assert wnb.inside_centrogram(wnb.calculate_cg(model, result.values), model)
@@ -0,0 +1,48 @@
+import io
+
+import pytest
+import wnb
+from wnb import profiling
+
+
+def test_disabled_by_default():
+    assert not profiling.is_enabled()
+    profiling.reset()
+    cfg = wnb.load_aircraft_config("./data/f-bubk.yml")
+    wnb.calculate_cg(cfg, wnb.create_loads_list(cfg))
+    assert profiling.get_stats() == {}
+    assert profiling.stage("x") is profiling.stage("y")
+
+
+def test_session_stages():
+    output = io.StringIO()
+    with profiling.session("stages", file=output):
+        cfg = wnb.load_aircraft_config("./data/f-bubk.yml")
+        loads = wnb.create_loads_list(cfg)
+        G = wnb.calculate_cg(cfg, loads)
+        wnb.calculate_cg(cfg, loads)
+        wnb.inside_centrogram(G, cfg.centrogram)
+        profiling.count("rows", 10)
+        stats = profiling.get_stats()
+    assert not profiling.is_enabled()
+    assert stats["yaml"]["calls"] == 1
+    assert stats["cg"]["calls"] == 2
+    assert stats["cg"]["total"] > 0
+    assert stats["rows"] == {"calls": 10, "total": 0.0}
+    assert "centrogram" in output.getvalue()
+
+
+def test_session_cprofile(tmp_path):
+    output = io.StringIO()
+    with profiling.session("cprofile", file=output):
+        wnb.load_aircraft_config("./data/f-bubk.yml")
+    assert "load_aircraft_config" in output.getvalue()
+
+    filename = str(tmp_path / "wnb.pstats")
+    with profiling.session("cprofile", output=filename):
+        wnb.load_aircraft_config("./data/f-bubk.yml")
+    assert (tmp_path / "wnb.pstats").exists()
+
+    with pytest.raises(NotImplementedError):
+        with profiling.session("unknown"):
+            pass
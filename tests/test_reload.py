@@ -0,0 +1,125 @@
+import shutil
+import time
+
+import pytest
+import wnb
+from wnb.reload import InotifyWatcher, PollingWatcher, make_watcher
+from wnb.wnb_service import LoadsheetService
+
+
+@pytest.fixture
+def index(tmp_path):
+    for name in ["index.yml", "f-bubk.yml", "f-hppl.yml"]:
+        shutil.copy("./data/" + name, tmp_path / name)
+    return tmp_path / "index.yml"
+
+
+def edit(path, old, new):
+    content = path.read_text()
+    assert old in content
+    path.write_text(content.replace(old, new, 1))
+
+
+@pytest.mark.parametrize("watcher", ["inotify", "poll"])
+def test_watchers(index, watcher):
+    try:
+        watcher = make_watcher([index.parent / "f-bubk.yml"], watcher)
+    except OSError:
+        pytest.skip("inotify not available")
+    try:
+        assert watcher.poll() == set()
+        edit(index.parent / "f-hppl.yml", "F-HPPL", "F-HPPLX")
+        edit(index.parent / "f-bubk.yml", "F-BUBK", "F-BUBKX")
+        assert watcher.poll(0.5) == {str(index.parent / "f-bubk.yml")}
+        assert watcher.poll() == set()
+    finally:
+        watcher.close()
+
+
+def test_auto_watcher(index):
+    watcher = make_watcher([index])
+    assert isinstance(watcher, (InotifyWatcher, PollingWatcher))
+    watcher.close()
+
+
+def test_reloader(index):
+    fleet = wnb.Fleet(str(index))
+    fleet.load_all()
+    old = fleet.model("f-bubk.yml")
+    with wnb.Reloader(fleet, watcher="poll", debounce=0) as reloader:
+        assert reloader.check() is None
+
+        edit(index.parent / "f-bubk.yml", "immat: F-BUBK", "immat: F-BUBKX")
+        report = reloader.check()
+        assert report["reloaded"] == ["f-bubk.yml"] and not report["errors"]
+        assert fleet.model("f-bubk.yml").immat == "F-BUBKX"
+        # users of the previous version keep it
+        assert old.immat == "F-BUBK"
+
+        # invalid edits leave the previous version in place
+        edit(index.parent / "f-bubk.yml", "application: wnb", "application: wnbx")
+        report = reloader.check()
+        assert list(report["errors"]) == ["f-bubk.yml"]
+        assert fleet.model("f-bubk.yml").immat == "F-BUBKX"
+        # back to the loaded content: nothing to swap
+        edit(index.parent / "f-bubk.yml", "application: wnbx", "application: wnb")
+        assert reloader.check()["unchanged"] == ["f-bubk.yml"]
+
+        edit(index, "- f-hppl.yml", "")
+        report = reloader.check()
+        assert report["removed"] == ["f-hppl.yml"]
+        assert fleet.names == ["f-bubk.yml"]
+
+
+def test_debounce(index):
+    fleet = wnb.Fleet(str(index))
+    with wnb.Reloader(fleet, watcher="poll", debounce=0.2) as reloader:
+        fleet.load_all()
+        edit(index.parent / "f-bubk.yml", "immat: F-BUBK", "immat: F-BUBKX")
+        assert reloader.check() is None
+        time.sleep(0.25)
+        assert reloader.check()["reloaded"] == ["f-bubk.yml"]
+
+
+def test_service_reload(index):
+    service = LoadsheetService.from_index(str(index))
+    try:
+        service.watch(watcher="poll", debounce=0, interval=0.05)
+        edit(index.parent / "f-hppl.yml", "immat: F-HPPL", "immat: F-HPPLX")
+        for _ in range(100):
+            if "F-HPPLX" in service.models:
+                break
+            time.sleep(0.05)
+        assert "F-HPPLX" in service.models and "F-HPPL" not in service.models
+        assert service.models["f-hppl.yml"].immat == "F-HPPLX"
+    finally:
+        service.close()
+
+
+def test_reloader_thread_survives_errors(index, capsys):
+    fleet = wnb.Fleet(str(index))
+    fleet.load_all()
+    reports = []
+
+    def on_reload(report):
+        reports.append(report)
+        if len(reports) == 1:
+            raise RuntimeError("callback failed")
+
+    with wnb.Reloader(
+        fleet, watcher="poll", debounce=0, interval=0.05, on_reload=on_reload
+    ) as reloader:
+        reloader.start()
+        edit(index.parent / "f-bubk.yml", "immat: F-BUBK", "immat: F-BUBKX")
+        for _ in range(100):
+            if reloader.last_error is not None:
+                break
+            time.sleep(0.05)
+        assert str(reloader.last_error) == "callback failed"
+        edit(index.parent / "f-hppl.yml", "immat: F-HPPL", "immat: F-HPPLX")
+        for _ in range(100):
+            if len(reports) == 2:
+                break
+            time.sleep(0.05)
+        assert reports[1]["reloaded"] == ["f-hppl.yml"]
+    assert "callback failed" in capsys.readouterr().err
@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pytest
+import wnb
+from matplotlib.image import imread
+
+
+def test_blitted_chart_matches_full_render(tmp_path):
+    model = wnb.load_aircraft_model("./data/f-bubk.yml")
+    renderer = wnb.ChartRenderer(model)
+    renderer.render(str(tmp_path / "first.png"), 0.85, 400)
+    renderer.render(str(tmp_path / "blit.png"), 0.9, 700, title="1")
+
+    fresh = wnb.ChartRenderer(model)
+    fresh.scatter.set_offsets([[0.9, 700]])
+    fresh.scatter.set_color(["green"])
+    fresh.title.set_text("F-BUBK - 1")
+    fresh.figure.savefig(str(tmp_path / "full.png"))
+
+    assert np.array_equal(imread(tmp_path / "blit.png"), imread(tmp_path / "full.png"))
+
+
+def test_render_outside_view_and_svg(tmp_path):
+    model = wnb.load_aircraft_model("./data/f-hppl.yml")
+    renderer = wnb.ChartRenderer(model, xaxis="moment")
+    limits = renderer.axes.get_xlim()
+    renderer.render(str(tmp_path / "out.png"), limits[1] * 1.2, 500)
+    assert renderer.axes.get_xlim()[1] > limits[1] * 1.2
+    renderer.render(str(tmp_path / "in.svg"), np.mean(limits), 500)
+    assert renderer.axes.get_xlim() == limits
+    assert (tmp_path / "in.svg").read_text().lstrip().startswith("<?xml")
+    with pytest.raises(NotImplementedError):
+        renderer.render(str(tmp_path / "chart.gif"), 0, 0)
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_chart_writer(tmp_path, workers):
+    fleet = wnb.Fleet("./data/index.yml")
+    models = {name: fleet.model(name) for name in fleet.names}
+    rows = [{"aircraft": name, "id": "%s/%d" % (name, i)} for name in models for i in range(3)]
+    rows.append({"aircraft": fleet.names[0]})
+    results = wnb.evaluate_scenarios(models, rows)
+
+    with wnb.ChartWriter(models, str(tmp_path), workers=workers, chunk_size=2) as charts:
+        charts.write(results[:4])
+        charts.write(results[4:])
+    assert charts.count == len(rows)
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        os.path.basename(filename) for filename in charts.filenames
+    )
+    assert os.path.basename(charts.filenames[-1]) == "%06d.png" % len(rows)
+
+
+def test_chart_writer_unique_names(tmp_path):
+    model = wnb.load_aircraft_model("./data/f-bubk.yml")
+    models = {"F-BUBK": model}
+    rows = [{"id": "a/1"}, {"id": "a_1"}, {"id": "a_1"}, {"id": "000005"}, {}]
+    results = wnb.evaluate_scenarios(models, rows, aircraft="F-BUBK")
+    with wnb.ChartWriter(models, str(tmp_path)) as charts:
+        charts.write(results)
+    names = [os.path.basename(filename) for filename in charts.filenames]
+    assert names == ["a_1.png", "a_1-2.png", "a_1-3.png", "000005.png", "000005-5.png"]
+    assert len(os.listdir(tmp_path)) == len(rows)
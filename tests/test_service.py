@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import pytest
+
+from wnb.wnb_service import LoadsheetService, ServiceClient
+
+
+@pytest.fixture(scope="module")
+def service():
+    service = LoadsheetService.from_index("./data/index.yml", executor_threshold=3)
+    yield service
+    service.close()
+
+
+def test_service_in_process_client(service):
+    client = ServiceClient(service)
+
+    async def scenario():
+        status, response = await client.get("/aircrafts")
+        assert status == 200
+        assert [aircraft["immat"] for aircraft in response["aircrafts"]] == [
+            "F-BUBK",
+            "F-HPPL",
+        ]
+
+        status, response = await client.post("/cg", {"aircraft": "F-BUBK"})
+        assert status == 200
+        assert response["mass"] == 668.2
+        assert response["inside"] and response["margin"] > 0
+
+        # small batch (inline) and large batch (executor)
+        for n in [2, 10]:
+            status, response = await client.post(
+                "/cg/batch",
+                {"aircraft": "F-BUBK", "scenarios": [{"passenger": 60}] * n},
+            )
+            assert status == 200
+            assert len(response["results"]) == n
+            assert not any(result["inside"] for result in response["results"])
+
+        # repeated loadings are taken from the result cache
+        status, response = await client.get("/stats")
+        assert response["result_cache"]["hits"] > 0
+
+        assert (await client.post("/cg", {"aircraft": "F-XXXX"}))[0] == 400
+        assert (await client.post("/cg", {"aircraft": "F-BUBK", "xaxis": "x"}))[0] == 400
+        assert (await client.post("/cg/batch", {"scenarios": 1}))[0] == 400
+        assert (await client.get("/cg"))[0] == 405
+        assert (await client.get("/unknown"))[0] == 404
+
+    asyncio.run(scenario())
+
+
+def test_service_http(service):
+    async def scenario():
+        server = await service.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            for _ in range(2):  # keep-alive
+                body = json.dumps({"aircraft": "f-hppl.yml", "pilot": 80}).encode()
+                writer.write(
+                    b"POST /cg HTTP/1.1\r\nHost: localhost\r\n"
+                    b"Content-Type: application/json\r\n"
+                    b"Content-Length: %d\r\n\r\n" % len(body)
+                    + body
+                )
+                await writer.drain()
+                status_line = await reader.readline()
+                assert status_line.startswith(b"HTTP/1.1 200")
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line == b"\r\n":
+                        break
+                    name, _, value = line.decode().partition(":")
+                    headers[name.lower()] = value.strip()
+                response = json.loads(await reader.readexactly(int(headers["content-length"])))
+                assert response["aircraft"] == "F-HPPL"
+                assert response["mass"] == pytest.approx(556.16)
+        finally:
+            writer.close()
+            server.close()
+            await server.wait_closed()
+
+    asyncio.run(scenario())
+
+
+def test_service_errors(service, monkeypatch):
+    async def scenario():
+        server = await service.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            for length in [b"abc", b"-5"]:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(b"POST /cg HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n")
+                await writer.drain()
+                assert (await reader.readline()).startswith(b"HTTP/1.1 400")
+                writer.close()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        def fail(*args, **kwargs):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(service, "routes", {("GET", "/aircrafts"): fail})
+        status, response = await service.handle("GET", "/aircrafts")
+        assert status == 500 and "boom" in response["error"]
+
+    asyncio.run(scenario())
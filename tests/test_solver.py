@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+import wnb
+
+
+def brute_force_inside(model, values, station, t, xaxis):
+    scenarios = np.tile(values, (len(t), 1))
+    scenarios[:, station] = t
+    mass, moment, lever_arm = wnb.calculate_cg_batch(model, scenarios)
+    x = lever_arm if xaxis == "lever_arm" else moment
+    return model.centrogram.contains(x, mass, xaxis=xaxis)
+
+
+@pytest.mark.parametrize("filename", ["./data/f-bubk.yml", "./data/f-hppl.yml"])
+@pytest.mark.parametrize("xaxis", ["lever_arm", "moment"])
+def test_allowable_ranges_match_brute_force(filename, xaxis):
+    model = wnb.load_aircraft_model(filename)
+    rng = np.random.default_rng(2)
+    for _ in range(20):
+        values = model.default_values()
+        adjustable = model.adjustable
+        values[adjustable] = rng.uniform(model.mins, model.maxs)[adjustable]
+        ranges = wnb.allowable_ranges(model, values, xaxis=xaxis)
+        assert sorted(ranges) == np.flatnonzero(adjustable).tolist()
+        for station, intervals in ranges.items():
+            t = np.linspace(model.mins[station], model.maxs[station], 501)
+            expected = brute_force_inside(model, values, station, t, xaxis)
+            got = np.zeros(len(t), dtype=bool)
+            for low, high in intervals:
+                assert model.mins[station] <= low <= high <= model.maxs[station]
+                got |= (t > low) & (t < high)
+            on_bounds = np.zeros(len(t), dtype=bool)
+            for low, high in intervals:
+                on_bounds |= np.isclose(t, low) | np.isclose(t, high)
+            assert np.array_equal(got[~on_bounds], expected[~on_bounds])
+
+
+def test_max_additional_load():
+    cfg = wnb.load_aircraft_config("./data/f-bubk.yml")
+    loads = wnb.create_loads_list(cfg)
+    # maximum mass (726 kg) is reached first
+    assert wnb.max_additional_load(cfg, loads, 1) == pytest.approx(726 - 668.2)
+    # luggage is limited by its own maximum
+    assert wnb.max_additional_load(cfg, loads, 3) == pytest.approx(44)
+
+    loads[2].mass.current_value = 60  # overweight
+    assert wnb.max_additional_load(cfg, loads, 3) is None
+    # unless luggage is removed
+    ((low, high),) = wnb.allowable_range(cfg, loads, 3)
+    assert (low, high) == (0, pytest.approx(7.8))
+    low, high = wnb.allowable_range(cfg, loads, 2)[0]
+    assert (low, high) == (0, pytest.approx(57.8))
@@ -0,0 +1,46 @@
+import pytest
+import wnb
+
+
+def test_simulate_fuel_burn_rate():
+    model = wnb.load_aircraft_model("./data/f-hppl.yml")
+    values = model.default_values()
+    values[1:4] = 0  # no pilot (!), passenger nor luggage
+    values[4] = 118
+    states = list(wnb.simulate_fuel_burn(model, values, rate=20, dt=0.1))
+    assert states[0].volume == 118 and states[0].time == 0
+    assert states[-1].volume == 0
+    assert states[1].volume == pytest.approx(116)
+
+    for state in states:
+        values[4] = state.volume
+        G = wnb.calculate_cg(model, values)
+        assert state.mass == pytest.approx(G.mass)
+        assert state.moment == pytest.approx(G.moment)
+        assert state.inside == wnb.inside_centrogram(G, model)
+
+    first_exit = wnb.first_envelope_exit(states)
+    assert first_exit.step == 25
+    assert all(state.inside for state in states[:25])
+    assert all(state.exit_step is None for state in states[:25])
+    assert all(state.exit_step == 25 for state in states[25:])
+
+
+def test_simulate_fuel_burn_waypoints():
+    cfg = wnb.load_aircraft_config("./data/f-bubk.yml")
+    loads = wnb.create_loads_list(cfg)
+    waypoints = [(0, 85), (1, 60), (2, 20)]
+    states = list(wnb.simulate_fuel_burn(cfg, loads, waypoints=waypoints, dt=0.25))
+    assert [state.time for state in states] == [0, 0.25, 0.5, 0.75, 1, 1.25, 1.5, 1.75, 2]
+    assert states[4].volume == pytest.approx(60)
+    assert states[-1].volume == pytest.approx(20)
+    assert wnb.first_envelope_exit(states) is None
+
+    states = list(wnb.simulate_fuel_burn(cfg, loads, rate=30, duration=1, dt=0.5))
+    assert [state.volume for state in states] == [85, 70, 55]
+
+
+def test_simulate_fuel_burn_requires_profile():
+    model = wnb.load_aircraft_model("./data/f-bubk.yml")
+    with pytest.raises(ValueError):
+        next(wnb.simulate_fuel_burn(model))
@@ -0,0 +1,85 @@
+import shutil
+
+import pytest
+import wnb
+
+
+@pytest.fixture
+def broken(tmp_path):
+    for name in ["index.yml", "f-bubk.yml", "f-hppl.yml"]:
+        shutil.copy("./data/" + name, tmp_path / name)
+    content = (tmp_path / "f-hppl.yml").read_text()
+    content = content.replace("file_format_version: 0.0.1", "file_format_version: 0.0.2")
+    content = content.replace("liquid: fuel_100LL", "liquid: jet_a1")
+    content = content.replace("immat: F-HPPL", "immat: F-BUBK")
+    (tmp_path / "f-hppl.yml").write_text(content)
+    content = (tmp_path / "f-bubk.yml").read_text()
+    # inconsistent 3 attributes point, then swapped vertices (bowtie)
+    content = content.replace(
+        "    lever_arm: 0.835\n    mass: 726",
+        "    lever_arm: 0.835\n    moment: 100\n    mass: 726",
+    )
+    content = content.replace(
+        "    lever_arm: 0.952\n    mass: 726\n  - designation: Pt5\n    lever_arm: 0.952\n    mass: 250",
+        "    lever_arm: 0.952\n    mass: 250\n  - designation: Pt5\n    lever_arm: 0.952\n    mass: 726",
+    )
+    (tmp_path / "f-bubk.yml").write_text(content)
+    return tmp_path
+
+
+def messages(report):
+    return [issue.message for issue in report.issues]
+
+
+def test_bundled_data_valid():
+    report = wnb.validate_index("./data/index.yml")
+    assert report.valid, report.to_dict()
+    assert [file.immat for file in report.files] == ["F-BUBK", "F-HPPL"]
+
+
+def test_all_issues_reported(broken):
+    report = wnb.validate_index(str(broken / "index.yml"), workers=0)
+    assert not report.valid
+    assert messages(report) == ["immatriculation F-BUBK already used by f-bubk.yml"]
+    bubk, hppl = report.files
+    assert any(issue.path == "centrogram[2]" for issue in bubk.issues)
+    assert any("self-intersecting" in message for message in messages(bubk))
+    paths = [issue.path for issue in hppl.issues]
+    assert "file_format_version" in paths
+    assert any(path.endswith(".liquid") for path in paths)
+
+    # same result with a process pool
+    parallel = wnb.validate_index(str(broken / "index.yml"), workers=2)
+    assert parallel.to_dict() == report.to_dict()
+
+
+def test_unreadable_files(tmp_path):
+    (tmp_path / "broken.yml").write_text("a: [\n")
+    reports = wnb.validate_files([str(tmp_path / "broken.yml"), str(tmp_path / "missing.yml")])
+    assert [len(report.issues) for report in reports] == [1, 1]
+
+
+def test_loader_errors(broken):
+    with pytest.raises(wnb.ConfigError, match="0.0.2"):
+        wnb.load_aircraft_config(str(broken / "f-hppl.yml"))
+    with pytest.raises(wnb.ConfigError, match="moment"):
+        wnb.load_aircraft_config(str(broken / "f-bubk.yml"))
+    # consistent 3 attributes points are accepted
+    content = open("./data/f-bubk.yml").read().replace(
+        "    lever_arm: 0.835\n    mass: 726",
+        "    lever_arm: 0.835\n    moment: 606.21\n    mass: 726",
+    )
+    (broken / "f-bubk.yml").write_text(content)
+    cfg = wnb.load_aircraft_config(str(broken / "f-bubk.yml"))
+    assert cfg.centrogram[2].moment == pytest.approx(606.21)
+
+
+def test_choose_config_errors(broken, monkeypatch):
+    from wnb.wnb_console import choose_config
+
+    # input errors ask again, invalid aircraft files are reported
+    answers = iter(["x", "3", "2"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(answers))
+    with pytest.raises(wnb.ConfigError, match="0.0.2"):
+        choose_config(wnb.Fleet(str(broken / "index.yml")))
+    assert next(answers, None) is None
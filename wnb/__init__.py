@@ -1,8 +1,79 @@
-from .wnb import (
-    load_config,
-    load_aircrafts_index,
-    load_aircraft_config,
-    create_loads_list,
-    calculate_cg,
-    inside_centrogram,
-)
+# Public names are imported lazily (PEP 562) so that "import wnb" stays
+# cheap: numpy, shapely... are only imported when a feature is used.
+import importlib
+
+_SUBMODULE_EXPORTS = {
+    ".wnb": [
+        "YAML_LOADER_DEFAULT",
+        "ConfigError",
+        "load_config",
+        "load_aircrafts_index",
+        "load_aircraft_config",
+        "load_aircraft_model",
+        "get_aircraft_model",
+        "create_loads_list",
+        "calculate_cg",
+        "get_centrogram",
+        "inside_centrogram",
+        "inside_envelopes",
+    ],
+    ".cache": ["ConfigCache"],
+    ".catalog": ["Catalog", "get_catalog", "detect_locale"],
+    ".centrogram": ["Centrogram", "point_in_polygon"],
+    ".envelopes": ["Envelope", "EnvelopeSet", "evaluate_envelopes"],
+    ".model": ["AircraftModel", "compile_aircraft", "loads_to_values"],
+    ".batch": [
+        "BATCH_FORMATS",
+        "calculate_cg_batch",
+        "guess_format",
+        "evaluate_scenarios",
+        "process_scenarios",
+        "read_scenarios",
+        "ResultsWriter",
+    ],
+    ".render": ["ChartRenderer", "ChartWriter"],
+    ".memo": ["ResultCache"],
+    ".history": ["HistoryStore"],
+    ".fleet": ["Fleet"],
+    ".reload": ["ChangeMonitor", "Reloader", "reload_aircraft_config"],
+    ".fleetdb": ["FleetDatabase", "build_fleet_database"],
+    ".feasible": ["FeasibleRegion", "feasible_region"],
+    ".trajectory": ["CGState", "simulate_fuel_burn", "first_envelope_exit"],
+    ".solver": ["allowable_range", "allowable_ranges", "max_additional_load"],
+    ".optimize": ["OptimizedLoading", "optimize_loading"],
+    ".montecarlo": ["MonteCarloResult", "monte_carlo", "monte_carlo_fleet"],
+    ".validate": [
+        "Issue",
+        "FileReport",
+        "FleetReport",
+        "validate_file",
+        "validate_files",
+        "validate_index",
+    ],
+}
+
+_EXPORTS = {
+    name: module for module, names in _SUBMODULE_EXPORTS.items() for name in names
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    try:
+        module = _EXPORTS[name]
+    except KeyError:
+        # submodule (e.g. wnb.profiling)
+        try:
+            return importlib.import_module("." + name, __name__)
+        except ModuleNotFoundError as error:
+            if error.name != "%s.%s" % (__name__, name):
+                raise
+            raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -0,0 +1,304 @@
+import csv
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import profiling
+from .envelopes import zero_fuel_values
+from .fleetdb import FleetDatabase
+from .model import AircraftModel
+from .wnb import get_aircraft_model
+
+BATCH_FORMATS = ["csv", "jsonl"]
+RESULT_FIELDS = [
+    "id",
+    "aircraft",
+    "mass",
+    "moment",
+    "lever_arm",
+    "inside",
+    "margin",
+    "limit",
+    "outside_envelopes",
+    "error",
+]
+
+
+@profiling.staged("cg_batch")
+def calculate_cg_batch(cfg, values):
+    """Calculate G of many loading scenarios at once
+
+    `cfg` is an aircraft config or an `AircraftModel`.
+    `values` is an (n_scenarios, n_loads) array of mass (kg) or volume (L)
+    values, loads being in the same order than `cfg.loads`.
+    Returns (mass, moment, lever_arm) arrays of shape (n_scenarios,).
+    Loads are summed in order so results are identical to `calculate_cg`.
+    """
+    if not isinstance(cfg, AircraftModel):
+        cfg = get_aircraft_model(cfg)
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[np.newaxis, :]
+    n_scenarios, n_loads = values.shape
+    if n_loads != len(cfg):
+        raise ValueError("expected %d loads per scenario, got %d" % (len(cfg), n_loads))
+    masses = values * cfg.factors
+    moments = masses * cfg.lever_arms
+    total_mass = np.zeros(n_scenarios)
+    total_moment = np.zeros(n_scenarios)
+    for j in range(n_loads):
+        total_mass += masses[:, j]
+        total_moment += moments[:, j]
+    lever_arm = total_moment / total_mass
+    return total_mass, total_moment, lever_arm
+
+
+def guess_format(filename, default="csv"):
+    """Batch file format ("csv" or "jsonl") from its extension"""
+    _, ext = os.path.splitext(filename)
+    ext = ext.lower().lstrip(".")
+    if ext in ["jsonl", "ndjson", "json"]:
+        return "jsonl"
+    elif ext == "csv":
+        return "csv"
+    return default
+
+
+def read_scenarios(file, fmt="csv"):
+    """Yield loading scenarios (dicts) read from a CSV or JSONL text file
+
+    Keys are load designations (e.g. "pilot", "fuel"), missing loads keep
+    their default value. An optional "aircraft" key (immatriculation or
+    index file name) selects the aircraft and an optional "id" key is
+    copied to results.
+    """
+    if fmt == "csv":
+        yield from csv.DictReader(file)
+    elif fmt == "jsonl":
+        for line in file:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    else:
+        raise NotImplementedError(
+            "unknown batch format '%s' - not in %s" % (fmt, BATCH_FORMATS)
+        )
+
+
+@profiling.staged("evaluate_scenarios")
+def evaluate_scenarios(models, rows, aircraft=None, xaxis="lever_arm", result_cache=None):
+    """Evaluate a list of scenarios, vectorized per aircraft
+
+    `models` is a {key: AircraftModel} dict, `aircraft` the key used for
+    rows without an "aircraft" key. Results of repeated loadings are taken
+    from `result_cache` (a `ResultCache`) if given. Returns result dicts in
+    input order. Rows which can't be evaluated (unknown aircraft, invalid
+    value) don't stop the others: their result has an "error" message and
+    no G.
+    """
+    groups = {}
+    for i, row in enumerate(rows):
+        key = row.get("aircraft") or aircraft
+        groups.setdefault(key, []).append(i)
+
+    results = [None] * len(rows)
+    for key, indices in groups.items():
+        try:
+            model = models[key]
+        except KeyError:
+            error = "unknown aircraft '%s'" % key if key is not None else "no aircraft"
+            for i in indices:
+                results[i] = _error_result(rows[i], key, error)
+            continue
+        values = np.tile(model.defaults, (len(indices), 1))
+        valid = []
+        for k, i in enumerate(indices):
+            try:
+                for j, designation in enumerate(model.designations):
+                    value = rows[i].get(designation)
+                    if value is not None and value != "":
+                        values[k, j] = float(value)
+            except (TypeError, ValueError):
+                error = "invalid %s value %r" % (designation, value)
+                results[i] = _error_result(rows[i], model.immat, error)
+            else:
+                valid.append(k)
+        if not valid:
+            continue
+        values = values[valid]
+        if result_cache is None:
+            evaluated = _evaluate_values(model, values, xaxis)
+        else:
+            evaluated = result_cache.evaluate_many(model, values, xaxis=xaxis)
+        for k, result in zip(valid, evaluated):
+            i = indices[k]
+            results[i] = {"id": rows[i].get("id"), **result}
+    return results
+
+
+def _error_result(row, aircraft, error):
+    # result of a row which can't be evaluated: every field but id and
+    # aircraft empty
+    result = dict.fromkeys(RESULT_FIELDS)
+    result.update(id=row.get("id"), aircraft=aircraft, error=error)
+    return result
+
+
+def _evaluate_values(model, values, xaxis):
+    # result dicts (without "id") of an (n_scenarios, n_loads) values array
+    mass, moment, lever_arm = calculate_cg_batch(model, values)
+    x = lever_arm if xaxis == "lever_arm" else moment
+    inside = model.centrogram.contains(x, mass, xaxis=xaxis)
+    margin, edge = model.centrogram.margin_and_edge(x, mass, xaxis=xaxis)
+    labels = model.centrogram.edge_labels(xaxis)
+    outside = _outside_envelopes(model, values, x, mass, inside, xaxis)
+    return [
+        {
+            "aircraft": model.immat,
+            "mass": float(mass[k]),
+            "moment": float(moment[k]),
+            "lever_arm": float(lever_arm[k]),
+            "inside": bool(inside[k]),
+            "margin": float(margin[k]),
+            "limit": labels[edge[k]],
+            "outside_envelopes": outside[k],
+        }
+        for k in range(len(mass))
+    ]
+
+
+def _outside_envelopes(model, values, x, mass, inside, xaxis):
+    # space separated names of the envelopes each scenario is outside of,
+    # `inside` being the centrogram test already done
+    envelopes = model.envelopes
+    if len(envelopes) == 1:
+        return ["" if k else envelopes.names[0] for k in inside.tolist()]
+    points = {"loaded": (x, mass)}
+    if envelopes.has_zero_fuel:
+        zf_mass, zf_moment, zf_lever_arm = calculate_cg_batch(
+            model, zero_fuel_values(model, values)
+        )
+        points["zero_fuel"] = (zf_lever_arm if xaxis == "lever_arm" else zf_moment, zf_mass)
+    inside = envelopes.contains(points, xaxis=xaxis)
+    outside = [[] for _ in range(len(mass))]
+    for name, result in inside.items():
+        for k in np.flatnonzero(~result):
+            outside[k].append(name)
+    return [" ".join(names) for names in outside]
+
+
+class ResultsWriter:
+    """Write result dicts incrementally as CSV or JSONL"""
+
+    def __init__(self, file, fmt="csv"):
+        if fmt not in BATCH_FORMATS:
+            raise NotImplementedError(
+                "unknown batch format '%s' - not in %s" % (fmt, BATCH_FORMATS)
+            )
+        self.file = file
+        self.fmt = fmt
+        self.count = 0
+        self.errors = 0
+        if fmt == "csv":
+            self._writer = csv.DictWriter(file, fieldnames=RESULT_FIELDS)
+            self._writer.writeheader()
+
+    def write(self, results):
+        if self.fmt == "csv":
+            self._writer.writerows(results)
+        else:
+            for result in results:
+                self.file.write(json.dumps(result) + "\n")
+        self.count += len(results)
+        self.errors += sum(1 for result in results if result.get("error"))
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+_worker_args = None
+
+
+def _init_worker(models, aircraft, xaxis, result_cache_size=0):
+    global _worker_args
+    if isinstance(models, FleetDatabase):
+        # pickled as its file name: workers map the same pages
+        models = models.models()
+    result_cache = None
+    if result_cache_size:
+        from .memo import ResultCache
+
+        result_cache = ResultCache(result_cache_size)
+    _worker_args = (models, aircraft, xaxis, result_cache)
+
+
+def _evaluate_chunk(rows, aircraft=None, xaxis=None):
+    models, default_aircraft, default_xaxis, result_cache = _worker_args
+    return evaluate_scenarios(
+        models,
+        rows,
+        aircraft=aircraft or default_aircraft,
+        xaxis=xaxis or default_xaxis,
+        result_cache=result_cache,
+    )
+
+
+def process_scenarios(
+    models,
+    rows,
+    write,
+    aircraft=None,
+    xaxis="lever_arm",
+    chunk_size=1000,
+    workers=None,
+    result_cache_size=0,
+):
+    """Evaluate a stream of scenarios chunk by chunk and `write` results
+
+    Memory use only depends on `chunk_size` (and `workers`): with `workers`
+    processes, at most 2 chunks per worker are in flight and results are
+    written in input order. `models` is a {key: AircraftModel} dict or a
+    `FleetDatabase`, which workers map rather than receive a copy of.
+    With `result_cache_size`, results of the last loadings are memoized
+    (one `ResultCache` per process).
+    """
+    worker_models = models
+    if isinstance(models, FleetDatabase):
+        models = models.models()
+    chunks = _chunked(rows, chunk_size)
+    if not workers or workers <= 1:
+        result_cache = None
+        if result_cache_size:
+            from .memo import ResultCache
+
+            result_cache = ResultCache(result_cache_size)
+        for chunk in chunks:
+            write(
+                evaluate_scenarios(
+                    models, chunk, aircraft=aircraft, xaxis=xaxis, result_cache=result_cache
+                )
+            )
+        return
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(worker_models, aircraft, xaxis, result_cache_size),
+    ) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_evaluate_chunk, chunk))
+            if len(pending) >= 2 * workers:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
@@ -0,0 +1,95 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+# bump when the layout of cached objects (munch config, AircraftModel) changes
+CACHE_FORMAT_VERSION = 2
+DEFAULT_CACHE_DIRNAME = ".wnb_cache"
+
+
+def read_source(filename):
+    """Read a config file once: return (content, stat, sha256 hex digest)"""
+    with open(filename, "rb") as file:
+        stat = os.fstat(file.fileno())
+        content = file.read()
+    return content, stat, hashlib.sha256(content).hexdigest()
+
+
+class ConfigCache:
+    """On-disk cache of compiled aircraft configs
+
+    Entries are keyed on the absolute path of the source file, its
+    modification time and the sha256 hash of its content. They are stored
+    in `cache_dir` or, if `cache_dir` is None, in a `.wnb_cache` directory
+    next to the data.
+    Entries are pickles: only use a cache directory you trust.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, filename):
+        path = os.path.abspath(filename)
+        if self.cache_dir is None:
+            directory, basename = os.path.split(path)
+            return os.path.join(directory, DEFAULT_CACHE_DIRNAME, basename + ".pickle")
+        name = hashlib.sha1(path.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, name + ".pickle")
+
+    def get(self, filename, stat, digest):
+        """Return the cached object or None"""
+        try:
+            with open(self.entry_path(filename), "rb") as file:
+                entry = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            self.misses += 1
+            return None
+        if (
+            entry.get("version") != CACHE_FORMAT_VERSION
+            or entry.get("path") != os.path.abspath(filename)
+            or entry.get("sha256") != digest
+        ):
+            self.misses += 1
+            return None
+        if entry.get("mtime_ns") != stat.st_mtime_ns:
+            # touched but unchanged: refresh the key
+            self.put(filename, stat, digest, entry["value"])
+        self.hits += 1
+        return entry["value"]
+
+    def put(self, filename, stat, digest, value):
+        entry = {
+            "version": CACHE_FORMAT_VERSION,
+            "path": os.path.abspath(filename),
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest,
+            "value": value,
+        }
+        entry_path = self.entry_path(filename)
+        directory = os.path.dirname(entry_path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        except OSError:
+            # a read-only data directory must not prevent loading
+            return
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, entry_path)
+        except (OSError, pickle.PicklingError, TypeError, AttributeError):
+            # best effort: an entry which can't be written is a miss next time
+            pass
+        finally:
+            # not renamed (error, interrupt...): no partial file is left
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def clear(self, filename):
+        try:
+            os.remove(self.entry_path(filename))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,129 @@
+"""
+Precompiled translation catalogs
+
+The `translations/<domain>.<locale>.yml` files of a locale are compiled
+once into a flat {key: message} dict. Unlike python-i18n, a lookup is a
+single dict access.
+"""
+
+import glob
+import os
+from functools import lru_cache
+
+TRANSLATIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "translations")
+DEFAULT_LOCALE = "en"
+
+
+class Catalog:
+    """Messages of a locale"""
+
+    __slots__ = ("locale", "messages")
+
+    def __init__(self, locale, messages):
+        self.locale = locale
+        self.messages = messages
+
+    def __repr__(self):
+        return "<Catalog %s with %d messages>" % (self.locale, len(self.messages))
+
+    def t(self, key, **kwargs):
+        """Translate `key` (returned as is if unknown), formatted with kwargs"""
+        text = self.messages.get(key, key)
+        if kwargs:
+            return text.format(**kwargs)
+        return text
+
+
+def available_locales(path=TRANSLATIONS_PATH):
+    locales = set()
+    for filename in glob.glob(os.path.join(path, "*.*.yml")):
+        locales.add(os.path.basename(filename).split(".")[-2])
+    return sorted(locales)
+
+
+def detect_locale(default=DEFAULT_LOCALE, path=TRANSLATIONS_PATH):
+    """Two letters language of the current locale, `default` if unknown or
+    not translated"""
+    import locale
+
+    try:
+        language = locale.getlocale()[0]
+    except ValueError:
+        language = None
+    if not language:
+        for name in ["LC_ALL", "LC_MESSAGES", "LANG"]:
+            language = os.environ.get(name)
+            if language:
+                break
+    if not language or language in ["C", "POSIX"]:
+        return default
+    language = language[:2].lower()
+    if language not in available_locales(path):
+        return default
+    return language
+
+
+def _flatten(data, prefix=""):
+    messages = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            messages.update(_flatten(value, prefix + key + "."))
+        else:
+            messages[prefix + str(key)] = value
+    return messages
+
+
+def _compile_file(filename, locale, cache):
+    import yaml
+
+    from .cache import read_source
+    from .wnb import YAML_LOADER_DEFAULT
+
+    content, stat, digest = read_source(filename)
+    if cache is not None:
+        messages = cache.get(filename, stat, digest)
+        if messages is not None:
+            return messages
+    data = yaml.load(content, Loader=YAML_LOADER_DEFAULT) or {}
+    messages = _flatten(data.get(locale) or {})
+    if cache is not None:
+        cache.put(filename, stat, digest, messages)
+    return messages
+
+
+def compile_catalog(locale, path=TRANSLATIONS_PATH, cache=None):
+    """Compile the messages of `locale` (missing ones from the default locale)
+
+    `cache` (a `ConfigCache` or a cache directory) keeps compiled files on
+    disk, along with compiled aircraft configs.
+    """
+    if cache is not None:
+        from .wnb import _as_cache
+
+        cache = _as_cache(cache)
+    messages = {}
+    locales = [locale] if locale == DEFAULT_LOCALE else [DEFAULT_LOCALE, locale]
+    for loc in locales:
+        for filename in sorted(glob.glob(os.path.join(path, "*.%s.yml" % loc))):
+            messages.update(_compile_file(filename, loc, cache))
+    return Catalog(locale, messages)
+
+
+@lru_cache(maxsize=None)
+def _get_catalog(locale, path, cache):
+    return compile_catalog(locale, path=path, cache=cache)
+
+
+def get_catalog(locale=None, path=TRANSLATIONS_PATH, cache=None):
+    """Compiled catalog of `locale` (default: detected), kept in memory
+
+    `cache` (a `ConfigCache` or a cache directory) also keeps compiled files
+    on disk.
+    """
+    if locale is None:
+        locale = detect_locale(path=path)
+    return _get_catalog(locale, path, cache)
+
+
+def t(key, locale=None, **kwargs):
+    return get_catalog(locale).t(key, **kwargs)
@@ -0,0 +1,252 @@
+from functools import lru_cache
+
+import numpy as np
+
+from . import profiling
+
+ALLOWED_XAXIS = ["lever_arm", "moment"]
+
+# below this number of vertices, a single point is tested with the pure Python
+# kernel which is faster than going through shapely
+SMALL_POLYGON_VERTICES = 16
+
+
+def point_in_polygon(x, y, vertices):
+    """Even-odd point in polygon test (without any dependency)
+
+    Points on the boundary are considered outside, like `Polygon.contains`.
+    """
+    inside = False
+    x1, y1 = vertices[-1]
+    for x2, y2 in vertices:
+        if (
+            min(x1, x2) <= x <= max(x1, x2)
+            and min(y1, y2) <= y <= max(y1, y2)
+            and (x2 - x1) * (y - y1) == (y2 - y1) * (x - x1)
+        ):
+            return False
+        if (y1 > y) != (y2 > y):
+            x_cross = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+            if x < x_cross:
+                inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+class Centrogram:
+    """Centrogram geometry built once per aircraft
+
+    Holds vertices and prepared polygons for both lever arm and moment axes.
+    """
+
+    def __init__(self, lever_arm, mass, moment=None):
+        self.lever_arm = np.asarray(lever_arm, dtype=float)
+        self.mass = np.asarray(mass, dtype=float)
+        if moment is None:
+            moment = self.lever_arm * self.mass
+        self.moment = np.asarray(moment, dtype=float)
+        self._vertices = {}
+        self._polygons = {}
+        self._edges = {}
+
+    @classmethod
+    def from_points(cls, centrogram):
+        """Build (or get from cache) a centrogram from a list of config points"""
+        key = tuple((pt.lever_arm, pt.mass, pt.moment) for pt in centrogram)
+        return _centrogram_from_key(key)
+
+    def __len__(self):
+        return len(self.mass)
+
+    def __getstate__(self):
+        # prepared polygons are rebuilt on demand
+        return {"lever_arm": self.lever_arm, "mass": self.mass, "moment": self.moment}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def x(self, xaxis="lever_arm"):
+        if xaxis == "lever_arm":
+            return self.lever_arm
+        elif xaxis == "moment":
+            return self.moment
+        else:
+            raise NotImplementedError(
+                "unknown x-axis '%s' - not in %s" % (xaxis, ALLOWED_XAXIS)
+            )
+
+    def vertices(self, xaxis="lever_arm"):
+        """List of (x, mass) tuples"""
+        try:
+            return self._vertices[xaxis]
+        except KeyError:
+            vertices = list(zip(self.x(xaxis).tolist(), self.mass.tolist()))
+            self._vertices[xaxis] = vertices
+            return vertices
+
+    def polygon(self, xaxis="lever_arm"):
+        """Prepared shapely polygon"""
+        try:
+            return self._polygons[xaxis]
+        except KeyError:
+            with profiling.stage("shapely"):
+                import shapely
+
+                polygon = shapely.Polygon(self.vertices(xaxis))
+                shapely.prepare(polygon)
+            self._polygons[xaxis] = polygon
+            return polygon
+
+    def contains(self, x, y, xaxis="lever_arm"):
+        """Vectorized containment test of (x, mass) points"""
+        import shapely
+
+        return shapely.contains_xy(self.polygon(xaxis), x, y)
+
+    def contains_point(self, x, y, xaxis="lever_arm"):
+        if len(self) <= SMALL_POLYGON_VERTICES:
+            return point_in_polygon(x, y, self.vertices(xaxis))
+        return bool(self.contains(x, y, xaxis=xaxis))
+
+    def extent(self, xaxis="lever_arm"):
+        """(width, height) of the centrogram bounding box"""
+        x = self.x(xaxis)
+        return (x.max() - x.min(), self.mass.max() - self.mass.min())
+
+    def edges(self, xaxis="lever_arm"):
+        """Precomputed `Edges` geometry (in coordinates scaled by the extent)"""
+        try:
+            return self._edges[xaxis]
+        except KeyError:
+            width, height = self.extent(xaxis)
+            edges = Edges(self.x(xaxis) / width, self.mass / height, (width, height))
+            self._edges[xaxis] = edges
+            return edges
+
+    def edge_labels(self, xaxis="lever_arm"):
+        """Limit of each edge ("forward", "aft", "max_mass" or "min_mass",
+        None for a zero length edge), edge i going from vertex i to i + 1"""
+        return self.edges(xaxis).labels
+
+    def margin(self, x, y, xaxis="lever_arm"):
+        """Signed distance of (x, mass) points to the centrogram boundary
+
+        Positive inside, negative outside. Both axes are scaled by the
+        centrogram extent: a margin of 0.1 is 10% of the envelope
+        width/height.
+        """
+        return self.margin_and_edge(x, y, xaxis=xaxis)[0]
+
+    def margin_and_edge(self, x, y, xaxis="lever_arm"):
+        """Signed distance (see `margin`) and index of the binding (nearest)
+        edge of (x, mass) points"""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        edges = self.edges(xaxis)
+        if edges.convex:
+            return edges.signed_distance(x, y)
+        distance, edge = edges.distance(x, y)
+        inside = self.contains(x, y, xaxis=xaxis)
+        return np.where(inside, distance, -distance), edge
+
+
+class Edges:
+    """Edge geometry of a polygon: vertices, directions, outward unit
+    normals and offsets (n . p = offset on the edge line)"""
+
+    # points processed at once, bounding memory to about
+    # BLOCK_SIZE * number of edges floats
+    BLOCK_SIZE = 1 << 20
+
+    def __init__(self, x, y, scale=(1.0, 1.0)):
+        x1 = np.asarray(x, dtype=float)
+        y1 = np.asarray(y, dtype=float)
+        dx = np.roll(x1, -1) - x1
+        dy = np.roll(y1, -1) - y1
+        self.length2 = dx * dx + dy * dy
+        # zero length edges (e.g. closing point repeated) are ignored
+        self.valid = self.length2 > 0
+        length = np.sqrt(np.where(self.valid, self.length2, 1.0))
+        orientation = 1.0 if _signed_area(x1, y1) >= 0 else -1.0
+        self.nx = orientation * dy / length
+        self.ny = -orientation * dx / length
+        self.offset = self.nx * x1 + self.ny * y1
+        self.x1, self.y1, self.dx, self.dy = x1, y1, dx, dy
+        self.scale = scale
+        self.convex = _is_convex(x1[self.valid], y1[self.valid])
+        self.labels = [
+            None
+            if not valid
+            else ("aft" if nx > 0 else "forward")
+            if abs(nx) >= abs(ny)
+            else ("max_mass" if ny > 0 else "min_mass")
+            for nx, ny, valid in zip(self.nx, self.ny, self.valid)
+        ]
+
+    def _blocks(self, x, y):
+        x = np.ravel(x) / self.scale[0]
+        y = np.ravel(y) / self.scale[1]
+        block = max(1, self.BLOCK_SIZE // max(len(self.x1), 1))
+        for start in range(0, len(x), block):
+            yield x[start : start + block, np.newaxis], y[start : start + block, np.newaxis]
+
+    def distance(self, x, y):
+        """Distance to the nearest edge (segment) and its index"""
+        shape = np.shape(x)
+        distances, indices = [], []
+        for px, py in self._blocks(x, y):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = ((px - self.x1) * self.dx + (py - self.y1) * self.dy) / self.length2
+            t = np.clip(np.where(self.valid, t, 0.0), 0.0, 1.0)
+            d = np.hypot(px - (self.x1 + t * self.dx), py - (self.y1 + t * self.dy))
+            d = np.where(self.valid, d, np.inf)
+            index = d.argmin(axis=1)
+            indices.append(index)
+            distances.append(d[np.arange(len(index)), index])
+        return _concatenate(distances, shape), _concatenate(indices, shape, dtype=int)
+
+    def signed_distance(self, x, y):
+        """Signed distance (positive inside) and binding edge index, convex
+        polygons only"""
+        shape = np.shape(x)
+        distances, indices = [], []
+        for px, py in self._blocks(x, y):
+            # distance to each edge line, positive on the inner side
+            h = self.offset - (self.nx * px + self.ny * py)
+            h = np.where(self.valid, h, np.inf)
+            index = h.argmin(axis=1)
+            distance = h[np.arange(len(index)), index]
+            outside = distance <= 0
+            if outside.any():
+                d, i = self.distance(
+                    px[outside, 0] * self.scale[0], py[outside, 0] * self.scale[1]
+                )
+                distance[outside] = -d
+                index[outside] = i
+            distances.append(distance)
+            indices.append(index)
+        return _concatenate(distances, shape), _concatenate(indices, shape, dtype=int)
+
+
+def _concatenate(arrays, shape, dtype=float):
+    if not arrays:
+        return np.zeros(shape, dtype=dtype)
+    return np.concatenate(arrays).reshape(shape)
+
+
+def _signed_area(x, y):
+    return 0.5 * (np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+
+def _is_convex(x, y):
+    dx = np.roll(x, -1) - x
+    dy = np.roll(y, -1) - y
+    cross = dx * np.roll(dy, -1) - dy * np.roll(dx, -1)
+    cross = cross[np.abs(cross) > 1e-12]
+    return bool(np.all(cross > 0) or np.all(cross < 0))
+
+
+@lru_cache(maxsize=256)
+def _centrogram_from_key(key):
+    lever_arm, mass, moment = zip(*key)
+    return Centrogram(lever_arm, mass, moment)
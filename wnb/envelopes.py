@@ -0,0 +1,190 @@
+from collections import namedtuple
+
+import numpy as np
+
+from . import profiling
+from .centrogram import Centrogram
+
+ALLOWED_XAXIS = ["lever_arm", "moment"]
+# G the envelope applies to: the loaded aircraft or the aircraft without
+# liquid (volume) loads
+ENVELOPE_CONDITIONS = ["loaded", "zero_fuel"]
+# name of the envelope given by the "centrogram" list of a config
+DEFAULT_ENVELOPE = "normal"
+# from this number of envelopes per condition, batches go through a shapely
+# STRtree instead of a bounding box prefilter
+STRTREE_MIN_ENVELOPES = 8
+
+Envelope = namedtuple("Envelope", ["name", "condition", "centrogram"])
+
+
+class EnvelopeSet:
+    """Named envelopes of an aircraft, checked all at once
+
+    The first envelope is the "centrogram" of the config, others come from
+    its optional "envelopes" list.
+    """
+
+    def __init__(self, envelopes):
+        self.envelopes = tuple(envelopes)
+        names = [envelope.name for envelope in self.envelopes]
+        if len(set(names)) != len(names):
+            raise ValueError("duplicate envelope names in %s" % names)
+        for envelope in self.envelopes:
+            if envelope.condition not in ENVELOPE_CONDITIONS:
+                raise NotImplementedError(
+                    "unknown envelope condition '%s' - not in %s"
+                    % (envelope.condition, ENVELOPE_CONDITIONS)
+                )
+        self._trees = {}
+
+    @classmethod
+    def from_config(cls, cfg):
+        envelopes = [
+            Envelope(DEFAULT_ENVELOPE, "loaded", Centrogram.from_points(cfg.centrogram))
+        ]
+        for envelope in cfg.get("envelopes", []):
+            envelopes.append(
+                Envelope(
+                    envelope.name,
+                    envelope.get("condition", "loaded"),
+                    Centrogram.from_points(envelope.points),
+                )
+            )
+        return cls(envelopes)
+
+    def __len__(self):
+        return len(self.envelopes)
+
+    def __iter__(self):
+        return iter(self.envelopes)
+
+    def __getitem__(self, name):
+        for envelope in self.envelopes:
+            if envelope.name == name:
+                return envelope
+        raise KeyError(name)
+
+    def __getstate__(self):
+        # STRtrees are rebuilt on demand
+        return {"envelopes": self.envelopes}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def names(self):
+        return [envelope.name for envelope in self.envelopes]
+
+    @property
+    def has_zero_fuel(self):
+        return any(envelope.condition == "zero_fuel" for envelope in self.envelopes)
+
+    def _tree(self, condition, xaxis):
+        key = (condition, xaxis)
+        try:
+            return self._trees[key]
+        except KeyError:
+            import shapely
+
+            indices = [
+                i
+                for i, envelope in enumerate(self.envelopes)
+                if envelope.condition == condition
+            ]
+            polygons = [self.envelopes[i].centrogram.polygon(xaxis) for i in indices]
+            self._trees[key] = (np.array(indices), shapely.STRtree(polygons))
+            return self._trees[key]
+
+    def contains_point(self, G, G_zero_fuel=None, xaxis="lever_arm"):
+        """{envelope name: bool} for a G (and zero fuel G) munch point"""
+        inside = {}
+        for envelope in self.envelopes:
+            point = G_zero_fuel if envelope.condition == "zero_fuel" else G
+            if point is None:
+                raise ValueError("envelope '%s' needs zero fuel G" % envelope.name)
+            inside[envelope.name] = envelope.centrogram.contains_point(
+                point[xaxis], point.mass, xaxis=xaxis
+            )
+        return inside
+
+    @profiling.staged("envelopes")
+    def contains(self, points, xaxis="lever_arm"):
+        """Vectorized containment test in every envelope
+
+        `points` is a {condition: (x, mass)} dict of arrays. Returns a
+        {envelope name: bool array} dict.
+        """
+        if xaxis not in ALLOWED_XAXIS:
+            raise NotImplementedError(
+                "unknown x-axis '%s' - not in %s" % (xaxis, ALLOWED_XAXIS)
+            )
+        import shapely
+
+        inside = {}
+        for condition in ENVELOPE_CONDITIONS:
+            envelopes = [e for e in self.envelopes if e.condition == condition]
+            if not envelopes:
+                continue
+            if condition not in points:
+                raise ValueError("envelopes '%s' need %s G" % (envelopes[0].name, condition))
+            x, mass = (np.asarray(a, dtype=float) for a in points[condition])
+            if len(envelopes) >= STRTREE_MIN_ENVELOPES:
+                indices, tree = self._tree(condition, xaxis)
+                geometries = shapely.points(x.ravel(), mass.ravel())
+                point_index, tree_index = tree.query(geometries, predicate="within")
+                for i in indices:
+                    inside[self.envelopes[i].name] = np.zeros(x.shape, dtype=bool)
+                for k in np.unique(tree_index):
+                    found = np.zeros(x.size, dtype=bool)
+                    found[point_index[tree_index == k]] = True
+                    inside[self.envelopes[indices[k]].name] = found.reshape(x.shape)
+                continue
+            for envelope in envelopes:
+                centrogram = envelope.centrogram
+                ex = centrogram.x(xaxis)
+                candidates = (
+                    (x > ex.min())
+                    & (x < ex.max())
+                    & (mass > centrogram.mass.min())
+                    & (mass < centrogram.mass.max())
+                )
+                result = np.zeros(x.shape, dtype=bool)
+                if candidates.any():
+                    result[candidates] = centrogram.contains(
+                        x[candidates], mass[candidates], xaxis=xaxis
+                    )
+                inside[envelope.name] = result
+        return {name: inside[name] for name in self.names}
+
+
+def zero_fuel_values(model, values):
+    """Copy of the (n_scenarios, n_loads) `values` with liquid loads emptied"""
+    from .model import LOAD_KIND_VOLUME
+
+    values = np.array(values, dtype=float)
+    values[..., model.kinds == LOAD_KIND_VOLUME] = 0.0
+    return values
+
+
+def evaluate_envelopes(cfg, values, xaxis="lever_arm"):
+    """Check loading scenarios against every envelope of an aircraft
+
+    `cfg` is an aircraft config or an `AircraftModel`, `values` an
+    (n_scenarios, n_loads) array (see `calculate_cg_batch`). Returns a
+    {envelope name: bool array} dict, zero fuel envelopes being checked
+    with G computed without liquid loads.
+    """
+    from .batch import calculate_cg_batch
+    from .wnb import get_aircraft_model
+
+    model = get_aircraft_model(cfg)
+    envelopes = model.envelopes
+    mass, moment, lever_arm = calculate_cg_batch(model, values)
+    points = {"loaded": (lever_arm if xaxis == "lever_arm" else moment, mass)}
+    if envelopes.has_zero_fuel:
+        mass, moment, lever_arm = calculate_cg_batch(
+            model, zero_fuel_values(model, values)
+        )
+        points["zero_fuel"] = (lever_arm if xaxis == "lever_arm" else moment, mass)
+    return envelopes.contains(points, xaxis=xaxis)
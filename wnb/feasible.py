@@ -0,0 +1,204 @@
+"""
+Feasible centre of gravity region over load ranges
+
+When every adjustable load varies in its [min, max] range, the reachable
+(moment, mass) points are the Minkowski sum of one segment per load: a
+zonotope. In lever arm space (lever_arm = moment / mass) its edges become
+hyperbola arcs, which are approximated by `samples_per_edge` chords each.
+Arcs stay within `FeasibleRegion.tolerance` (in lever arm, computed
+exactly) of their chords: `always_legal` and `never_legal` only answer True
+when this holds with that margin, areas and plots are approximate.
+"""
+
+import numpy as np
+import shapely
+from shapely.geometry import LineString, Point
+from shapely.geometry.polygon import Polygon
+
+from .wnb import get_aircraft_model
+
+# number of points per zonotope edge in lever arm space
+SAMPLES_PER_EDGE = 16
+
+
+def zonotope_vertices(center, generators):
+    """Vertices (counterclockwise) of center + sum(t_i * g_i), t_i in [0, 1]
+
+    Generators must point upwards (positive mass). `center` is the lowest
+    vertex.
+    """
+    center = np.asarray(center, dtype=float)
+    generators = np.asarray(generators, dtype=float).reshape(-1, 2)
+    angles = np.arctan2(generators[:, 1], generators[:, 0])
+    generators = generators[np.argsort(angles, kind="stable")]
+    edges = np.concatenate([generators, -generators])
+    return center + np.concatenate([[[0.0, 0.0]], np.cumsum(edges, axis=0)[:-1]])
+
+
+class FeasibleRegion:
+    """Reachable (x, mass) set and its intersection with the centrogram"""
+
+    def __init__(self, model, moment_vertices, samples_per_edge=SAMPLES_PER_EDGE):
+        self.model = model
+        self.moment_vertices = moment_vertices
+        self.samples_per_edge = samples_per_edge
+        self._reachable = {}
+        self._legal = {}
+
+    def vertices(self, xaxis="lever_arm"):
+        """(n, 2) array of (x, mass) vertices of the reachable set"""
+        return _map_xaxis(self.moment_vertices, xaxis, self.samples_per_edge, closed=True)
+
+    @property
+    def is_degenerate(self):
+        """True if the reachable set is a segment or a point (no area)"""
+        return _area(self.moment_vertices) == 0
+
+    def tolerance(self, xaxis="lever_arm"):
+        """Largest x distance between the reachable set boundary and its
+        chords (0 in moment space, where the set is exact)"""
+        if xaxis == "moment":
+            return 0.0
+        if self.is_degenerate:
+            half = self.moment_vertices[: len(self.moment_vertices) // 2 + 1]
+            points = _sample_edges(half, self.samples_per_edge, closed=False)
+        else:
+            points = _sample_edges(self.moment_vertices, self.samples_per_edge, closed=True)
+            points = np.concatenate([points, points[:1]])
+        return _chord_tolerance(points[:-1], points[1:])
+
+    def reachable(self, xaxis="lever_arm"):
+        """Reachable set as a shapely Polygon (LineString or Point if degenerate)"""
+        try:
+            return self._reachable[xaxis]
+        except KeyError:
+            pass
+        if not self.is_degenerate:
+            geometry = Polygon(self.vertices(xaxis))
+        else:
+            # vertices go up along the generators then back down
+            half = self.moment_vertices[: len(self.moment_vertices) // 2 + 1]
+            points = _map_xaxis(half, xaxis, self.samples_per_edge, closed=False)
+            if len(points) > 1:
+                geometry = LineString(points)
+            else:
+                geometry = Point(points[0])
+        self._reachable[xaxis] = geometry
+        return geometry
+
+    def legal(self, xaxis="lever_arm"):
+        """Reachable points inside the centrogram"""
+        try:
+            return self._legal[xaxis]
+        except KeyError:
+            legal = self.reachable(xaxis).intersection(self.model.centrogram.polygon(xaxis))
+            self._legal[xaxis] = legal
+            return legal
+
+    def _bounds(self, xaxis):
+        # reachable set grown by the tolerance: it holds the exact set
+        tolerance = self.tolerance(xaxis)
+        reachable = self.reachable(xaxis)
+        return reachable.buffer(tolerance) if tolerance > 0 else reachable
+
+    def always_legal(self, xaxis="lever_arm"):
+        """True if every load combination gives G inside the centrogram
+
+        False when the reachable set comes within `tolerance` of the
+        centrogram boundary.
+        """
+        return self.model.centrogram.polygon(xaxis).contains(self._bounds(xaxis))
+
+    def never_legal(self, xaxis="lever_arm"):
+        """True if no load combination gives G inside the centrogram
+
+        False when the reachable set comes within `tolerance` of the
+        centrogram.
+        """
+        return not self.model.centrogram.polygon(xaxis).intersects(self._bounds(xaxis))
+
+    def legal_fraction(self, xaxis="lever_arm"):
+        """Area (length if degenerate) of the legal region relative to the
+        reachable region"""
+        reachable = self.reachable(xaxis)
+        if reachable.geom_type == "Point":
+            return float(self.always_legal(xaxis))
+        if reachable.geom_type == "LineString":
+            return self.legal(xaxis).length / reachable.length
+        return self.legal(xaxis).area / reachable.area
+
+    def rings(self, xaxis="lever_arm", which="reachable"):
+        """Closed (xs, ys) lists of each exterior ring, for plotting"""
+        geometry = self.reachable(xaxis) if which == "reachable" else self.legal(xaxis)
+        rings = []
+        for part in shapely.get_parts(geometry):
+            if part.geom_type == "Polygon":
+                xs, ys = part.exterior.xy
+            elif part.geom_type in ["LineString", "Point"]:
+                xs, ys = part.xy
+            else:
+                continue
+            rings.append((list(xs), list(ys)))
+        return rings
+
+
+def _area(vertices):
+    x, y = vertices[:, 0], vertices[:, 1]
+    return 0.5 * abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1)))
+
+
+def _sample_edges(vertices, samples_per_edge, closed):
+    # points along the edges of a moment space polygon (polyline if not closed)
+    start = vertices if closed else vertices[:-1]
+    end = np.roll(vertices, -1, axis=0) if closed else vertices[1:]
+    t = np.linspace(0.0, 1.0, samples_per_edge, endpoint=False)
+    points = start[:, np.newaxis, :] + t[:, np.newaxis] * (end - start)[:, np.newaxis, :]
+    points = points.reshape(-1, 2)
+    if not closed:
+        points = np.concatenate([points, vertices[-1:]])
+    return points
+
+
+def _chord_tolerance(start, end):
+    # (moment, mass) segments map to arcs lever_arm = k + c / mass, at most
+    # |c| (sqrt(m2) - sqrt(m1))^2 / (m1 m2) away from their chord (reached
+    # at mass sqrt(m1 m2)); constant mass segments stay straight
+    (M1, m1), (M2, m2) = start.T, end.T
+    dm = m2 - m1
+    curved = dm != 0
+    c = M1[curved] - m1[curved] * (M2 - M1)[curved] / dm[curved]
+    gap = (np.sqrt(m2[curved]) - np.sqrt(m1[curved])) ** 2 / (m1[curved] * m2[curved])
+    return float(np.max(np.abs(c) * gap, initial=0.0))
+
+
+def _map_xaxis(vertices, xaxis, samples_per_edge, closed):
+    # moment space vertices to (x, mass) points, sampling edges in lever arm space
+    if xaxis == "moment":
+        return vertices
+    points = _sample_edges(vertices, samples_per_edge, closed)
+    return np.column_stack([points[:, 0] / points[:, 1], points[:, 1]])
+
+
+def feasible_region(cfg, values=None, free=None, samples_per_edge=SAMPLES_PER_EDGE):
+    """Region of G reachable when loads vary in their [min, max] range
+
+    `cfg` is an aircraft config or an `AircraftModel`. Loads listed in `free`
+    (indices, default: every adjustable load) vary, others are fixed to
+    `values` (default: load defaults).
+    """
+    model = get_aircraft_model(cfg)
+    if values is None:
+        values = model.default_values()
+    values = np.asarray(values, dtype=float)
+    free_mask = np.zeros(len(model), dtype=bool)
+    if free is None:
+        free_mask[:] = model.adjustable
+    else:
+        free_mask[list(free)] = True
+
+    low = np.where(free_mask, model.mins, values) * model.factors
+    span = np.where(free_mask, model.maxs - model.mins, 0.0) * model.factors
+    center = [np.sum(low * model.lever_arms), np.sum(low)]
+    generators = np.column_stack([span * model.lever_arms, span])[span > 0]
+    vertices = zonotope_vertices(center, generators)
+    return FeasibleRegion(model, vertices, samples_per_edge=samples_per_edge)
@@ -0,0 +1,156 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from .wnb import (
+    YAML_LOADER_DEFAULT,
+    get_aircraft_model,
+    load_aircraft_config,
+    load_aircrafts_index,
+)
+
+ALLOWED_EXECUTORS = ["thread", "process"]
+
+
+def _load_aircraft(filename, Loader, cache):
+    cfg = load_aircraft_config(filename, Loader=Loader, cache=cache)
+    # compiling also checks loads (liquids, mass/volume)
+    return cfg, get_aircraft_model(cfg)
+
+
+class Fleet:
+    """Aircrafts of an `aircrafts-index` file
+
+    Aircraft configs are loaded lazily on first access (`fleet[i]`,
+    `fleet["f-bubk.yml"]`, `fleet.find("F-BUBK")`) or all at once,
+    concurrently, with `load_all`.
+    """
+
+    def __init__(self, filename, Loader=YAML_LOADER_DEFAULT, cache=None):
+        self.filename = filename
+        self.index = load_aircrafts_index(filename, Loader=Loader)
+        self.index_path, _ = os.path.split(filename)
+        self.Loader = Loader
+        self.cache = cache
+        self.names = list(self.index.aircrafts)
+        self.errors = {}
+        self._configs = {}
+        self._lock = threading.Lock()
+
+    @property
+    def title(self):
+        return self.index.title
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        for name in self.names:
+            yield self[name]
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def path(self, name):
+        return os.path.join(self.index_path, name)
+
+    def is_loaded(self, name):
+        return name in self._configs
+
+    def __getitem__(self, key):
+        """Aircraft config by position in the index or by file name"""
+        name = self.names[key] if isinstance(key, int) else key
+        try:
+            return self._configs[name]
+        except KeyError:
+            pass
+        if name not in self.names:
+            raise KeyError(name)
+        cfg, _ = _load_aircraft(self.path(name), self.Loader, self.cache)
+        with self._lock:
+            # keep the first one if loaded concurrently
+            return self._configs.setdefault(name, cfg)
+
+    def model(self, key):
+        return get_aircraft_model(self[key])
+
+    def replace(self, name, cfg):
+        """Swap in a new config of an aircraft
+
+        Users of the previous config (and model) keep it: it is not modified.
+        """
+        if name not in self.names:
+            raise KeyError(name)
+        with self._lock:
+            self._configs[name] = cfg
+            self.errors.pop(name, None)
+
+    def reload_index(self):
+        """Read the index file again: return (added, removed) file names
+
+        Configs of removed aircrafts are dropped, added ones are loaded on
+        first access.
+        """
+        index = load_aircrafts_index(self.filename, Loader=self.Loader)
+        names = list(index.aircrafts)
+        added = [name for name in names if name not in self.names]
+        removed = [name for name in self.names if name not in names]
+        with self._lock:
+            self.index = index
+            self.names = names
+            for name in removed:
+                self._configs.pop(name, None)
+                self.errors.pop(name, None)
+        return added, removed
+
+    def find(self, immat):
+        """Aircraft config by immatriculation (loads configs until found)"""
+        for cfg in list(self._configs.values()):
+            if cfg.aircraft.immat == immat:
+                return cfg
+        for name in self.names:
+            if name in self._configs or name in self.errors:
+                continue
+            cfg = self[name]
+            if cfg.aircraft.immat == immat:
+                return cfg
+        raise KeyError(immat)
+
+    def load_all(self, max_workers=None, executor="thread", progress=None):
+        """Load and check every aircraft config concurrently
+
+        `executor` is "thread" or "process". `progress(done, total, name,
+        error)` is called as each file completes. Errors don't stop loading:
+        they are returned (and kept in `errors`) as a {name: exception} dict.
+        """
+        if executor == "thread":
+            pool_class = ThreadPoolExecutor
+        elif executor == "process":
+            pool_class = ProcessPoolExecutor
+        else:
+            raise NotImplementedError(
+                "unknown executor '%s' - not in %s" % (executor, ALLOWED_EXECUTORS)
+            )
+        todo = [name for name in self.names if name not in self._configs]
+        total = len(todo)
+        errors = {}
+        with pool_class(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(_load_aircraft, self.path(name), self.Loader, self.cache): name
+                for name in todo
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                name = futures[future]
+                error = future.exception()
+                if error is not None:
+                    errors[name] = error
+                else:
+                    cfg, model = future.result()
+                    # a model compiled in another process is not attached yet
+                    object.__setattr__(cfg, "_aircraft_model", model)
+                    with self._lock:
+                        self._configs.setdefault(name, cfg)
+                if progress is not None:
+                    progress(done, total, name, error)
+        self.errors.update(errors)
+        return errors
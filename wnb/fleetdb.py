@@ -0,0 +1,330 @@
+"""
+Compact binary fleet database
+
+A single file holds the compiled data of every aircraft of an
+`aircrafts-index`: metadata in a JSON header, load tables, load kinds and
+envelope vertices in flat arrays with offset tables. Layout:
+
+    magic (8 bytes) | version (uint32) | reserved (uint32) | header size (uint64)
+    JSON header | arrays, each aligned on 64 bytes
+
+The reader memory-maps the file: arrays are read-only views of the
+mapping (pages are shared by processes reading the same file) and
+`AircraftModel`s are built from them without copy.
+"""
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from .cache import read_source
+from .centrogram import Centrogram
+from .envelopes import Envelope, EnvelopeSet
+from .model import AircraftModel
+from .wnb import (
+    YAML_LOADER_DEFAULT,
+    get_aircraft_model,
+    load_aircraft_config,
+    load_aircrafts_index,
+)
+
+MAGIC = b"WNBFLEET"
+FLEETDB_FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct("<8sIIQ")
+
+# name: dtype of the flat arrays
+_ARRAYS = {
+    # (6, n_loads) tables of each aircraft, flattened one after the other
+    "tables": "<f8",
+    "kinds": "i1",
+    "adjustable": "?",
+    # start of the loads of aircraft i (n_aircrafts + 1 entries)
+    "load_offsets": "<i8",
+    # start of the envelopes of aircraft i (n_aircrafts + 1 entries)
+    "envelope_offsets": "<i8",
+    # start of the points of envelope k (n_envelopes + 1 entries)
+    "point_offsets": "<i8",
+    # (n_points, 3) lever arm, mass, moment of envelope vertices
+    "points": "<f8",
+}
+
+
+def _align(n):
+    return -(-n // ALIGNMENT) * ALIGNMENT
+
+
+class FleetDatabase:
+    """Read-only, memory-mapped fleet database (see `build_fleet_database`)
+
+    Aircrafts are looked up by index file name or immatriculation (O(1)).
+    Pickling only keeps the file name: processes re-map the same file.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, _, header_size = _PREAMBLE.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                raise ValueError("%s is not a fleet database" % filename)
+            if version != FLEETDB_FORMAT_VERSION:
+                raise ValueError(
+                    "fleet database version %d not supported (expected %d)"
+                    % (version, FLEETDB_FORMAT_VERSION)
+                )
+            start = _PREAMBLE.size
+            self.header = json.loads(bytes(self._mmap[start : start + header_size]))
+        except Exception:
+            self._mmap.close()
+            raise
+        self.arrays = {
+            name: np.frombuffer(
+                self._mmap,
+                dtype=_ARRAYS[name],
+                count=spec["count"],
+                offset=spec["offset"],
+            )
+            for name, spec in self.header["arrays"].items()
+        }
+        self.arrays["points"] = self.arrays["points"].reshape(-1, 3)
+        self.aircrafts = self.header["aircrafts"]
+        self._keys = {}
+        for i, aircraft in enumerate(self.aircrafts):
+            self._keys[aircraft["name"]] = i
+            self._keys[aircraft["immat"]] = i
+        self._models = {}
+
+    def __getstate__(self):
+        return {"filename": self.filename}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        # arrays (and models) viewing the mapping must be released first
+        self.arrays = {}
+        self._models = {}
+        try:
+            self._mmap.close()
+        except BufferError:
+            # still viewed by models in use: closed when they are collected
+            pass
+
+    @property
+    def title(self):
+        return self.header["title"]
+
+    @property
+    def names(self):
+        return [aircraft["name"] for aircraft in self.aircrafts]
+
+    @property
+    def immats(self):
+        return [aircraft["immat"] for aircraft in self.aircrafts]
+
+    def __len__(self):
+        return len(self.aircrafts)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def index(self, key):
+        """Position of an aircraft from its index file name or immatriculation"""
+        if isinstance(key, int):
+            return key
+        return self._keys[key]
+
+    def metadata(self, key):
+        """Entry of the header: name, immat, sha256, aircraft, liquids..."""
+        return self.aircrafts[self.index(key)]
+
+    def model(self, key):
+        """`AircraftModel` of an aircraft, its arrays viewing the mapping"""
+        i = self.index(key)
+        try:
+            return self._models[i]
+        except KeyError:
+            pass
+        arrays = self.arrays
+        aircraft = self.aircrafts[i]
+        start, stop = arrays["load_offsets"][i : i + 2]
+        n_loads = stop - start
+        table = arrays["tables"][6 * start : 6 * stop].reshape(6, n_loads)
+        envelopes = []
+        first, last = arrays["envelope_offsets"][i : i + 2]
+        for k, envelope in zip(range(first, last), aircraft["envelopes"]):
+            points = arrays["points"][arrays["point_offsets"][k] : arrays["point_offsets"][k + 1]]
+            envelopes.append(
+                Envelope(
+                    envelope["name"],
+                    envelope["condition"],
+                    Centrogram(points[:, 0], points[:, 1], points[:, 2]),
+                )
+            )
+        model = AircraftModel(
+            immat=aircraft["immat"],
+            designation=aircraft["aircraft"]["designation"],
+            designations=aircraft["designations"],
+            liquids=aircraft["liquids"],
+            kinds=arrays["kinds"][start:stop],
+            adjustable=arrays["adjustable"][start:stop],
+            table=table,
+            centrogram=envelopes[0].centrogram,
+            envelopes=EnvelopeSet(envelopes),
+        )
+        self._models[i] = model
+        return model
+
+    def models(self):
+        """{key: AircraftModel} with index file name and immatriculation keys"""
+        models = {}
+        for i, aircraft in enumerate(self.aircrafts):
+            models[aircraft["name"]] = models[aircraft["immat"]] = self.model(i)
+        return models
+
+
+def _aircraft_entry(name, digest, cfg, model):
+    return {
+        "name": name,
+        "immat": model.immat,
+        "sha256": digest,
+        "aircraft": cfg.aircraft.toDict(),
+        "liquids": list(model.liquids),
+        "densities": {
+            liquid: props.density
+            for liquid, props in cfg.get("constants", {}).get("liquids", {}).items()
+        },
+        "designations": list(model.designations),
+        "envelopes": [
+            {"name": envelope.name, "condition": envelope.condition}
+            for envelope in model.envelopes
+        ],
+    }
+
+
+def _write(filename, title, entries, models):
+    tables, kinds, adjustable, points = [], [], [], []
+    load_offsets, envelope_offsets, point_offsets = [0], [0], [0]
+    for model in models:
+        tables.append(np.ascontiguousarray(model.table, dtype=float).ravel())
+        kinds.append(model.kinds)
+        adjustable.append(model.adjustable)
+        load_offsets.append(load_offsets[-1] + len(model))
+        for envelope in model.envelopes:
+            centrogram = envelope.centrogram
+            points.append(
+                np.column_stack([centrogram.lever_arm, centrogram.mass, centrogram.moment])
+            )
+            point_offsets.append(point_offsets[-1] + len(centrogram))
+        envelope_offsets.append(envelope_offsets[-1] + len(model.envelopes))
+    arrays = {
+        "tables": np.concatenate(tables or [np.zeros(0)]),
+        "kinds": np.concatenate(kinds or [np.zeros(0, dtype=np.int8)]),
+        "adjustable": np.concatenate(adjustable or [np.zeros(0, dtype=bool)]),
+        "load_offsets": np.array(load_offsets),
+        "envelope_offsets": np.array(envelope_offsets),
+        "point_offsets": np.array(point_offsets),
+        "points": np.concatenate(points or [np.zeros((0, 3))]).ravel(),
+    }
+    arrays = {name: np.ascontiguousarray(a, dtype=_ARRAYS[name]) for name, a in arrays.items()}
+
+    # array offsets depend on the header size, which depends on offsets:
+    # reserve room for offsets then lay arrays out after the header
+    header = {"title": title, "aircrafts": entries, "arrays": {}}
+    specs = {name: {"offset": 0, "count": len(a)} for name, a in arrays.items()}
+    header["arrays"] = specs
+    size = len(json.dumps(header).encode("utf-8")) + 20 * len(arrays)
+    position = _align(_PREAMBLE.size + size)
+    for name, a in arrays.items():
+        specs[name]["offset"] = position
+        position = _align(position + a.nbytes)
+    encoded = json.dumps(header).encode("utf-8")
+    encoded += b" " * (size - len(encoded))
+
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        # usual permissions rather than the private ones of mkstemp
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+        with os.fdopen(fd, "wb") as file:
+            file.write(_PREAMBLE.pack(MAGIC, FLEETDB_FORMAT_VERSION, 0, len(encoded)))
+            file.write(encoded)
+            for name, a in arrays.items():
+                file.write(b"\0" * (specs[name]["offset"] - file.tell()))
+                file.write(a.tobytes())
+        # readers mapping the previous file keep their (unlinked) copy
+        os.replace(tmp_path, filename)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def build_fleet_database(index, filename, Loader=YAML_LOADER_DEFAULT, cache=None):
+    """Build (or update) the fleet database `filename` of an aircrafts index
+
+    Aircrafts whose source file has the same sha256 as in an existing
+    database are copied from it without parsing YAML. Aircrafts which fail
+    to load are left out. Returns a {"built": [names], "reused": [names],
+    "errors": {name: exception}} dict.
+    """
+    index_cfg = load_aircrafts_index(index, Loader=Loader)
+    index_path = os.path.dirname(index)
+    previous = None
+    if os.path.exists(filename):
+        try:
+            previous = FleetDatabase(filename)
+        except (ValueError, OSError):
+            previous = None
+    report = {"built": [], "reused": [], "errors": {}}
+    entries, models, immats = [], [], {}
+    try:
+        for name in index_cfg.aircrafts:
+            path = os.path.join(index_path, name)
+            try:
+                _, _, digest = read_source(path)
+                if (
+                    previous is not None
+                    and name in previous
+                    and previous.metadata(name)["name"] == name
+                    and previous.metadata(name)["sha256"] == digest
+                ):
+                    entry = previous.metadata(name)
+                    model = previous.model(name)
+                    report["reused"].append(name)
+                else:
+                    cfg = load_aircraft_config(path, Loader=Loader, cache=cache)
+                    model = get_aircraft_model(cfg)
+                    entry = _aircraft_entry(name, digest, cfg, model)
+                    report["built"].append(name)
+                if model.immat in immats:
+                    raise ValueError(
+                        "immatriculation %s already used by %s" % (model.immat, immats[model.immat])
+                    )
+            except Exception as error:
+                report["errors"][name] = error
+                for done in ("built", "reused"):
+                    if name in report[done]:
+                        report[done].remove(name)
+                continue
+            immats[model.immat] = name
+            entries.append(entry)
+            models.append(model)
+        _write(filename, index_cfg.get("title", ""), entries, models)
+    finally:
+        if previous is not None:
+            previous.close()
+    return report
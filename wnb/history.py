@@ -0,0 +1,246 @@
+"""
+Append-only history of computed loadsheets
+
+Loadsheets (results of `evaluate_scenarios` with the value of every load)
+are stored in a SQLite database, appended by batches in one transaction.
+Indexes on (aircraft, time), time and out-of-envelope loadsheets answer
+queries by aircraft, time range and status without scanning the table;
+query results and exports are streamed. Rows can't be updated or deleted
+(triggers abort such statements).
+"""
+
+import csv
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+HISTORY_FORMATS = ["csv", "jsonl"]
+HISTORY_FORMAT_VERSION = 1
+HISTORY_FIELDS = [
+    "record",
+    "timestamp",
+    "aircraft",
+    "id",
+    "mass",
+    "moment",
+    "lever_arm",
+    "inside",
+    "margin",
+    "limit",
+    "outside_envelopes",
+    "loads",
+]
+# rows fetched at once by queries and exports
+FETCH_SIZE = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS loadsheets (
+    record INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    aircraft TEXT NOT NULL,
+    scenario_id TEXT,
+    mass REAL NOT NULL,
+    moment REAL NOT NULL,
+    lever_arm REAL NOT NULL,
+    inside INTEGER NOT NULL,
+    margin REAL,
+    limit_edge TEXT,
+    outside_envelopes TEXT NOT NULL,
+    -- outside of the centrogram or of any other envelope
+    outside INTEGER NOT NULL,
+    -- JSON {designation: value}
+    loads TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS loadsheets_aircraft_time ON loadsheets (aircraft, timestamp);
+CREATE INDEX IF NOT EXISTS loadsheets_time ON loadsheets (timestamp);
+CREATE INDEX IF NOT EXISTS loadsheets_outside_time ON loadsheets (timestamp) WHERE outside = 1;
+CREATE TRIGGER IF NOT EXISTS loadsheets_no_update BEFORE UPDATE ON loadsheets
+BEGIN SELECT RAISE(ABORT, 'loadsheet history is append-only'); END;
+CREATE TRIGGER IF NOT EXISTS loadsheets_no_delete BEFORE DELETE ON loadsheets
+BEGIN SELECT RAISE(ABORT, 'loadsheet history is append-only'); END;
+"""
+
+_COLUMNS = (
+    "record, timestamp, aircraft, scenario_id, mass, moment, lever_arm, inside, "
+    "margin, limit_edge, outside_envelopes, loads"
+)
+
+
+def _timestamp(value):
+    # seconds since the epoch from a number or a datetime (naive: UTC)
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def scenario_loads(model, row):
+    """{designation: value} of every load of a scenario (defaults for missing loads)"""
+    loads = {}
+    for designation, default in zip(model.designations, model.defaults.tolist()):
+        value = row.get(designation)
+        loads[designation] = float(value) if value is not None and value != "" else default
+    return loads
+
+
+class HistoryStore:
+    """SQLite store of loadsheets, safe to share between threads"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._connection = sqlite3.connect(filename, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+            if version not in (0, HISTORY_FORMAT_VERSION):
+                self._connection.close()
+                raise ValueError(
+                    "history version %d not supported (expected %d)"
+                    % (version, HISTORY_FORMAT_VERSION)
+                )
+            if filename != ":memory:":
+                # appends don't block readers, fsync at checkpoints only
+                self._connection.execute("PRAGMA journal_mode=WAL")
+                self._connection.execute("PRAGMA synchronous=NORMAL")
+            with self._connection:
+                self._connection.executescript(_SCHEMA)
+                self._connection.execute("PRAGMA user_version=%d" % HISTORY_FORMAT_VERSION)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self):
+        return self.count()
+
+    def append_many(self, results, loads, timestamp=None):
+        """Append results (see `evaluate_scenarios`) and their {designation: value} loads
+
+        All loadsheets get the same `timestamp` (default: now), in a single
+        transaction. Returns the number of loadsheets appended.
+        """
+        timestamp = time.time() if timestamp is None else _timestamp(timestamp)
+        rows = [
+            (
+                timestamp,
+                result["aircraft"],
+                None if result.get("id") is None else str(result["id"]),
+                result["mass"],
+                result["moment"],
+                result["lever_arm"],
+                int(result["inside"]),
+                result.get("margin"),
+                result.get("limit"),
+                result.get("outside_envelopes") or "",
+                int(not result["inside"] or bool(result.get("outside_envelopes"))),
+                json.dumps(load),
+            )
+            for result, load in zip(results, loads)
+        ]
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO loadsheets (timestamp, aircraft, scenario_id, mass, moment, "
+                "lever_arm, inside, margin, limit_edge, outside_envelopes, outside, loads) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def append_scenarios(self, models, rows, results, aircraft=None, timestamp=None):
+        """Append results of scenario rows evaluated with `evaluate_scenarios`
+
+        Rows which could not be evaluated (results with an "error") are not
+        loadsheets: they are skipped.
+        """
+        pairs = [(row, result) for row, result in zip(rows, results) if not result.get("error")]
+        loads = [
+            scenario_loads(models[row.get("aircraft") or aircraft], row) for row, _ in pairs
+        ]
+        results = [result for _, result in pairs]
+        return self.append_many(results, loads, timestamp=timestamp)
+
+    def _where(self, aircraft, start, end, outside):
+        clauses, parameters = [], []
+        if aircraft is not None:
+            clauses.append("aircraft = ?")
+            parameters.append(aircraft)
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            parameters.append(_timestamp(start))
+        if end is not None:
+            clauses.append("timestamp < ?")
+            parameters.append(_timestamp(end))
+        if outside is not None:
+            # literal values: the partial index is only used for "outside = 1"
+            clauses.append("outside = 1" if outside else "outside = 0")
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, parameters
+
+    def count(self, aircraft=None, start=None, end=None, outside=None):
+        """Number of loadsheets matching the filters (see `query`)"""
+        where, parameters = self._where(aircraft, start, end, outside)
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM loadsheets" + where, parameters
+            ).fetchone()[0]
+
+    def query(self, aircraft=None, start=None, end=None, outside=None, limit=None):
+        """Yield loadsheets (dicts with `HISTORY_FIELDS` keys) in time order
+
+        Filters: immatriculation, time range [start, end) (seconds since
+        the epoch or datetimes) and out-of-envelope status.
+        """
+        where, parameters = self._where(aircraft, start, end, outside)
+        sql = "SELECT %s FROM loadsheets%s ORDER BY timestamp, record" % (_COLUMNS, where)
+        if limit is not None:
+            sql += " LIMIT %d" % limit
+        with self._lock:
+            cursor = self._connection.execute(sql, parameters)
+        try:
+            while True:
+                with self._lock:
+                    rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    record = dict(zip(HISTORY_FIELDS, row))
+                    record["inside"] = bool(record["inside"])
+                    record["loads"] = json.loads(record["loads"])
+                    yield record
+        finally:
+            cursor.close()
+
+    def export(self, file, fmt="csv", **filters):
+        """Stream loadsheets matching `filters` (see `query`) to a text file
+
+        Timestamps are written in ISO 8601 (UTC). Returns the number of
+        loadsheets written.
+        """
+        if fmt not in HISTORY_FORMATS:
+            raise NotImplementedError(
+                "unknown history format '%s' - not in %s" % (fmt, HISTORY_FORMATS)
+            )
+        if fmt == "csv":
+            writer = csv.DictWriter(file, fieldnames=HISTORY_FIELDS)
+            writer.writeheader()
+        n = 0
+        for record in self.query(**filters):
+            record["timestamp"] = datetime.fromtimestamp(
+                record["timestamp"], timezone.utc
+            ).isoformat()
+            if fmt == "csv":
+                record["loads"] = json.dumps(record["loads"])
+                writer.writerow(record)
+            else:
+                file.write(json.dumps(record) + "\n")
+            n += 1
+        return n
@@ -0,0 +1,186 @@
+"""
+Memoization of loading results
+
+Slider positions snap to the `step` of each load and loadsheets repeat
+the same few loadings (standard crew, full tanks...). `ResultCache` keeps
+the results of the most recently used loadings, of any aircraft, keyed on
+the `AircraftModel` and the load values quantized to their `step`: values
+within `STEP_TOLERANCE` steps of the same multiple of the step share a
+result, values off the grid are keyed exactly.
+
+Models are keyed by identity: reloading a config compiles a new model, so
+results of the previous one are never returned again, and they are
+dropped when it is garbage collected.
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+from itertools import count
+
+import numpy as np
+
+from .batch import _evaluate_values
+from .model import loads_to_values
+from .wnb import get_aircraft_model
+
+DEFAULT_MAXSIZE = 1024
+STEP_TOLERANCE = 1e-6
+ALLOWED_XAXIS = ["lever_arm", "moment"]
+
+# tokens are never reused: a new model can't get results of a dead one
+_tokens = count()
+
+
+def quantize(model, values):
+    """(indices, exact) arrays of an (n_scenarios, n_loads) values array
+
+    `indices` are the step multiples of on-grid values (0 elsewhere),
+    `exact` the off-grid values (0.0 elsewhere).
+    """
+    steps = model.steps
+    with np.errstate(divide="ignore", invalid="ignore"):
+        q = values / steps
+    r = np.rint(q)
+    on_grid = (steps > 0) & (np.abs(q - r) <= STEP_TOLERANCE)
+    indices = np.where(on_grid, r, 0.0).astype(np.int64)
+    # + 0.0: -0.0 and 0.0 must give the same key
+    exact = np.where(on_grid, 0.0, values) + 0.0
+    return indices, exact
+
+
+def _forget(cache_ref, token):
+    # finalizer of a model: may run during any allocation, even with the
+    # lock held, so entries are only purged on the next cache access
+    cache = cache_ref()
+    if cache is not None:
+        cache._dead.append(token)
+
+
+class ResultCache:
+    """Bounded (LRU) cache of loading results, safe to share between threads
+
+    Results are dicts with the fields of `evaluate_scenarios` results
+    (without "id"); each call returns new dicts.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1, not %r" % maxsize)
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._results = OrderedDict()
+        self._tokens = weakref.WeakKeyDictionary()
+        self._dead = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._results)
+
+    def __repr__(self):
+        return "<ResultCache %d/%d, %d hits, %d misses>" % (
+            len(self),
+            self.maxsize,
+            self.hits,
+            self.misses,
+        )
+
+    def _token(self, model):
+        try:
+            return self._tokens[model]
+        except KeyError:
+            pass
+        token = next(_tokens)
+        self._tokens[model] = token
+        weakref.finalize(model, _forget, weakref.ref(self), token)
+        return token
+
+    def _purge(self):
+        dead = set()
+        while self._dead:
+            dead.add(self._dead.pop())
+        if dead:
+            for key in [key for key in self._results if key[0] in dead]:
+                del self._results[key]
+
+    def _store(self, key, result):
+        self._results[key] = result
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+            self.evictions += 1
+
+    def evaluate(self, cfg, values, xaxis="lever_arm"):
+        """Result of a loading: load values or loads list (see `create_loads_list`)"""
+        if len(values) and hasattr(values[0], "designation"):
+            values = loads_to_values(values)
+        return self.evaluate_many(cfg, [values], xaxis=xaxis)[0]
+
+    def evaluate_many(self, cfg, values, xaxis="lever_arm"):
+        """Results of an (n_scenarios, n_loads) array of load values
+
+        Only distinct loadings not in the cache are evaluated, at once.
+        """
+        if xaxis not in ALLOWED_XAXIS:
+            raise NotImplementedError(
+                "unknown x-axis '%s' - not in %s" % (xaxis, ALLOWED_XAXIS)
+            )
+        model = get_aircraft_model(cfg)
+        values = np.asarray(values, dtype=float)
+        if values.ndim == 1:
+            values = values[np.newaxis, :]
+        if values.shape[1] != len(model):
+            raise ValueError(
+                "expected %d loads per scenario, got %d" % (len(model), values.shape[1])
+            )
+        indices, exact = quantize(model, values)
+        results = [None] * len(values)
+        missing = {}
+        with self._lock:
+            self._purge()
+            token = self._token(model)
+            for k, (row, other) in enumerate(zip(indices, exact)):
+                key = (token, xaxis, row.tobytes() + other.tobytes())
+                result = self._results.get(key)
+                if result is None:
+                    missing.setdefault(key, []).append(k)
+                else:
+                    self._results.move_to_end(key)
+                    results[k] = result
+            self.misses += len(missing)
+            self.hits += len(values) - len(missing)
+        if missing:
+            # evaluated outside of the lock: other threads may use the cache
+            rows = [ks[0] for ks in missing.values()]
+            evaluated = _evaluate_values(model, values[rows], xaxis)
+            with self._lock:
+                for (key, ks), result in zip(missing.items(), evaluated):
+                    self._store(key, result)
+                    for k in ks:
+                        results[k] = result
+        return [dict(result) for result in results]
+
+    def invalidate(self, cfg=None):
+        """Drop results of an aircraft (config or model), or all results"""
+        with self._lock:
+            if cfg is None:
+                self._results.clear()
+                return
+            token = self._tokens.pop(get_aircraft_model(cfg), None)
+            if token is not None:
+                for key in [key for key in self._results if key[0] == token]:
+                    del self._results[key]
+
+    def stats(self):
+        """{"hits", "misses", "evictions", "size", "maxsize", "hit_rate"}"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._results),
+            "maxsize": self.maxsize,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,151 @@
+import numpy as np
+
+from . import profiling
+from .centrogram import Centrogram
+from .envelopes import DEFAULT_ENVELOPE, Envelope, EnvelopeSet
+
+LOAD_KIND_MASS = 0
+LOAD_KIND_VOLUME = 1
+
+# rows of AircraftModel.table
+_LEVER_ARM, _FACTOR, _DEFAULT, _MIN, _MAX, _STEP = range(6)
+_TABLE_ROWS = 6
+
+
+class AircraftModel:
+    """Compact, compiled weight and balance data of an aircraft
+
+    Per load data is stored in a single contiguous (6, n_loads) float array
+    (lever arm, density factor, default, min, max, step) and the centrogram
+    as a `Centrogram`, all named envelopes (including the centrogram) being
+    in `envelopes`.
+    """
+
+    __slots__ = (
+        "immat",
+        "designation",
+        "designations",
+        "liquids",
+        "kinds",
+        "adjustable",
+        "table",
+        "centrogram",
+        "envelopes",
+        "__weakref__",
+    )
+
+    def __init__(
+        self,
+        immat,
+        designation,
+        designations,
+        liquids,
+        kinds,
+        adjustable,
+        table,
+        centrogram,
+        envelopes=None,
+    ):
+        self.immat = immat
+        self.designation = designation
+        self.designations = tuple(designations)
+        self.liquids = tuple(liquids)
+        self.kinds = np.asarray(kinds, dtype=np.int8)
+        self.adjustable = np.asarray(adjustable, dtype=bool)
+        self.table = np.ascontiguousarray(table, dtype=float)
+        self.centrogram = centrogram
+        if envelopes is None:
+            envelopes = EnvelopeSet([Envelope(DEFAULT_ENVELOPE, "loaded", centrogram)])
+        self.envelopes = envelopes
+
+    def __repr__(self):
+        return "<AircraftModel %s (%s) with %d loads>" % (
+            self.immat,
+            self.designation,
+            len(self.designations),
+        )
+
+    def __len__(self):
+        return len(self.designations)
+
+    @property
+    def lever_arms(self):
+        return self.table[_LEVER_ARM]
+
+    @property
+    def factors(self):
+        return self.table[_FACTOR]
+
+    @property
+    def defaults(self):
+        return self.table[_DEFAULT]
+
+    @property
+    def mins(self):
+        return self.table[_MIN]
+
+    @property
+    def maxs(self):
+        return self.table[_MAX]
+
+    @property
+    def steps(self):
+        return self.table[_STEP]
+
+    def default_values(self):
+        return self.table[_DEFAULT].copy()
+
+
+@profiling.staged("compile")
+def compile_aircraft(cfg):
+    """Compile a munch aircraft config (see `load_aircraft_config`)"""
+    n_loads = len(cfg.loads)
+    table = np.empty((_TABLE_ROWS, n_loads))
+    kinds = []
+    liquids = []
+    adjustable = []
+    for j, load in enumerate(cfg.loads):
+        if hasattr(load, "mass"):
+            kinds.append(LOAD_KIND_MASS)
+            liquids.append(None)
+            props = load.mass
+            factor = 1.0
+        elif hasattr(load, "volume"):
+            kinds.append(LOAD_KIND_VOLUME)
+            liquids.append(load.liquid)
+            props = load.volume
+            factor = cfg.constants.liquids[load.liquid].density
+        else:
+            raise NotImplementedError("load should have mass or volume attribute")
+        step = props.get("step", 1)
+        if "min" in props and "max" in props:
+            adjustable.append(True)
+            vmin, vmax = props.min, props.max
+        else:
+            adjustable.append(False)
+            vmin = vmax = props.default
+        table[:, j] = (load.lever_arm, factor, props.default, vmin, vmax, step)
+    return AircraftModel(
+        immat=cfg.aircraft.immat,
+        designation=cfg.aircraft.designation,
+        designations=[load.designation for load in cfg.loads],
+        liquids=liquids,
+        kinds=kinds,
+        adjustable=adjustable,
+        table=table,
+        centrogram=Centrogram.from_points(cfg.centrogram),
+        envelopes=EnvelopeSet.from_config(cfg),
+    )
+
+
+def loads_to_values(loads):
+    """Convert a list of loads (see `create_loads_list`) to a row of values"""
+    values = []
+    for load in loads:
+        if hasattr(load, "mass"):
+            values.append(load.mass.current_value)
+        elif hasattr(load, "volume"):
+            values.append(load.volume.current_value)
+        else:
+            raise NotImplementedError("load should have mass or volume attribute")
+    return np.array(values, dtype=float)
@@ -0,0 +1,343 @@
+"""
+Monte Carlo analysis of the centre of gravity
+
+Load values and liquid densities are drawn from distributions, chunk by
+chunk (in processes if asked), and reduced to the number of loadings
+outside of the centrogram and to streaming histograms of mass, moment and
+lever arm: memory does not depend on the number of samples. Percentiles
+are interpolated within histogram bins, which span the centrogram with
+half its extent on each side.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import profiling
+from .model import LOAD_KIND_VOLUME, AircraftModel
+from .wnb import get_aircraft_model
+
+ALLOWED_XAXIS = ["lever_arm", "moment"]
+ALLOWED_DISTRIBUTIONS = ["constant", "normal", "uniform", "triangular"]
+QUANTITIES = ["mass", "moment", "lever_arm"]
+
+
+def _draw(rng, spec, default, size):
+    """Draw `size` values of a distribution
+
+    `spec` is None (constant `default`), a number (constant) or a dict like
+    {"distribution": "normal", "mean": 80, "std": 15, "min": 0, "max": 150}.
+    "mean" (normal) and "mode" (triangular) default to `default`, optional
+    "min"/"max" clip samples.
+    """
+    if spec is None:
+        return np.full(size, float(default))
+    if not isinstance(spec, dict):
+        return np.full(size, float(spec))
+    distribution = spec.get("distribution", "normal")
+    if distribution == "constant":
+        values = np.full(size, float(spec.get("value", default)))
+    elif distribution == "normal":
+        values = rng.normal(spec.get("mean", default), spec["std"], size)
+    elif distribution == "uniform":
+        values = rng.uniform(spec["low"], spec["high"], size)
+    elif distribution == "triangular":
+        values = rng.triangular(
+            spec["low"], spec.get("mode", default), spec["high"], size
+        )
+    else:
+        raise NotImplementedError(
+            "unknown distribution '%s' - not in %s" % (distribution, ALLOWED_DISTRIBUTIONS)
+        )
+    if "min" in spec or "max" in spec:
+        values = np.clip(values, spec.get("min", -np.inf), spec.get("max", np.inf))
+    return values
+
+
+class StreamingHistogram:
+    """Fixed bins histogram of a stream of values, with exact count, sum,
+    minimum and maximum
+
+    Values outside [low, high) are counted in two overflow bins, so that
+    memory does not depend on the number of values and histograms of
+    shards can be merged. The mean and percentiles of an empty histogram
+    are nan.
+    """
+
+    def __init__(self, low, high, bins=4096):
+        self.low = float(low)
+        self.high = float(high)
+        self.counts = np.zeros(bins + 2, dtype=np.int64)
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    @property
+    def mean(self):
+        count = self.count
+        return self.total / count if count else np.nan
+
+    @property
+    def edges(self):
+        return np.linspace(self.low, self.high, len(self.counts) - 1)
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        if not len(values):
+            return
+        bins = len(self.counts) - 2
+        index = np.floor((values - self.low) / (self.high - self.low) * bins)
+        index = np.clip(index, -1, bins).astype(np.int64) + 1
+        self.counts += np.bincount(index, minlength=len(self.counts))
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other):
+        self.counts += other.counts
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q):
+        """Percentile(s) `q` (0 to 100), linearly interpolated in a bin
+
+        Precision is the bin width in [low, high). Percentiles falling in an
+        overflow bin are interpolated over the whole observed range below
+        `low` (from the minimum) or above `high` (up to the maximum), so
+        they are only rough estimates: `low` and `high` should hold all but
+        the tails of the distribution. 0 and 100 are the exact minimum and
+        maximum.
+        """
+        q = np.asarray(q, dtype=float)
+        if not self.count:
+            return q * np.nan
+        edges = np.concatenate(
+            [[min(self.min, self.low)], self.edges, [max(self.max, self.high)]]
+        )
+        # clamp first/last populated bins to the observed range
+        edges = np.clip(edges, self.min, self.max)
+        cumulative = np.concatenate([[0], np.cumsum(self.counts)])
+        return np.interp(q / 100 * cumulative[-1], cumulative, edges)
+
+
+class MonteCarloResult:
+    """Outcome of `monte_carlo`: probability of being outside the centrogram
+    and histograms of mass, moment and lever arm"""
+
+    def __init__(self, immat, n_samples, n_outside, histograms):
+        self.immat = immat
+        self.n_samples = n_samples
+        self.n_outside = n_outside
+        self.histograms = histograms
+
+    def __repr__(self):
+        return "<MonteCarloResult %s: %d samples, P(outside)=%g>" % (
+            self.immat,
+            self.n_samples,
+            self.probability_outside,
+        )
+
+    @property
+    def probability_outside(self):
+        return self.n_outside / self.n_samples if self.n_samples else 0.0
+
+    def mean(self, quantity="lever_arm"):
+        return self.histograms[quantity].mean
+
+    def percentile(self, q, quantity="lever_arm"):
+        if quantity not in QUANTITIES:
+            raise NotImplementedError(
+                "unknown quantity '%s' - not in %s" % (quantity, QUANTITIES)
+            )
+        return self.histograms[quantity].percentile(q)
+
+    def merge(self, other):
+        self.n_samples += other.n_samples
+        self.n_outside += other.n_outside
+        for quantity, histogram in self.histograms.items():
+            histogram.merge(other.histograms[quantity])
+        return self
+
+    def summary(self, percentiles=(5, 50, 95)):
+        """Plain dict of results, e.g. to be dumped as JSON"""
+        summary = {
+            "aircraft": self.immat,
+            "samples": self.n_samples,
+            "outside": self.n_outside,
+            "probability_outside": self.probability_outside,
+        }
+        for quantity in QUANTITIES:
+            values = self.percentile(percentiles, quantity)
+            summary[quantity] = {"mean": self.mean(quantity)}
+            summary[quantity].update(
+                ("p%g" % q, float(value)) for q, value in zip(percentiles, values)
+            )
+        return summary
+
+
+class _Sampler:
+    """Picklable per aircraft sampling settings, run chunk by chunk"""
+
+    def __init__(self, model, distributions, densities, xaxis, bins):
+        if xaxis not in ALLOWED_XAXIS:
+            raise NotImplementedError(
+                "unknown x-axis '%s' - not in %s" % (xaxis, ALLOWED_XAXIS)
+            )
+        distributions = dict(distributions or {})
+        densities = dict(densities or {})
+        unknown = set(distributions) - set(model.designations)
+        unknown |= set(densities) - set(model.liquids)
+        if unknown:
+            raise ValueError("unknown loads or liquids %s" % sorted(unknown))
+        self.model = model
+        self.distributions = [distributions.get(d) for d in model.designations]
+        self.densities = densities
+        self.xaxis = xaxis
+        self.bins = bins
+        # histogram ranges: the centrogram with half its extent on each side,
+        # values further away go to the overflow bins
+        centrogram = model.centrogram
+        self.ranges = {}
+        for quantity, values in [
+            ("mass", centrogram.mass),
+            ("moment", centrogram.moment),
+            ("lever_arm", centrogram.lever_arm),
+        ]:
+            low, high = float(values.min()), float(values.max())
+            pad = (high - low) / 2 or 1.0
+            self.ranges[quantity] = (low - pad, high + pad)
+
+    def empty_result(self):
+        histograms = {
+            quantity: StreamingHistogram(low, high, self.bins)
+            for quantity, (low, high) in self.ranges.items()
+        }
+        return MonteCarloResult(self.model.immat, 0, 0, histograms)
+
+    def sample(self, seed, size):
+        """Draw `size` loadings, the loads matrix being (size, n_loads)"""
+        model = self.model
+        rng = np.random.default_rng(seed)
+        values = np.empty((size, len(model)))
+        for j, spec in enumerate(self.distributions):
+            values[:, j] = _draw(rng, spec, model.defaults[j], size)
+        np.maximum(values, 0, out=values)
+        factors = np.tile(model.factors, (size, 1))
+        for liquid, spec in self.densities.items():
+            # one density per scenario, shared by every tank of the liquid
+            columns = [
+                j
+                for j, name in enumerate(model.liquids)
+                if name == liquid and model.kinds[j] == LOAD_KIND_VOLUME
+            ]
+            if columns:
+                density = _draw(rng, spec, model.factors[columns[0]], size)
+                factors[:, columns] = density[:, np.newaxis]
+        return values, factors
+
+    def run_chunk(self, seed, size):
+        values, factors = self.sample(seed, size)
+        masses = values * factors
+        moments = masses * self.model.lever_arms
+        mass = np.zeros(size)
+        moment = np.zeros(size)
+        for j in range(len(self.model)):
+            mass += masses[:, j]
+            moment += moments[:, j]
+        lever_arm = moment / mass
+        x = lever_arm if self.xaxis == "lever_arm" else moment
+        inside = self.model.centrogram.contains(x, mass, xaxis=self.xaxis)
+        result = self.empty_result()
+        result.n_samples = size
+        result.n_outside = int(size - np.count_nonzero(inside))
+        result.histograms["mass"].add(mass)
+        result.histograms["moment"].add(moment)
+        result.histograms["lever_arm"].add(lever_arm)
+        return result
+
+
+_worker_sampler = None
+
+
+def _init_worker(sampler):
+    global _worker_sampler
+    _worker_sampler = sampler
+
+
+def _run_chunk(seed, size):
+    return _worker_sampler.run_chunk(seed, size)
+
+
+@profiling.staged("monte_carlo")
+def monte_carlo(
+    cfg,
+    distributions=None,
+    densities=None,
+    n_samples=100000,
+    seed=None,
+    chunk_size=65536,
+    workers=None,
+    xaxis="lever_arm",
+    bins=4096,
+):
+    """Monte Carlo analysis of G for uncertain loads and liquid densities
+
+    `cfg` is an aircraft config or an `AircraftModel`, `distributions` a
+    {load designation: spec} dict and `densities` a {liquid: spec} dict,
+    a spec being a number or a dict like {"distribution": "normal",
+    "std": 15} (see `ALLOWED_DISTRIBUTIONS`); loads without spec keep their
+    default value.
+    Samples are drawn and reduced `chunk_size` at a time, chunk i using the
+    i-th seed spawned from `seed`: memory is bounded and, for a given
+    `seed` and `chunk_size`, results do not depend on `workers` (number of
+    processes chunks are run in).
+    """
+    if not isinstance(cfg, AircraftModel):
+        cfg = get_aircraft_model(cfg)
+    sampler = _Sampler(cfg, distributions, densities, xaxis, bins)
+    n_chunks = -(-n_samples // chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    sizes = [min(chunk_size, n_samples - i * chunk_size) for i in range(n_chunks)]
+    result = sampler.empty_result()
+    if not workers or workers <= 1:
+        for chunk_seed, size in zip(seeds, sizes):
+            result.merge(sampler.run_chunk(chunk_seed, size))
+        return result
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(sampler,)
+    ) as pool:
+        pending = deque()
+        for chunk_seed, size in zip(seeds, sizes):
+            pending.append(pool.submit(_run_chunk, chunk_seed, size))
+            if len(pending) >= 2 * workers:
+                result.merge(pending.popleft().result())
+        while pending:
+            result.merge(pending.popleft().result())
+    return result
+
+
+def monte_carlo_fleet(models, distributions=None, densities=None, **kwargs):
+    """Run `monte_carlo` for each {key: AircraftModel} of `models`
+
+    Loads and liquids of `distributions` and `densities` which an aircraft
+    does not have are ignored for this aircraft.
+    """
+    distributions = distributions or {}
+    densities = densities or {}
+    results = {}
+    for key, model in models.items():
+        results[key] = monte_carlo(
+            model,
+            distributions={
+                k: v for k, v in distributions.items() if k in model.designations
+            },
+            densities={k: v for k, v in densities.items() if k in model.liquids},
+            **kwargs
+        )
+    return results
@@ -0,0 +1,378 @@
+"""
+Loading optimizer
+
+With G = (M, m) in moment space, M = M0 + sum(a_j * v_j) and
+m = m0 + sum(b_j * v_j) are linear in the load values v_j (b_j = density
+factor, a_j = b_j * lever arm). Inside a convex centrogram, the margin t
+(distance to the nearest edge line, axes scaled by the centrogram extent)
+satisfies n_i . G + t <= offset_i for every edge i, so maximizing the
+margin, or the fuel for a minimum margin, is a linear program. Its
+solution is then rounded to the `step` grid of each load, and refined by
+a local search on that grid which is also the only method used for a
+non-convex centrogram.
+
+Centrogram edges are straight in lever arm space, so the moment space
+polygon only joins its vertices by chords of the real boundary: loadings
+are checked against the lever arm centrogram, and only loadings strictly
+inside it are returned.
+"""
+
+from collections import namedtuple
+from itertools import product
+
+import numpy as np
+
+from . import profiling
+from .model import LOAD_KIND_VOLUME, loads_to_values
+from .wnb import get_aircraft_model
+
+OPTIMIZE_OBJECTIVES = ["margin", "fuel"]
+# tolerance of the simplex and of totals constraints
+EPSILON = 1e-9
+# free loads above which LP rounding tries nearest values only (instead of
+# every floor/ceil combination)
+MAX_ROUNDING_COMBINATIONS_LOADS = 10
+# penalty on the score of an illegal loading (outside of the centrogram or
+# below `min_margin`)
+_PENALTY = 1e12
+
+OptimizedLoading = namedtuple(
+    "OptimizedLoading", ["values", "margin", "mass", "moment", "lever_arm", "method"]
+)
+
+
+def linprog(c, A_ub=None, b_ub=None, A_eq=None, b_eq=None, bounds=None, max_iter=10000):
+    """Maximize c . x subject to A_ub x <= b_ub, A_eq x = b_eq and
+    low <= x <= high for each (low, high) of `bounds` (finite)
+
+    Small dense two-phase simplex (Bland's rule). Returns x, or None if
+    the problem is infeasible.
+    """
+    c = np.asarray(c, dtype=float)
+    n = len(c)
+    low, high = (np.array(b, dtype=float) for b in zip(*bounds))
+    A_ub = np.zeros((0, n)) if A_ub is None else np.asarray(A_ub, dtype=float)
+    b_ub = np.zeros(0) if b_ub is None else np.asarray(b_ub, dtype=float)
+    A_eq = np.zeros((0, n)) if A_eq is None else np.asarray(A_eq, dtype=float)
+    b_eq = np.zeros(0) if b_eq is None else np.asarray(b_eq, dtype=float)
+    # x = low + y with y >= 0, upper bounds as inequalities
+    A_ub, b_ub = (
+        np.vstack([A_ub, np.eye(n)]),
+        np.concatenate([b_ub - A_ub @ low, high - low]),
+    )
+    b_eq = b_eq - A_eq @ low
+    m_ub, m_eq = len(b_ub), len(b_eq)
+    m = m_ub + m_eq
+
+    # columns: y (n), slacks (m_ub), artificials (m), rhs
+    tableau = np.zeros((m + 1, n + m_ub + m + 1))
+    tableau[:m_ub, :n] = A_ub
+    tableau[:m_ub, n : n + m_ub] = np.eye(m_ub)
+    tableau[m_ub:m, :n] = A_eq
+    tableau[:m, -1] = np.concatenate([b_ub, b_eq])
+    negative = tableau[:m, -1] < 0
+    tableau[:m][negative] *= -1
+    basis = []
+    artificial = n + m_ub
+    for i in range(m):
+        if i < m_ub and not negative[i]:
+            basis.append(n + i)
+        else:
+            tableau[i, artificial + i] = 1.0
+            basis.append(artificial + i)
+
+    # phase 1: minimize the sum of artificials
+    needed = [i for i in range(m) if basis[i] >= artificial]
+    tableau[-1, :] = 0.0
+    tableau[-1, artificial:-1] = 1.0
+    for i in needed:
+        tableau[-1] -= tableau[i]
+    _run_simplex(tableau, basis, artificial, max_iter)
+    if tableau[-1, -1] < -EPSILON * max(1.0, np.abs(tableau[:m, -1]).max(initial=0)):
+        return None
+    # drive remaining (zero) artificials out of the basis
+    for i in range(m):
+        if basis[i] >= artificial:
+            columns = np.flatnonzero(np.abs(tableau[i, :artificial]) > EPSILON)
+            if len(columns):
+                _pivot(tableau, basis, i, columns[0])
+
+    # phase 2
+    tableau[-1, :] = 0.0
+    tableau[-1, :n] = -c
+    for i, j in enumerate(basis):
+        if j < n:
+            tableau[-1] += c[j] * tableau[i]
+    _run_simplex(tableau, basis, artificial, max_iter)
+    y = np.zeros(n + m_ub + m)
+    for i, j in enumerate(basis):
+        y[j] = tableau[i, -1]
+    return low + y[:n]
+
+
+def _pivot(tableau, basis, row, column):
+    tableau[row] /= tableau[row, column]
+    for i in range(len(tableau)):
+        if i != row and tableau[i, column] != 0.0:
+            tableau[i] -= tableau[i, column] * tableau[row]
+    basis[row] = column
+
+
+def _run_simplex(tableau, basis, n_columns, max_iter):
+    # maximize with reduced costs in the last row, only the first
+    # `n_columns` columns may enter the basis
+    for _ in range(max_iter):
+        candidates = np.flatnonzero(tableau[-1, :n_columns] < -EPSILON)
+        if not len(candidates):
+            return
+        column = candidates[0]
+        rows = np.flatnonzero(tableau[:-1, column] > EPSILON)
+        if not len(rows):
+            raise ValueError("unbounded linear program")
+        ratios = tableau[rows, -1] / tableau[rows, column]
+        best = rows[ratios <= ratios.min() + EPSILON]
+        row = min(best, key=lambda i: basis[i])
+        _pivot(tableau, basis, row, column)
+    raise RuntimeError("simplex did not converge in %d iterations" % max_iter)
+
+
+class _Problem:
+    """Free loads, their bounds and grid, and the scoring of loadings"""
+
+    def __init__(self, model, values, free, totals, objective, min_margin):
+        if objective not in OPTIMIZE_OBJECTIVES:
+            raise NotImplementedError(
+                "unknown objective '%s' - not in %s" % (objective, OPTIMIZE_OBJECTIVES)
+            )
+        designations = list(model.designations)
+        if free is None:
+            free = [d for d, a in zip(designations, model.adjustable) if a]
+        unknown = set(free) - set(designations)
+        for group in totals:
+            unknown |= set(group) - set(free)
+        if unknown:
+            raise ValueError("unknown or not free loads %s" % sorted(unknown))
+        self.model = model
+        self.values = np.array(values, dtype=float)
+        self.free = np.array([designations.index(d) for d in free], dtype=int)
+        self.low = model.mins[self.free]
+        self.high = model.maxs[self.free]
+        self.step = model.steps[self.free]
+        self.groups = [
+            (np.array([list(free).index(d) for d in group]), float(total))
+            for group, total in totals.items()
+        ]
+        self.fuel = model.kinds[self.free] == LOAD_KIND_VOLUME
+        self.objective = objective
+        self.min_margin = min_margin
+
+    def loadings(self, x):
+        """(n, n_loads) values of (n, n_free) free load values"""
+        x = np.atleast_2d(x)
+        values = np.tile(self.values, (len(x), 1))
+        values[:, self.free] = x
+        return values
+
+    def evaluate(self, x):
+        """Margin (moment space), legality and score (higher is better) of
+        free values
+
+        The moment space edges are chords of the centrogram, whose edges are
+        straight in lever arm space: a loading is only legal if G is
+        strictly inside the lever arm centrogram (as checked by
+        `inside_centrogram`) with a positive margin. Illegal loadings score
+        below any legal one, by their lever arm margin so that the search
+        moves towards the centrogram.
+        """
+        model = self.model
+        values = self.loadings(x)
+        masses = values * model.factors
+        mass = masses.sum(axis=1)
+        moment = (masses * model.lever_arms).sum(axis=1)
+        margin = model.centrogram.margin(moment, mass, xaxis="moment")
+        lever_arm = moment / mass
+        legal = (margin > 0) & model.centrogram.contains(lever_arm, mass)
+        deficit = np.minimum(model.centrogram.margin(lever_arm, mass), margin)
+        if self.objective == "margin":
+            score = margin
+        else:
+            legal &= margin >= self.min_margin
+            deficit = np.minimum(deficit, margin - self.min_margin)
+            score = np.atleast_2d(x)[:, self.fuel].sum(axis=1)
+        score = np.where(legal, score, deficit - _PENALTY)
+        return margin, legal, score
+
+    def snap(self, x):
+        """Nearest values on the step grid (within bounds)"""
+        k = np.round((x - self.low) / self.step)
+        return np.clip(self.low + k * self.step, self.low, self.high)
+
+    def start(self, x):
+        """Values on the grid close to `x` meeting totals: each group is
+        filled station after station from its minimums"""
+        x = self.snap(x)
+        for indices, total in self.groups:
+            x[indices] = self.low[indices]
+            remaining = total - x[indices].sum()
+            for i in indices:
+                add = np.floor(min(self.high[i] - x[i], remaining) / self.step[i] + EPSILON)
+                x[i] += max(add, 0) * self.step[i]
+                remaining = total - x[indices].sum()
+        return x
+
+    def totals_ok(self, x):
+        x = np.atleast_2d(x)
+        ok = np.ones(len(x), dtype=bool)
+        for indices, total in self.groups:
+            ok &= np.abs(x[:, indices].sum(axis=1) - total) <= 1e-6 * max(1.0, abs(total))
+        return ok
+
+
+def _solve_lp(problem):
+    # variables: free values then the margin t
+    model = problem.model
+    edges = model.centrogram.edges("moment")
+    if not edges.convex:
+        return None
+    width, height = edges.scale
+    factors = model.factors
+    a = factors * model.lever_arms
+    fixed = problem.values.copy()
+    fixed[problem.free] = 0.0
+    M0, m0 = fixed @ a, fixed @ factors
+    nx, ny = edges.nx[edges.valid], edges.ny[edges.valid]
+    offset = edges.offset[edges.valid]
+    free = problem.free
+    A_ub = np.column_stack(
+        [
+            np.outer(nx, a[free] / width) + np.outer(ny, factors[free] / height),
+            np.ones(len(nx)),
+        ]
+    )
+    b_ub = offset - nx * M0 / width - ny * m0 / height
+    n_free = len(free)
+    A_eq = np.zeros((len(problem.groups), n_free + 1))
+    b_eq = np.zeros(len(problem.groups))
+    for k, (indices, total) in enumerate(problem.groups):
+        A_eq[k, indices] = 1.0
+        b_eq[k] = total
+    bounds = list(zip(problem.low, problem.high))
+    if problem.objective == "margin":
+        c = np.zeros(n_free + 1)
+        c[-1] = 1.0
+        # margin bounded by the scaled envelope size (1 x 1)
+        bounds.append((-1.0, 1.0))
+    else:
+        c = np.append(problem.fuel.astype(float), 0.0)
+        bounds.append((problem.min_margin, problem.min_margin))
+    solution = linprog(c, A_ub, b_ub, A_eq, b_eq, bounds)
+    return None if solution is None else solution[:-1]
+
+
+def _round_candidates(problem, x):
+    # floor/ceil combinations on the step grid around the LP solution
+    k = (x - problem.low) / problem.step
+    floor = np.clip(problem.low + np.floor(k + EPSILON) * problem.step, problem.low, problem.high)
+    ceil = np.clip(problem.low + np.ceil(k - EPSILON) * problem.step, problem.low, problem.high)
+    if len(x) > MAX_ROUNDING_COMBINATIONS_LOADS:
+        return problem.snap(x)[np.newaxis, :]
+    candidates = np.array(list(product(*zip(floor, ceil))))
+    return candidates.reshape(-1, len(x))
+
+
+def _neighbours(problem, x, k):
+    # moves of k steps of one load, or transfers between loads of a group
+    # (same step) keeping their total
+    moves = []
+    n = len(x)
+    for j in range(n):
+        for sign in (-1.0, 1.0):
+            move = np.zeros(n)
+            move[j] = sign * k * problem.step[j]
+            moves.append(move)
+    for indices, _ in problem.groups:
+        for i in indices:
+            for j in indices:
+                if i != j and problem.step[i] == problem.step[j]:
+                    move = np.zeros(n)
+                    move[i] = k * problem.step[i]
+                    move[j] = -k * problem.step[j]
+                    moves.append(move)
+    if not moves:
+        return np.zeros((0, n))
+    candidates = x + np.array(moves)
+    inside = np.all(
+        (candidates >= problem.low - EPSILON) & (candidates <= problem.high + EPSILON),
+        axis=1,
+    )
+    candidates = candidates[inside]
+    return candidates[problem.totals_ok(candidates)]
+
+
+def _local_search(problem, x, max_iter=1000):
+    _, _, score = problem.evaluate(x)
+    score = score[0]
+    span = np.max((problem.high - problem.low) / problem.step, initial=1)
+    k = 2 ** int(np.log2(max(span, 1)))
+    for _ in range(max_iter):
+        candidates = _neighbours(problem, x, k)
+        if len(candidates):
+            _, _, scores = problem.evaluate(candidates)
+            best = scores.argmax()
+            if scores[best] > score + EPSILON:
+                x, score = candidates[best], scores[best]
+                continue
+        if k == 1:
+            break
+        k //= 2
+    return x
+
+
+@profiling.staged("optimize")
+def optimize_loading(
+    cfg, values=None, free=None, totals=None, objective="margin", min_margin=0.0
+):
+    """Loading maximizing the centrogram margin (or the fuel)
+
+    `values` (loads list or values, defaults if None) gives the value of
+    loads which are not `free` (designations, every adjustable load if
+    None). `totals` is a {(designation, ...): total} dict of constraints
+    on the sum of free loads, e.g. people or luggage to distribute between
+    stations. `objective` is "margin" (distance to the centrogram boundary
+    in moment space, scaled by its extent, see `Centrogram.margin`) or
+    "fuel" (volume of liquid loads, keeping at least `min_margin`).
+
+    Returns an `OptimizedLoading` with values on the `step` grid of each
+    load and G strictly inside the centrogram (positive margin), or None if
+    no loading on the grid meets the constraints.
+    """
+    model = get_aircraft_model(cfg)
+    if values is None:
+        values = model.default_values()
+    elif len(values) and hasattr(values[0], "designation"):
+        values = loads_to_values(values)
+    problem = _Problem(model, values, free, totals or {}, objective, min_margin)
+
+    method = "lp"
+    solution = _solve_lp(problem)
+    if solution is not None:
+        candidates = _round_candidates(problem, solution)
+    else:
+        method = "search"
+        candidates = problem.start(problem.values[problem.free])[np.newaxis, :]
+    valid = problem.totals_ok(candidates)
+    if valid.any():
+        candidates = candidates[valid]
+    _, _, scores = problem.evaluate(candidates)
+    x = _local_search(problem, candidates[scores.argmax()])
+
+    if not problem.totals_ok(x)[0]:
+        return None
+    margin, legal, _ = problem.evaluate(x)
+    if not legal[0]:
+        return None
+    values = problem.loadings(x)[0]
+    masses = values * model.factors
+    mass = float(masses.sum())
+    moment = float((masses * model.lever_arms).sum())
+    return OptimizedLoading(values, float(margin[0]), mass, moment, moment / mass, method)
@@ -0,0 +1,169 @@
+"""
+Stage timers and call counters
+
+Disabled by default: `stage(name)` then returns a shared no-op context
+manager and `count(name)` returns immediately.
+
+>>> from wnb import profiling
+>>> profiling.enable()
+>>> with profiling.stage("yaml"):
+...     pass
+>>> profiling.get_stats()["yaml"]["calls"]
+1
+"""
+
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+ALLOWED_PROFILE_MODES = ["stages", "cprofile"]
+
+_enabled = False
+_totals = defaultdict(float)
+_calls = defaultdict(int)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _totals[self.name] += time.perf_counter() - self.start
+        _calls[self.name] += 1
+        return False
+
+
+def stage(name):
+    """Context manager timing a stage (no-op when disabled)"""
+    if _enabled:
+        return _Stage(name)
+    return _NULL_STAGE
+
+
+def staged(name):
+    """Decorator timing each call of a function as stage `name`"""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name, n=1):
+    """Increment counter `name` (no-op when disabled)"""
+    if _enabled:
+        _calls[name] += n
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    _totals.clear()
+    _calls.clear()
+
+
+def get_stats():
+    """{name: {"calls": n, "total": seconds}} of every stage and counter"""
+    return {
+        name: {"calls": _calls[name], "total": _totals.get(name, 0.0)}
+        for name in sorted(_calls)
+    }
+
+
+def report(file=None):
+    """Print a stage breakdown sorted by total time"""
+    file = file if file is not None else sys.stderr
+    stats = get_stats()
+    grand_total = sum(stat["total"] for stat in stats.values()) or 1.0
+    print("%-24s %10s %12s %7s" % ("stage", "calls", "total (ms)", "%"), file=file)
+    for name, stat in sorted(stats.items(), key=lambda item: -item[1]["total"]):
+        print(
+            "%-24s %10d %12.3f %6.1f%%"
+            % (
+                name,
+                stat["calls"],
+                stat["total"] * 1e3,
+                100 * stat["total"] / grand_total,
+            ),
+            file=file,
+        )
+
+
+@contextmanager
+def session(mode, output="", file=None):
+    """Profile the enclosed block
+
+    mode "stages" prints the stage breakdown, "cprofile" prints the top
+    cProfile functions or, if `output` is given, dumps pstats data to it.
+    A false `mode` does nothing.
+    """
+    file = file if file is not None else sys.stderr
+    if not mode:
+        yield
+        return
+    if mode not in ALLOWED_PROFILE_MODES:
+        raise NotImplementedError(
+            "unknown profile mode '%s' - not in %s" % (mode, ALLOWED_PROFILE_MODES)
+        )
+    import cProfile
+    import pstats
+
+    was_enabled = _enabled
+    reset()
+    enable()
+    profiler = cProfile.Profile() if mode == "cprofile" else None
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if not was_enabled:
+            disable()
+        if profiler is None:
+            report(file=file)
+        elif output:
+            profiler.dump_stats(output)
+        else:
+            pstats.Stats(profiler, stream=file).sort_stats("cumulative").print_stats(30)
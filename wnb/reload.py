@@ -0,0 +1,347 @@
+"""
+Hot reloading of aircraft configs
+
+A watcher reports changed files: inotify (Linux, through libc) watches the
+directories of the files, so that editors replacing files are seen too;
+elsewhere files are polled with `os.stat`, which costs a few microseconds
+per file. Changes are debounced: a file is only reloaded once it has not
+changed for `debounce` seconds.
+
+`Reloader` keeps a `Fleet` up to date. Only changed aircrafts are parsed
+again, then checked (see `wnb.validate`) and swapped in: computations in
+progress keep the previous config and model, and invalid files leave the
+previous version in place.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+import traceback
+
+from .cache import read_source
+from .validate import validate_content
+from .wnb import YAML_LOADER_DEFAULT
+
+ALLOWED_WATCHERS = ["auto", "inotify", "poll"]
+# seconds a file must be left unchanged before it is reloaded
+DEFAULT_DEBOUNCE = 0.5
+# seconds between two checks of a background reloader
+DEFAULT_INTERVAL = 2.0
+
+# inotify(7)
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_IN_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+)
+_IN_EVENT = struct.Struct("iIII")
+
+
+class PollingWatcher:
+    """Changed files, found by comparing `os.stat` signatures"""
+
+    blocking = False
+
+    def __init__(self, filenames):
+        self._signatures = {}
+        self.set_files(filenames)
+
+    @staticmethod
+    def _signature(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def set_files(self, filenames):
+        paths = set(os.path.abspath(filename) for filename in filenames)
+        self._signatures = {
+            path: self._signatures.get(path) or self._signature(path) for path in paths
+        }
+
+    def poll(self, timeout=0.0):
+        """Set of (absolute) paths changed since the previous call"""
+        if timeout:
+            time.sleep(timeout)
+        changed = set()
+        for path, signature in self._signatures.items():
+            current = self._signature(path)
+            if current != signature:
+                self._signatures[path] = current
+                changed.add(path)
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """Changed files, reported by inotify on their directories (Linux)"""
+
+    blocking = True
+
+    def __init__(self, filenames):
+        path = ctypes.util.find_library("c")
+        self._libc = ctypes.CDLL(path, use_errno=True)
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self._directories = {}  # watch descriptor: directory
+        self._paths = set()
+        try:
+            self.set_files(filenames)
+        except OSError:
+            self.close()
+            raise
+
+    def set_files(self, filenames):
+        self._paths = set(os.path.abspath(filename) for filename in filenames)
+        watched = set(self._directories.values())
+        for directory in set(os.path.dirname(path) for path in self._paths) - watched:
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _IN_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                raise OSError(error, os.strerror(error), directory)
+            self._directories[wd] = directory
+
+    def poll(self, timeout=0.0):
+        """Set of (absolute) paths changed since the previous call"""
+        if timeout:
+            select.select([self._fd], [], [], timeout)
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            except OSError as error:
+                if error.errno == errno.EINTR:
+                    continue
+                raise
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _IN_EVENT.unpack_from(data, offset)
+                offset += _IN_EVENT.size
+                name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+                if mask & _IN_Q_OVERFLOW:
+                    # events were lost: anything may have changed
+                    changed.update(self._paths)
+                    continue
+                directory = self._directories.get(wd)
+                if directory is None:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name))
+                if path in self._paths:
+                    changed.add(path)
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def make_watcher(filenames, watcher="auto"):
+    """Watcher of `filenames`: "inotify", "poll" or "auto" (inotify if available)"""
+    if watcher not in ALLOWED_WATCHERS:
+        raise NotImplementedError(
+            "unknown watcher '%s' - not in %s" % (watcher, ALLOWED_WATCHERS)
+        )
+    if watcher == "poll":
+        return PollingWatcher(filenames)
+    try:
+        return InotifyWatcher(filenames)
+    except (OSError, AttributeError):
+        # no inotify (not Linux, no libc symbol, watch limit reached...)
+        if watcher == "inotify":
+            raise
+        return PollingWatcher(filenames)
+
+
+class ChangeMonitor:
+    """Debounced file changes: paths left unchanged for `debounce` seconds"""
+
+    def __init__(self, filenames, watcher="auto", debounce=DEFAULT_DEBOUNCE):
+        self.watcher = make_watcher(filenames, watcher)
+        self.debounce = debounce
+        self._pending = {}  # path: time of its last change
+
+    def set_files(self, filenames):
+        self.watcher.set_files(filenames)
+
+    def next_timeout(self, interval):
+        """Seconds to wait before the next pending path settles (at most `interval`)"""
+        if not self._pending:
+            return interval
+        first = min(self._pending.values()) + self.debounce - time.monotonic()
+        return max(0.0, min(interval, first))
+
+    def changes(self, timeout=0.0):
+        """Set of settled paths (waiting up to `timeout` for changes)"""
+        changed = self.watcher.poll(timeout)
+        now = time.monotonic()
+        for path in changed:
+            self._pending[path] = now
+        settled = set(
+            path for path, changed in self._pending.items() if now - changed >= self.debounce
+        )
+        for path in settled:
+            del self._pending[path]
+        return settled
+
+    def close(self):
+        self.watcher.close()
+
+
+def reload_aircraft_config(filename, Loader=YAML_LOADER_DEFAULT):
+    """Read and check an aircraft data file: return (`FileReport`, config or None)"""
+    content, _, _ = read_source(filename)
+    return validate_content(content, filename, Loader=Loader)
+
+
+class Reloader:
+    """Keep a `Fleet` in sync with its index and aircraft files
+
+    Call `check` periodically (it is cheap when nothing changed) or `start`
+    a background thread, which reports its exceptions (see `last_error`) and
+    keeps running. `on_reload(report)` is called after each reload.
+    Reports are {"reloaded", "unchanged", "added", "removed": [names],
+    "errors": {name: FileReport or exception}} dicts. Aircrafts which were
+    not loaded yet are not parsed: they load their new version on first
+    access.
+    """
+
+    def __init__(
+        self,
+        fleet,
+        watcher="auto",
+        debounce=DEFAULT_DEBOUNCE,
+        interval=DEFAULT_INTERVAL,
+        on_reload=None,
+    ):
+        self.fleet = fleet
+        self.interval = interval
+        self.on_reload = on_reload
+        self.index_path = os.path.abspath(fleet.filename)
+        self.monitor = ChangeMonitor(self._filenames(), watcher=watcher, debounce=debounce)
+        self.generation = 0
+        # last exception raised in the background thread (by check or on_reload)
+        self.last_error = None
+        self._digests = {}  # name: sha256 of the version in the fleet
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _filenames(self):
+        return [self.fleet.filename] + [self.fleet.path(name) for name in self.fleet.names]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def check(self, timeout=0.0):
+        """Reload settled changes: return a report (None if nothing changed)"""
+        paths = self.monitor.changes(timeout)
+        if not paths:
+            return None
+        with self._lock:
+            report = self._reload(paths)
+        if self.on_reload is not None:
+            self.on_reload(report)
+        return report
+
+    def _reload(self, paths):
+        fleet = self.fleet
+        report = {"reloaded": [], "unchanged": [], "added": [], "removed": [], "errors": {}}
+        names = [name for name in fleet.names if os.path.abspath(fleet.path(name)) in paths]
+        if self.index_path in paths:
+            try:
+                report["added"], report["removed"] = fleet.reload_index()
+            except Exception as error:
+                # keep the previous index
+                report["errors"][os.path.basename(fleet.filename)] = error
+            else:
+                for name in report["removed"]:
+                    self._digests.pop(name, None)
+                names.extend(name for name in report["added"] if name not in names)
+                self.monitor.set_files(self._filenames())
+        for name in names:
+            if name not in report["added"] and not fleet.is_loaded(name):
+                continue
+            try:
+                content, _, digest = read_source(fleet.path(name))
+            except OSError as error:
+                report["errors"][name] = error
+                continue
+            if digest == self._digests.get(name):
+                report["unchanged"].append(name)
+                continue
+            file_report, cfg = validate_content(content, fleet.path(name), Loader=fleet.Loader)
+            if cfg is None:
+                report["errors"][name] = file_report
+                continue
+            fleet.replace(name, cfg)
+            self._digests[name] = digest
+            if name not in report["added"]:
+                report["reloaded"].append(name)
+        self.generation += 1
+        return report
+
+    def _run(self):
+        while not self._stop.is_set():
+            timeout = self.monitor.next_timeout(self.interval)
+            try:
+                if self.monitor.watcher.blocking:
+                    self.check(timeout)
+                else:
+                    self._stop.wait(timeout)
+                    self.check()
+            except Exception as error:
+                # keep watching: report, then wait before the next check
+                self.last_error = error
+                print("wnb-reloader: reload failed", file=sys.stderr)
+                traceback.print_exc()
+                self._stop.wait(self.interval)
+
+    def start(self):
+        """Check for changes in a background (daemon) thread"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="wnb-reloader", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        self.stop()
+        self.monitor.close()
@@ -0,0 +1,250 @@
+"""
+Headless (Agg) rendering of centrogram + G charts
+
+A `ChartRenderer` builds the figure, axes and envelope lines of an aircraft
+once; each chart only updates the G scatter data before being saved. PNG
+charts are blitted: the static background is rasterized once and only the
+scatter and title are drawn over it.
+matplotlib is used through its object API (no pyplot), so rendering does
+not depend on the configured backend nor needs a display.
+"""
+
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from . import profiling
+
+ALLOWED_XAXIS = ["lever_arm", "moment"]
+CHART_FORMATS = ["png", "svg"]
+AXIS_LABELS = {"lever_arm": "lever_arm (m)", "moment": "moment (kg.m)"}
+
+
+class ChartRenderer:
+    """Reusable chart of the envelopes of an aircraft (an `AircraftModel`)"""
+
+    def __init__(self, model, xaxis="lever_arm", figsize=(6.4, 4.8), dpi=100):
+        if xaxis not in ALLOWED_XAXIS:
+            raise NotImplementedError(
+                "unknown x-axis '%s' - not in %s" % (xaxis, ALLOWED_XAXIS)
+            )
+        with profiling.stage("plot"):
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+
+            self.model = model
+            self.xaxis = xaxis
+            self.figure = Figure(figsize=figsize, dpi=dpi)
+            FigureCanvasAgg(self.figure)
+            self.axes = self.figure.add_subplot()
+            for envelope in model.envelopes:
+                x = list(envelope.centrogram.x(xaxis))
+                y = list(envelope.centrogram.mass)
+                self.axes.plot(
+                    x + x[:1],
+                    y + y[:1],
+                    linestyle="-" if envelope.condition == "loaded" else "--",
+                    label=envelope.name,
+                )
+            if len(model.envelopes) > 1:
+                self.axes.legend(loc="best")
+            self.axes.set_xlabel(AXIS_LABELS[xaxis])
+            self.axes.set_ylabel("mass (kg)")
+            # the G scatter is the only artist updated per chart
+            self.scatter = self.axes.scatter([], [], zorder=3)
+            self.title = self.axes.set_title(model.immat)
+            self._limits = (self.axes.get_xlim(), self.axes.get_ylim())
+            self._background = None
+
+    def render(self, filename, x, mass, inside=None, title=None, fmt=None):
+        """Save the chart of G points (x, mass) to `filename`
+
+        `fmt` (see `CHART_FORMATS`) defaults to the file extension. Points
+        are green if `inside` (computed if None), red otherwise.
+        """
+        fmt = fmt or os.path.splitext(filename)[1].lstrip(".").lower()
+        if fmt not in CHART_FORMATS:
+            raise NotImplementedError(
+                "unknown chart format '%s' - not in %s" % (fmt, CHART_FORMATS)
+            )
+        with profiling.stage("plot"):
+            import numpy as np
+
+            x = np.atleast_1d(np.asarray(x, dtype=float))
+            mass = np.atleast_1d(np.asarray(mass, dtype=float))
+            if inside is None:
+                inside = self.model.centrogram.contains(x, mass, xaxis=self.xaxis)
+            inside = np.broadcast_to(inside, x.shape)
+            self.scatter.set_offsets(np.column_stack([x, mass]))
+            self.scatter.set_color(np.where(inside, "green", "red"))
+            self.title.set_text(
+                self.model.immat if title is None else "%s - %s" % (self.model.immat, title)
+            )
+            background_kept = self._show_points(x, mass)
+            if fmt == "png" and background_kept:
+                self._blit(filename)
+            else:
+                self.figure.savefig(filename, format=fmt)
+
+    def _blit(self, filename):
+        import numpy as np
+        from matplotlib.image import imsave
+
+        canvas = self.figure.canvas
+        if self._background is None:
+            # an empty (rather than hidden) title keeps its position
+            text = self.title.get_text()
+            self.scatter.set_visible(False)
+            self.title.set_text("")
+            canvas.draw()
+            self._background = canvas.copy_from_bbox(self.figure.bbox)
+            self.scatter.set_visible(True)
+            self.title.set_text(text)
+        canvas.restore_region(self._background)
+        self.axes.draw_artist(self.scatter)
+        self.axes.draw_artist(self.title)
+        imsave(filename, np.asarray(canvas.buffer_rgba()), format="png", dpi=self.figure.dpi)
+
+    def _show_points(self, x, mass):
+        # envelope view, enlarged for points outside of it only, so that a
+        # chart does not depend on previously rendered ones.
+        # Returns True if the envelope view is kept (background unchanged).
+        (x_min, x_max), (y_min, y_max) = self._limits
+        if x.min() >= x_min and x.max() <= x_max and mass.min() >= y_min and mass.max() <= y_max:
+            self.axes.set_xlim(x_min, x_max)
+            self.axes.set_ylim(y_min, y_max)
+            return True
+        x_pad, y_pad = 0.05 * (x_max - x_min), 0.05 * (y_max - y_min)
+        self.axes.set_xlim(min(x_min, x.min() - x_pad), max(x_max, x.max() + x_pad))
+        self.axes.set_ylim(min(y_min, mass.min() - y_pad), max(y_max, mass.max() + y_pad))
+        return False
+
+
+class _Renderers:
+    """Lazily created `ChartRenderer` per aircraft immatriculation"""
+
+    def __init__(self, models, xaxis, fmt):
+        self.models = {model.immat: model for model in models.values()}
+        self.xaxis = xaxis
+        self.fmt = fmt
+        self.renderers = {}
+
+    def render(self, jobs):
+        for filename, immat, x, mass, inside, title in jobs:
+            try:
+                renderer = self.renderers[immat]
+            except KeyError:
+                renderer = ChartRenderer(self.models[immat], xaxis=self.xaxis)
+                self.renderers[immat] = renderer
+            renderer.render(filename, x, mass, inside=inside, title=title, fmt=self.fmt)
+        return len(jobs)
+
+
+_worker_renderers = None
+
+
+def _init_worker(models, xaxis, fmt):
+    global _worker_renderers
+    _worker_renderers = _Renderers(models, xaxis, fmt)
+
+
+def _render_jobs(jobs):
+    return _worker_renderers.render(jobs)
+
+
+def _safe_name(name):
+    return re.sub(r"[^\w.-]", "_", str(name))
+
+
+class ChartWriter:
+    """Render a chart per batch result (see `evaluate_scenarios`) to a directory
+
+    Used like `ResultsWriter`: `write(results)` may be called for each chunk
+    of results, and `close()` waits for pending charts. Files are named
+    after the result "id" (or its position), suffixed with the position of
+    the result if the name is already used, and charts are rendered in
+    `workers` processes, each reusing one figure per aircraft. Results with
+    an "error" have no chart.
+    """
+
+    def __init__(
+        self, models, directory, fmt="png", xaxis="lever_arm", workers=None, chunk_size=50
+    ):
+        if fmt not in CHART_FORMATS:
+            raise NotImplementedError(
+                "unknown chart format '%s' - not in %s" % (fmt, CHART_FORMATS)
+            )
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fmt = fmt
+        self.xaxis = xaxis
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.count = 0
+        self.filenames = []
+        self._names = set()
+        self._pending = deque()
+        if workers and workers > 1:
+            self._renderers = None
+            self._pool = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(models, xaxis, fmt),
+            )
+        else:
+            self._renderers = _Renderers(models, xaxis, fmt)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, results):
+        jobs = []
+        for result in results:
+            self.count += 1
+            if result.get("error"):
+                # no G to draw
+                continue
+            name = result.get("id")
+            name = _safe_name(name) if name not in (None, "") else "%06d" % self.count
+            # duplicate ids (or ids equal once made safe) must not overwrite charts
+            unique, k = name, self.count
+            while unique in self._names:
+                unique = "%s-%d" % (name, k)
+                k += 1
+            name = unique
+            self._names.add(name)
+            filename = os.path.join(self.directory, "%s.%s" % (name, self.fmt))
+            self.filenames.append(filename)
+            jobs.append(
+                (
+                    filename,
+                    result["aircraft"],
+                    result[self.xaxis],
+                    result["mass"],
+                    result["inside"],
+                    result.get("id"),
+                )
+            )
+        for start in range(0, len(jobs), self.chunk_size):
+            chunk = jobs[start : start + self.chunk_size]
+            if self._pool is None:
+                self._renderers.render(chunk)
+                continue
+            self._pending.append(self._pool.submit(_render_jobs, chunk))
+            if len(self._pending) >= 2 * self.workers:
+                self._pending.popleft().result()
+
+    def close(self):
+        if self._pool is None:
+            return
+        try:
+            while self._pending:
+                self._pending.popleft().result()
+        finally:
+            self._pool.shutdown()
+            self._pool = None
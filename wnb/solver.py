@@ -0,0 +1,128 @@
+"""
+Allowable values of a load station
+
+With every other load fixed, changing the value t of a station moves G
+along a straight line in moment space: (M0 + a * t, m0 + b * t) with
+b = density factor and a = b * lever arm. Crossings of centrogram edges are
+roots of a linear (moment space) or quadratic (lever arm space, after
+multiplying by the mass) equation in t.
+"""
+
+import numpy as np
+
+from .model import loads_to_values
+from .wnb import get_aircraft_model
+
+# relative tolerance on edge parameter when checking roots
+EPSILON = 1e-9
+
+
+def _crossings(centrogram, xaxis, M0, m0, a, b):
+    x1 = centrogram.x(xaxis)
+    y1 = centrogram.mass
+    x2 = np.roll(x1, -1)
+    y2 = np.roll(y1, -1)
+    # normal of each edge: n . (p - p1) = 0 on the edge line
+    nx, ny = y2 - y1, -(x2 - x1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if xaxis == "moment":
+            c1 = nx * a + ny * b
+            c0 = nx * (M0 - x1) + ny * (m0 - y1)
+            roots = [-c0 / c1]
+        else:
+            A = ny * b * b
+            B = nx * (a - x1 * b) + ny * (2 * m0 * b - y1 * b)
+            C = nx * (M0 - x1 * m0) + ny * (m0 * m0 - y1 * m0)
+            delta = B * B - 4 * A * C
+            sqrt_delta = np.sqrt(np.where(delta >= 0, delta, np.nan))
+            linear = A == 0
+            roots = [
+                np.where(linear, -C / B, (-B - sqrt_delta) / (2 * A)),
+                np.where(linear, np.nan, (-B + sqrt_delta) / (2 * A)),
+            ]
+    crossings = []
+    length2 = (x2 - x1) ** 2 + (y2 - y1) ** 2
+    for t in roots:
+        m = m0 + b * t
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x = (M0 + a * t) / m if xaxis == "lever_arm" else M0 + a * t
+            # position along the edge
+            s = ((x - x1) * (x2 - x1) + (m - y1) * (y2 - y1)) / length2
+        ok = np.isfinite(t) & (s >= -EPSILON) & (s <= 1 + EPSILON) & (m > 0)
+        crossings.extend(t[ok].tolist())
+    return crossings
+
+
+def allowable_range(cfg, values, station, xaxis="lever_arm"):
+    """Intervals of the value of load `station` keeping G inside the centrogram
+
+    `values` is the current loading (loads list or values). Returns a sorted
+    list of (low, high) intervals within the station [min, max] range
+    (several intervals are possible with a non-convex centrogram).
+    """
+    model = get_aircraft_model(cfg)
+    if len(values) and hasattr(values[0], "designation"):
+        values = loads_to_values(values)
+    values = np.asarray(values, dtype=float)
+    centrogram = model.centrogram
+    station = int(station)
+
+    b = float(model.factors[station])
+    a = b * float(model.lever_arms[station])
+    masses = values * model.factors
+    M0 = float(np.sum(masses * model.lever_arms)) - a * values[station]
+    m0 = float(np.sum(masses)) - b * values[station]
+    t_min, t_max = float(model.mins[station]), float(model.maxs[station])
+
+    def inside(t):
+        m = m0 + b * t
+        x = (M0 + a * t) / m if xaxis == "lever_arm" else M0 + a * t
+        return centrogram.contains_point(x, m, xaxis=xaxis)
+
+    if t_min == t_max:
+        return [(t_min, t_max)] if inside(t_min) else []
+
+    breakpoints = [t_min, t_max]
+    breakpoints += [
+        t for t in _crossings(centrogram, xaxis, M0, m0, a, b) if t_min < t < t_max
+    ]
+    breakpoints = sorted(set(breakpoints))
+
+    intervals = []
+    for low, high in zip(breakpoints[:-1], breakpoints[1:]):
+        if not inside(0.5 * (low + high)):
+            continue
+        if intervals and intervals[-1][1] == low:
+            intervals[-1] = (intervals[-1][0], high)
+        else:
+            intervals.append((low, high))
+    return intervals
+
+
+def allowable_ranges(cfg, values, xaxis="lever_arm"):
+    """`allowable_range` of every adjustable load station
+
+    Returns a {station index: intervals} dict.
+    """
+    model = get_aircraft_model(cfg)
+    if len(values) and hasattr(values[0], "designation"):
+        values = loads_to_values(values)
+    return {
+        station: allowable_range(model, values, station, xaxis=xaxis)
+        for station in np.flatnonzero(model.adjustable).tolist()
+    }
+
+
+def max_additional_load(cfg, values, station, xaxis="lever_arm"):
+    """How much can still be added to load `station` keeping G inside
+
+    Returns None if G is currently outside the centrogram.
+    """
+    model = get_aircraft_model(cfg)
+    if len(values) and hasattr(values[0], "designation"):
+        values = loads_to_values(values)
+    value = float(values[station])
+    for low, high in allowable_range(model, values, station, xaxis=xaxis):
+        if low <= value <= high:
+            return high - value
+    return None
@@ -0,0 +1,103 @@
+"""
+Centre of gravity trajectory while fuel is burnt
+
+Time is in hours, fuel burn rate in L/h.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from .model import LOAD_KIND_VOLUME, loads_to_values
+from .wnb import calculate_cg, get_aircraft_model
+
+CGState = namedtuple(
+    "CGState",
+    ["step", "time", "volume", "mass", "moment", "lever_arm", "inside", "exit_step"],
+)
+
+
+def _fuel_station(model):
+    for j, kind in enumerate(model.kinds):
+        if kind == LOAD_KIND_VOLUME:
+            return j
+    raise NotImplementedError("aircraft has no liquid (volume) load")
+
+
+def _volumes(volume, rate, waypoints, dt, duration):
+    # yield (time, volume) until fuel (or profile, or duration) is exhausted
+    if waypoints is not None:
+        times, wp_volumes = np.asarray(waypoints, dtype=float).T
+        end = times[-1] if duration is None else min(duration, times[-1])
+        n_steps = int(np.floor((end - times[0]) / dt + 1e-9))
+        for step in range(n_steps + 1):
+            time = times[0] + step * dt
+            yield time, float(np.interp(time, times, wp_volumes))
+        return
+    if rate is None:
+        raise ValueError("a fuel burn rate or waypoints are required")
+    step = 0
+    while True:
+        time = step * dt
+        if duration is not None and time > duration + 1e-9:
+            return
+        yield time, volume
+        if volume <= 0:
+            return
+        volume = max(volume - rate * dt, 0.0)
+        step += 1
+
+
+def simulate_fuel_burn(
+    cfg,
+    values=None,
+    rate=None,
+    waypoints=None,
+    dt=1.0 / 60,
+    station=None,
+    duration=None,
+    xaxis="lever_arm",
+):
+    """Yield a `CGState` per time step along the flight
+
+    `values` is the starting loading (loads list or values, default: load
+    defaults). Fuel of load `station` (default: first liquid load) is burnt
+    at `rate` L/h, or follows `waypoints`, a list of (time, volume).
+    Mass and moment are updated incrementally at each step. `exit_step`
+    is the first step at which G is outside the centrogram (None until then).
+    """
+    model = get_aircraft_model(cfg)
+    if values is None:
+        values = model.default_values()
+    elif len(values) and hasattr(values[0], "designation"):
+        values = loads_to_values(values)
+    if station is None:
+        station = _fuel_station(model)
+    G = calculate_cg(model, values)
+    mass, moment = G.mass, G.moment
+    density = float(model.factors[station])
+    lever_arm = float(model.lever_arms[station])
+    centrogram = model.centrogram
+    volume = float(values[station])
+
+    exit_step = None
+    for step, (time, new_volume) in enumerate(
+        _volumes(volume, rate, waypoints, dt, duration)
+    ):
+        delta_mass = (new_volume - volume) * density
+        volume = new_volume
+        mass += delta_mass
+        moment += delta_mass * lever_arm
+        x = moment / mass if xaxis == "lever_arm" else moment
+        inside = centrogram.contains_point(x, mass, xaxis=xaxis)
+        if not inside and exit_step is None:
+            exit_step = step
+        yield CGState(step, time, volume, mass, moment, moment / mass, inside, exit_step)
+
+
+def first_envelope_exit(states):
+    """First state outside the centrogram (None if G stays inside)"""
+    for state in states:
+        if not state.inside:
+            return state
+    return None
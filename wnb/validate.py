@@ -0,0 +1,503 @@
+"""
+Validation of weight and balance data files
+
+Unlike loading, validation does not stop at the first problem: every issue
+of every file is reported, with the path of the faulty item (e.g.
+"loads[2].volume.min"). Files are checked against a schema compiled once
+(types, required keys, format version), then for consistency (liquids,
+load bounds, centrogram points and polygons) and finally loaded and
+compiled like `load_aircraft_config` does. Files of an index are checked
+in a process pool.
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from numbers import Real
+
+import munch
+import yaml
+
+from .envelopes import ENVELOPE_CONDITIONS
+from .wnb import (
+    POINT_TOLERANCE,
+    SUPPORTED_FILE_FORMAT_VERSIONS,
+    YAML_LOADER_DEFAULT,
+    _aircraft_config_from_data,
+    get_aircraft_model,
+)
+
+Issue = namedtuple("Issue", ["path", "message"])
+
+
+class FileReport:
+    """Issues of a file (valid if there are none)"""
+
+    def __init__(self, filename, issues=None, immat=None):
+        self.filename = filename
+        self.issues = list(issues or [])
+        self.immat = immat
+
+    def __repr__(self):
+        return "<FileReport %s: %d issues>" % (self.filename, len(self.issues))
+
+    @property
+    def valid(self):
+        return not self.issues
+
+    def to_dict(self):
+        return {
+            "file": self.filename,
+            "immat": self.immat,
+            "valid": self.valid,
+            "issues": [issue._asdict() for issue in self.issues],
+        }
+
+
+class FleetReport:
+    """Issues of an index file and of each of its aircraft files"""
+
+    def __init__(self, index, issues, files):
+        self.index = index
+        self.issues = list(issues)
+        self.files = list(files)
+
+    def __repr__(self):
+        return "<FleetReport %s: %d files, %d invalid>" % (
+            self.index,
+            len(self.files),
+            sum(not report.valid for report in self.files),
+        )
+
+    @property
+    def valid(self):
+        return not self.issues and all(report.valid for report in self.files)
+
+    def to_dict(self):
+        return {
+            "index": self.index,
+            "valid": self.valid,
+            "issues": [issue._asdict() for issue in self.issues],
+            "files": [report.to_dict() for report in self.files],
+        }
+
+
+# schema
+
+
+class _Rule:
+    def check(self, value, path, issues):
+        raise NotImplementedError
+
+
+class Optional:
+    """Optional key of a mapping schema"""
+
+    def __init__(self, spec):
+        self.spec = spec
+
+
+class Const(_Rule):
+    def __init__(self, *values):
+        self.values = values
+
+    def check(self, value, path, issues):
+        if value not in self.values:
+            expected = self.values[0] if len(self.values) == 1 else list(self.values)
+            issues.append(Issue(path, "should be %r, not %r" % (expected, value)))
+
+
+class Number(_Rule):
+    def __init__(self, positive=False):
+        self.positive = positive
+
+    def check(self, value, path, issues):
+        if not isinstance(value, Real) or isinstance(value, bool):
+            issues.append(Issue(path, "should be a number, not %r" % (value,)))
+        elif self.positive and value <= 0:
+            issues.append(Issue(path, "should be positive, not %r" % (value,)))
+
+
+class _Type(_Rule):
+    def __init__(self, types):
+        self.types = types
+
+    def check(self, value, path, issues):
+        if not isinstance(value, self.types):
+            issues.append(Issue(path, "should be a %s, not %r" % (_type_name(self.types), value)))
+
+
+class _Mapping(_Rule):
+    def __init__(self, keys):
+        self.keys = keys
+
+    def check(self, value, path, issues):
+        if not isinstance(value, dict):
+            issues.append(Issue(path, "should be a mapping, not %r" % (value,)))
+            return
+        for key, (rule, required) in self.keys.items():
+            if key in value:
+                rule.check(value[key], _join(path, key), issues)
+            elif required:
+                issues.append(Issue(_join(path, key), "is required"))
+
+
+class MapOf(_Rule):
+    """Mapping with any (string) keys and values checked by `spec`"""
+
+    def __init__(self, spec):
+        self.rule = compile_schema(spec)
+
+    def check(self, value, path, issues):
+        if not isinstance(value, dict):
+            issues.append(Issue(path, "should be a mapping, not %r" % (value,)))
+            return
+        for key, item in value.items():
+            self.rule.check(item, _join(path, key), issues)
+
+
+class _Sequence(_Rule):
+    def __init__(self, rule):
+        self.rule = rule
+
+    def check(self, value, path, issues):
+        if not isinstance(value, list):
+            issues.append(Issue(path, "should be a list, not %r" % (value,)))
+            return
+        for i, item in enumerate(value):
+            self.rule.check(item, "%s[%d]" % (path, i), issues)
+
+
+def compile_schema(spec):
+    """Compile a schema: a dict (keys, `Optional` ones), a one item list
+    (items), a type or tuple of types, or a rule (`Const`, `Number`, `MapOf`)"""
+    if isinstance(spec, _Rule):
+        return spec
+    if isinstance(spec, dict):
+        keys = {}
+        for key, value in spec.items():
+            if isinstance(value, Optional):
+                keys[key] = (compile_schema(value.spec), False)
+            else:
+                keys[key] = (compile_schema(value), True)
+        return _Mapping(keys)
+    if isinstance(spec, list):
+        return _Sequence(compile_schema(spec[0]))
+    if isinstance(spec, (type, tuple)):
+        return _Type(spec)
+    raise TypeError("invalid schema %r" % (spec,))
+
+
+def _type_name(types):
+    if isinstance(types, tuple):
+        return " or ".join(t.__name__ for t in types)
+    return types.__name__
+
+
+def _join(path, key):
+    return "%s.%s" % (path, key) if path else str(key)
+
+
+_HEADER = {
+    "application": Const("wnb"),
+    "file_format_version": Const(*SUPPORTED_FILE_FORMAT_VERSIONS),
+}
+_POINT = {
+    "designation": Optional((str, int)),
+    "mass": Number(positive=True),
+    "lever_arm": Optional(Number()),
+    "moment": Optional(Number()),
+}
+_LOAD_VALUES = {
+    "default": Number(),
+    "min": Optional(Number()),
+    "max": Optional(Number()),
+    "step": Optional(Number(positive=True)),
+}
+
+INDEX_SCHEMA = compile_schema(
+    dict(_HEADER, usage=Const("aircrafts-index"), title=Optional(str), aircrafts=[str])
+)
+AIRCRAFT_SCHEMA = compile_schema(
+    dict(
+        _HEADER,
+        usage=Const("aircraft-wnb-data"),
+        aircraft={
+            "immat": str,
+            "designation": str,
+            "type": Optional(str),
+            "category": Optional(str),
+        },
+        constants=Optional({"liquids": MapOf({"density": Number(positive=True)})}),
+        centrogram=[_POINT],
+        envelopes=Optional(
+            [
+                {
+                    "name": str,
+                    "condition": Optional(Const(*ENVELOPE_CONDITIONS)),
+                    "points": [_POINT],
+                }
+            ]
+        ),
+        loads=[
+            {
+                "designation": str,
+                "lever_arm": Number(),
+                "mass": Optional(_LOAD_VALUES),
+                "volume": Optional(_LOAD_VALUES),
+                "liquid": Optional(str),
+            }
+        ],
+    )
+)
+
+
+# consistency checks
+
+
+def _check_loads(cfg, issues):
+    liquids = (cfg.get("constants") or {}).get("liquids") or {}
+    for i, load in enumerate(cfg.get("loads") or []):
+        if not isinstance(load, dict):
+            continue
+        path = "loads[%d]" % i
+        kinds = [kind for kind in ("mass", "volume") if kind in load]
+        if len(kinds) != 1:
+            issues.append(Issue(path, "should have either a mass or a volume"))
+            continue
+        if kinds == ["volume"]:
+            if "liquid" not in load:
+                issues.append(Issue(path, "volume load should have a liquid"))
+            elif load["liquid"] not in liquids:
+                issues.append(
+                    Issue(
+                        _join(path, "liquid"),
+                        "unknown liquid %r - not in constants.liquids" % (load["liquid"],),
+                    )
+                )
+        elif "liquid" in load:
+            issues.append(Issue(_join(path, "liquid"), "only volume loads have a liquid"))
+        values = load[kinds[0]]
+        if not isinstance(values, dict) or not all(
+            _is_number(values.get(key, 0)) for key in ("default", "min", "max")
+        ):
+            continue  # reported by the schema
+        path = _join(path, kinds[0])
+        if ("min" in values) != ("max" in values):
+            issues.append(Issue(path, "should have both min and max, or none"))
+        elif "min" in values and not values["min"] <= values.get("default", 0) <= values["max"]:
+            issues.append(
+                Issue(
+                    path,
+                    "should have min <= default <= max (%r, %r, %r)"
+                    % (values["min"], values.get("default"), values["max"]),
+                )
+            )
+
+
+def _is_number(value):
+    return isinstance(value, Real) and not isinstance(value, bool)
+
+
+def _check_points(points, path, issues):
+    # complete (lever_arm, mass) vertices of valid points, None if any is invalid
+    vertices = {"lever_arm": [], "moment": []}
+    ok = True
+    for i, pt in enumerate(points):
+        if not isinstance(pt, dict) or not _is_number(pt.get("mass")) or pt["mass"] <= 0:
+            ok = False
+            continue
+        point_path = "%s[%d]" % (path, i)
+        mass = pt["mass"]
+        lever_arm, moment = pt.get("lever_arm"), pt.get("moment")
+        if lever_arm is None and moment is None:
+            issues.append(Issue(point_path, "should have lever_arm or moment"))
+            ok = False
+            continue
+        if not all(_is_number(v) for v in (lever_arm, moment) if v is not None):
+            ok = False
+            continue
+        if lever_arm is not None and moment is not None:
+            if abs(lever_arm * mass - moment) > POINT_TOLERANCE * abs(moment):
+                issues.append(
+                    Issue(
+                        point_path,
+                        "inconsistent moment %r (lever_arm * mass = %r)"
+                        % (moment, lever_arm * mass),
+                    )
+                )
+        if lever_arm is None:
+            lever_arm = moment / mass
+        if moment is None:
+            moment = lever_arm * mass
+        vertices["lever_arm"].append((lever_arm, mass))
+        vertices["moment"].append((moment, mass))
+    if not ok:
+        return
+    for xaxis, polygon in vertices.items():
+        for message in polygon_issues(polygon):
+            issues.append(Issue(path, "%s (%s x-axis)" % (message, xaxis)))
+
+
+def polygon_issues(vertices):
+    """Problems of a polygon given as a list of (x, y) vertices (closing
+    vertex optional): too few vertices, zero area, self-intersection"""
+    if len(vertices) > 1 and vertices[0] == vertices[-1]:
+        vertices = vertices[:-1]
+    distinct = []
+    for vertex in vertices:
+        if not distinct or vertex != distinct[-1]:
+            distinct.append(vertex)
+    if len(distinct) < 3:
+        return ["should have at least 3 distinct vertices"]
+    area = 0.0
+    n = len(distinct)
+    for i in range(n):
+        (x1, y1), (x2, y2) = distinct[i], distinct[(i + 1) % n]
+        area += x1 * y2 - x2 * y1
+    if area == 0:
+        return ["should have a non-zero area"]
+    issues = []
+    for i in range(n):
+        for j in range(i + 1, n):
+            # adjacent edges share a vertex
+            if j == i + 1 or (i == 0 and j == n - 1):
+                continue
+            if _segments_intersect(
+                distinct[i], distinct[(i + 1) % n], distinct[j], distinct[(j + 1) % n]
+            ):
+                issues.append("self-intersecting: edges %d and %d cross" % (i, j))
+    return issues
+
+
+def _orientation(a, b, c):
+    value = (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+    return (value > 0) - (value < 0)
+
+
+def _on_segment(a, b, c):
+    return min(a[0], b[0]) <= c[0] <= max(a[0], b[0]) and min(a[1], b[1]) <= c[1] <= max(
+        a[1], b[1]
+    )
+
+
+def _segments_intersect(p1, p2, q1, q2):
+    o1, o2 = _orientation(p1, p2, q1), _orientation(p1, p2, q2)
+    o3, o4 = _orientation(q1, q2, p1), _orientation(q1, q2, p2)
+    if o1 != o2 and o3 != o4:
+        return True
+    return (
+        (o1 == 0 and _on_segment(p1, p2, q1))
+        or (o2 == 0 and _on_segment(p1, p2, q2))
+        or (o3 == 0 and _on_segment(q1, q2, p1))
+        or (o4 == 0 and _on_segment(q1, q2, p2))
+    )
+
+
+def check_aircraft_data(cfg):
+    """List of `Issue`s of parsed (plain dict) aircraft data"""
+    issues = []
+    AIRCRAFT_SCHEMA.check(cfg, "", issues)
+    if not isinstance(cfg, dict):
+        return issues
+    _check_loads(cfg, issues)
+    if isinstance(cfg.get("centrogram"), list):
+        _check_points(cfg["centrogram"], "centrogram", issues)
+    envelopes = cfg.get("envelopes")
+    if isinstance(envelopes, list):
+        names = []
+        for i, envelope in enumerate(envelopes):
+            if isinstance(envelope, dict) and isinstance(envelope.get("points"), list):
+                _check_points(envelope["points"], "envelopes[%d].points" % i, issues)
+                if envelope.get("name") in names + ["normal"]:
+                    issues.append(
+                        Issue("envelopes[%d].name" % i, "duplicate name %r" % envelope["name"])
+                    )
+                names.append(envelope.get("name"))
+    return issues
+
+
+def validate_file(filename, Loader=YAML_LOADER_DEFAULT):
+    """Check an aircraft data file: return a `FileReport`"""
+    try:
+        with open(filename, "rb") as file:
+            content = file.read()
+    except OSError as error:
+        return FileReport(filename, [Issue("", str(error))])
+    report, _ = validate_content(content, filename, Loader=Loader)
+    return report
+
+
+def validate_content(content, filename="<data>", Loader=YAML_LOADER_DEFAULT):
+    """Check aircraft data (bytes): return (`FileReport`, config or None)
+
+    The config is the compiled (see `get_aircraft_model`) config of valid
+    data, parsed once.
+    """
+    report = FileReport(filename)
+    try:
+        data = yaml.load(content, Loader=Loader)
+    except yaml.YAMLError as error:
+        report.issues.append(Issue("", str(error).replace("\n", " ")))
+        return report, None
+    report.issues.extend(check_aircraft_data(data))
+    if isinstance(data, dict) and isinstance(data.get("aircraft"), dict):
+        report.immat = data["aircraft"].get("immat")
+    if report.issues:
+        return report, None
+    # the loader must accept what the validator accepts
+    try:
+        cfg = _aircraft_config_from_data(munch.munchify(data))
+        get_aircraft_model(cfg)
+    except Exception as error:
+        report.issues.append(Issue("", "%s: %s" % (type(error).__name__, error)))
+        return report, None
+    return report, cfg
+
+
+def validate_index(index, workers=None, Loader=YAML_LOADER_DEFAULT):
+    """Check an aircrafts index and all its files: return a `FleetReport`
+
+    Files are checked in `workers` processes (all CPUs if None, in process
+    if 0 or 1). Unreadable or missing files are reported in their
+    `FileReport`, duplicate files and immatriculations in the index issues.
+    """
+    issues = []
+    try:
+        with open(index, "rb") as file:
+            data = yaml.load(file.read(), Loader=Loader)
+    except (OSError, yaml.YAMLError) as error:
+        return FleetReport(index, [Issue("", str(error).replace("\n", " "))], [])
+    INDEX_SCHEMA.check(data, "", issues)
+    names = data.get("aircrafts") if isinstance(data, dict) else None
+    if not isinstance(names, list):
+        return FleetReport(index, issues, [])
+    names = [name for name in names if isinstance(name, str)]
+    directory = os.path.dirname(index)
+    filenames = [os.path.join(directory, name) for name in names]
+    reports = validate_files(filenames, workers=workers, Loader=Loader)
+
+    seen = {}
+    for i, (name, report) in enumerate(zip(names, reports)):
+        if name in seen:
+            issues.append(Issue("aircrafts[%d]" % i, "duplicate file %r" % name))
+        elif report.immat is not None and report.immat in seen.values():
+            other = next(n for n, immat in seen.items() if immat == report.immat)
+            issues.append(
+                Issue(
+                    "aircrafts[%d]" % i,
+                    "immatriculation %s already used by %s" % (report.immat, other),
+                )
+            )
+        seen.setdefault(name, report.immat)
+    return FleetReport(index, issues, reports)
+
+
+def validate_files(filenames, workers=None, Loader=YAML_LOADER_DEFAULT):
+    """`FileReport`s of aircraft data files, in order"""
+    if workers is not None and workers <= 1 or len(filenames) <= 1:
+        return [validate_file(filename, Loader=Loader) for filename in filenames]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(
+            pool.map(validate_file, filenames, [Loader] * len(filenames), chunksize=8)
+        )
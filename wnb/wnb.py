@@ -1,57 +1,151 @@
+import numpy as np
 import yaml
 import munch
-from shapely.geometry import Point
-from shapely.geometry.polygon import Polygon
 
-YAML_LOADER_DEFAULT = yaml.FullLoader
+from . import profiling
+from .cache import ConfigCache, read_source
+from .centrogram import Centrogram
+from .envelopes import zero_fuel_values
+from .model import AircraftModel, compile_aircraft, loads_to_values
 
+# libyaml based loader when available
+YAML_LOADER_DEFAULT = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
 
-def load_config(filename, Loader=YAML_LOADER_DEFAULT):
-    with open(filename) as file:
-        config = yaml.load(file, Loader=Loader)
-        config = munch.munchify(config)
-        assert config.application == "wnb"
-        if config.usage == "aircrafts-index":
-            return (config.usage, load_aircrafts_index(filename))
-        elif config.usage == "aircraft-wnb-data":
-            return (config.usage, load_aircraft_config(filename))
-        else:
-            raise NotImplementedError("unexpected config %s" % filename)
+SUPPORTED_FILE_FORMAT_VERSIONS = ["0.0.1"]  # ToDo: use semver
+# relative tolerance when a centrogram point has lever_arm, moment and mass
+POINT_TOLERANCE = 1e-6
+
+
+class ConfigError(ValueError):
+    """Invalid weight and balance data (see also wnb.validate)"""
+
+
+def _check_header(cfg, usage):
+    # explicit checks (not asserts) so that they also run with python -O
+    if cfg.get("application") != "wnb":
+        raise ConfigError("application should be 'wnb', not %r" % cfg.get("application"))
+    if usage is not None and cfg.get("usage") != usage:
+        raise ConfigError("usage should be %r, not %r" % (usage, cfg.get("usage")))
+    if usage is not None and cfg.get("file_format_version") not in SUPPORTED_FILE_FORMAT_VERSIONS:
+        raise ConfigError(
+            "unsupported file_format_version %r - not in %s"
+            % (cfg.get("file_format_version"), SUPPORTED_FILE_FORMAT_VERSIONS)
+        )
+
+
+def _cache_on_config(cfg, key, factory):
+    # compiled data is stored in the instance __dict__ so that it is neither
+    # a munch key (dumped with the config) nor pickled along with it
+    try:
+        return object.__getattribute__(cfg, key)
+    except AttributeError:
+        value = factory(cfg)
+        object.__setattr__(cfg, key, value)
+        return value
+
+
+def _parse(content, Loader=YAML_LOADER_DEFAULT):
+    with profiling.stage("yaml"):
+        data = yaml.load(content, Loader=Loader)
+    with profiling.stage("munch"):
+        return munch.munchify(data)
+
+
+def load_config(filename, Loader=YAML_LOADER_DEFAULT, cache=None):
+    content, stat, digest = read_source(filename)
+    if cache is not None:
+        cached = _as_cache(cache).get(filename, stat, digest)
+        if cached is not None:
+            cfg, model = cached
+            object.__setattr__(cfg, "_aircraft_model", model)
+            return (cfg.usage, cfg)
+    config = _parse(content, Loader)
+    _check_header(config, None)
+    if config.usage == "aircrafts-index":
+        return (config.usage, _aircrafts_index_from_data(config))
+    elif config.usage == "aircraft-wnb-data":
+        cfg = _aircraft_config_from_data(config)
+        if cache is not None:
+            _as_cache(cache).put(filename, stat, digest, (cfg, get_aircraft_model(cfg)))
+        return (config.usage, cfg)
+    else:
+        raise NotImplementedError("unexpected config %s" % filename)
 
 
 def load_aircrafts_index(filename, Loader=YAML_LOADER_DEFAULT):
-    with open(filename) as file:
-        index = yaml.load(file, Loader=Loader)
-        index = munch.munchify(index)
-        assert index.application == "wnb"
-        assert index.usage == "aircrafts-index"
-        assert index.file_format_version == "0.0.1"  # ToDo: use semver
-        return index
-
-
-def load_aircraft_config(filename, Loader=YAML_LOADER_DEFAULT):
-    with open(filename) as file:
-        cfg = yaml.load(file, Loader=Loader)
-        cfg = munch.munchify(cfg)
-        assert cfg.application == "wnb"
-        assert cfg.usage == "aircraft-wnb-data"
-        assert cfg.file_format_version == "0.0.1"  # ToDo: use semver
-        for i, pt in enumerate(cfg.centrogram):
-            if hasattr(pt, "lever_arm") and hasattr(pt, "mass"):
-                cfg.centrogram[i].moment = pt.lever_arm * pt.mass
-            elif hasattr(pt, "moment") and hasattr(pt, "mass"):
-                cfg.centrogram[i].lever_arm = pt.moment / pt.mass
-            elif (
-                hasattr(pt, "lever_arm")
-                and hasattr(pt, "moment")
-                and hasattr(pt, "mass")
-            ):
-                raise NotImplementedError(
-                    "only 2 attributes out of 3 ('lever_arm', 'moment', 'mass') are required"
+    with open(filename, "rb") as file:
+        return _aircrafts_index_from_data(_parse(file.read(), Loader))
+
+
+def _aircrafts_index_from_data(index):
+    _check_header(index, "aircrafts-index")
+    return index
+
+
+def load_aircraft_config(filename, Loader=YAML_LOADER_DEFAULT, cache=None):
+    """Load weight and balance data of an aircraft
+
+    `cache` (a `ConfigCache` or a cache directory) enables the on-disk cache
+    of compiled configs: warm loads skip YAML parsing.
+    """
+    if cache is None:
+        with open(filename, "rb") as file:
+            return _aircraft_config_from_data(_parse(file.read(), Loader))
+
+    cache = _as_cache(cache)
+    content, stat, digest = read_source(filename)
+    with profiling.stage("cache"):
+        cached = cache.get(filename, stat, digest)
+    if cached is not None:
+        cfg, model = cached
+        object.__setattr__(cfg, "_aircraft_model", model)
+        return cfg
+    cfg = _aircraft_config_from_data(_parse(content, Loader))
+    cache.put(filename, stat, digest, (cfg, get_aircraft_model(cfg)))
+    return cfg
+
+
+def _as_cache(cache):
+    if isinstance(cache, ConfigCache):
+        return cache
+    return ConfigCache(cache)
+
+
+def _aircraft_config_from_data(cfg):
+    _check_header(cfg, "aircraft-wnb-data")
+    _complete_points(cfg.centrogram)
+    for envelope in cfg.get("envelopes", []):
+        _complete_points(envelope.points)
+    return cfg
+
+
+def _complete_points(points):
+    for i, pt in enumerate(points):
+        if hasattr(pt, "lever_arm") and hasattr(pt, "moment") and hasattr(pt, "mass"):
+            if abs(pt.lever_arm * pt.mass - pt.moment) > POINT_TOLERANCE * abs(pt.moment):
+                raise ConfigError(
+                    "centrogram point %s: moment should be lever_arm * mass"
+                    % pt.get("designation", i)
                 )
-            else:
-                raise NotImplementedError("centrogram point attribute error")
+        elif hasattr(pt, "lever_arm") and hasattr(pt, "mass"):
+            points[i].moment = pt.lever_arm * pt.mass
+        elif hasattr(pt, "moment") and hasattr(pt, "mass"):
+            points[i].lever_arm = pt.moment / pt.mass
+        else:
+            raise ConfigError(
+                "centrogram point %s: 2 attributes out of 3 ('lever_arm', 'moment', "
+                "'mass') are required, including 'mass'" % pt.get("designation", i)
+            )
+
+
+def load_aircraft_model(filename, Loader=YAML_LOADER_DEFAULT, cache=None):
+    return get_aircraft_model(load_aircraft_config(filename, Loader=Loader, cache=cache))
+
+
+def get_aircraft_model(cfg):
+    if isinstance(cfg, AircraftModel):
         return cfg
+    return _cache_on_config(cfg, "_aircraft_model", compile_aircraft)
 
 
 def create_loads_list(cfg):
@@ -71,7 +165,11 @@ def create_loads_list(cfg):
     return loads
 
 
+@profiling.staged("cg")
 def calculate_cg(cfg, loads):
+    if isinstance(cfg, AircraftModel):
+        return _calculate_cg_model(cfg, loads)
+
     total_mass = 0.0
     total_moment = 0.0
 
@@ -93,10 +191,49 @@ def calculate_cg(cfg, loads):
     return G
 
 
+def _calculate_cg_model(model, values):
+    # values: loads list (see create_loads_list) or sequence of mass/volume values
+    if len(values) and hasattr(values[0], "designation"):
+        values = loads_to_values(values)
+    masses = (np.asarray(values, dtype=float) * model.factors).tolist()
+    moments = [m * x for m, x in zip(masses, model.lever_arms.tolist())]
+    total_mass = sum(masses, 0.0)
+    total_moment = sum(moments, 0.0)
+    G = munch.munchify(
+        {"mass": total_mass, "lever_arm": total_moment / total_mass, "moment": total_moment}
+    )
+    return G
+
+
+def get_centrogram(cfg):
+    if isinstance(cfg, AircraftModel):
+        return cfg.centrogram
+    return _cache_on_config(
+        cfg, "_centrogram", lambda cfg: Centrogram.from_points(cfg.centrogram)
+    )
+
+
+@profiling.staged("centrogram")
 def inside_centrogram(G, centrogram):
-    polygon = []
-    for pt in centrogram:
-        polygon.append((pt.lever_arm, pt.mass))
-    polygon = Polygon(polygon)
-    point = Point(G.lever_arm, G.mass)
-    return polygon.contains(point)
+    if isinstance(centrogram, AircraftModel):
+        centrogram = centrogram.centrogram
+    elif not isinstance(centrogram, Centrogram):
+        centrogram = Centrogram.from_points(centrogram)
+    return centrogram.contains_point(G.lever_arm, G.mass)
+
+
+@profiling.staged("envelopes")
+def inside_envelopes(cfg, loads, xaxis="lever_arm"):
+    """{envelope name: bool} of a loading (see `create_loads_list`)
+
+    Zero fuel envelopes are checked with G computed without liquid loads.
+    """
+    model = get_aircraft_model(cfg)
+    if len(loads) and hasattr(loads[0], "designation"):
+        loads = loads_to_values(loads)
+    values = np.asarray(loads, dtype=float)
+    G = _calculate_cg_model(model, values)
+    G_zero_fuel = None
+    if model.envelopes.has_zero_fuel:
+        G_zero_fuel = _calculate_cg_model(model, zero_fuel_values(model, values))
+    return model.envelopes.contains_point(G, G_zero_fuel, xaxis=xaxis)
@@ -1,7 +1,6 @@
 """
 Calculate weight and balance of aircraft
 
-$ pip install python-i18n[YAML]
 $ pip install termcolor
 $ 
 
@@ -15,51 +14,62 @@ $ python wnb/wnb_console.py --config data/f-bubk.yml
 Choose weight and balance data of a given aircraft
 and display centrogram with moment as x-axis
 $ python wnb/wnb_console.py --config data/f-bubk.yml --centrogram moment
+
+Evaluate loading scenarios from a CSV or JSONL file (or stdin with '-')
+without prompting, and stream results
+$ python wnb/wnb_console.py --config data/f-bubk.yml --batch loads.csv --output results.csv
+$ python wnb/wnb_console.py --index data/index.yml --batch loads.jsonl --workers 4
+
+Also render a chart per scenario (headless, PNG or SVG)
+$ python wnb/wnb_console.py --config data/f-bubk.yml --batch loads.csv --chart-dir charts
+
+Keep computed loadsheets (interactive or batch) in a history database
+(see wnb_history.py to query and export it)
+$ python wnb/wnb_console.py --config data/f-bubk.yml --history loadsheets.sqlite
 """
 
+# Only light modules are imported here so that the console starts fast
+# (e.g. --help): yaml, termcolor, numpy, shapely, matplotlib...
+# are imported when used.
 import click
 import os
-import yaml
-import i18n
-from termcolor import colored, cprint
+import sys
+from collections import deque
 
 DEFAULT_BACKEND = "matplotlib"
 ALLOWED_BACKENDS = ["plotext", "matplotlib"]
 ALLOWED_XAXIS = ["lever_arm", "moment"]
+ALLOWED_BATCH_FORMATS = ["csv", "jsonl"]
+ALLOWED_CHART_FORMATS = ["png", "svg"]
+
+if __name__ == "__main__" and not __package__:
+    # run as a script: "wnb" must be the package, not wnb/wnb.py
+    sys.path[0] = os.path.dirname(sys.path[0])
+
+import wnb
+from wnb import profiling
+from wnb.profiling import ALLOWED_PROFILE_MODES
 
-from wnb import (
-    YAML_LOADER_DEFAULT,
-    load_aircrafts_index,
-    load_aircraft_config,
-    create_loads_list,
-    calculate_cg,
-    inside_centrogram,
-)
 
+def choose_config(fleet):
+    from termcolor import colored, cprint
 
-def choose_config(index, index_path):
     while True:
         print("Index")
-        print("Title: %s" % index.title)
-        for i, aircraft in enumerate(index.aircrafts, 1):
+        print("Title: %s" % fleet.title)
+        for i, aircraft in enumerate(fleet.names, 1):
             print(f"{i}: {aircraft}")
         try:
             aircraft_id = int(input("Aicraft: "))
-            if aircraft_id in range(1, len(index.aircrafts) + 1):
-                aircraft_fname = os.path.join(
-                    index_path, index.aircrafts[aircraft_id - 1]
-                )
-            else:
+            if aircraft_id not in range(1, len(fleet) + 1):
                 raise IndexError
-            cfg = load_aircraft_config(aircraft_fname)
-            break
         except ValueError:
             pass
         except (KeyboardInterrupt, SystemExit):
             raise
         except IndexError:
             text = colored(
-                "Index out of range (must be in [%d;%d])" % (1, len(index.aircrafts)),
+                "Index out of range (must be in [%d;%d])" % (1, len(fleet)),
                 "magenta",
                 attrs=["reverse"],
             )
@@ -67,10 +77,17 @@ def choose_config(index, index_path):
             print()
         except:
             raise
+        else:
+            # out of the try: an invalid aircraft file (ConfigError) is not
+            # an input error
+            cfg = fleet[aircraft_id - 1]
+            break
     return cfg
 
 
 def display_config_basic_format(cfg, spaces=0):
+    import yaml
+
     s = yaml.safe_dump(cfg)
     for line in s.split("\n"):
         print(" " * spaces + line)
@@ -89,7 +106,7 @@ def display_config(cfg):
 
 
 def input_loads(cfg):
-    loads = create_loads_list(cfg)
+    loads = wnb.create_loads_list(cfg)
     for i, load in enumerate(loads):
         # print(load)
         if hasattr(load, "mass"):
@@ -116,11 +133,107 @@ def input_loads(cfg):
     return loads
 
 
-def translate(cfg):
+def run_batch(
+    models,
+    aircraft,
+    batch,
+    output,
+    input_format,
+    output_format,
+    xaxis,
+    workers,
+    chunk_size,
+    chart_dir="",
+    chart_format="png",
+    result_cache_size=0,
+    history=None,
+):
+    if input_format == "":
+        input_format = wnb.guess_format(batch)
+    if output_format == "":
+        output_format = wnb.guess_format(output, default=input_format)
+    infile = sys.stdin if batch == "-" else open(batch, newline="")
+    outfile = sys.stdout if output == "-" else open(output, "w", newline="")
+    charts = None
+    try:
+        writer = wnb.ResultsWriter(outfile, output_format)
+        write = writer.write
+        if chart_dir != "":
+            charts = wnb.ChartWriter(
+                models, chart_dir, fmt=chart_format, xaxis=xaxis, workers=workers
+            )
+
+            def write(results):
+                writer.write(results)
+                charts.write(results)
+
+        rows = wnb.read_scenarios(infile, input_format)
+        if history is not None:
+            rows, write = record_history(history, models, aircraft, rows, write)
+
+        wnb.process_scenarios(
+            models,
+            rows,
+            write,
+            aircraft=aircraft,
+            xaxis=xaxis,
+            chunk_size=chunk_size,
+            workers=workers,
+            result_cache_size=result_cache_size,
+        )
+    finally:
+        if charts is not None:
+            charts.close()
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+    if writer.errors:
+        print("%d scenarios not evaluated (see error)" % writer.errors, file=sys.stderr)
+    return writer.count
+
+
+def record_history(history, models, aircraft, rows, write):
+    # results are written in input order: rows in flight are kept until
+    # their results are appended (with their loads) to the history
+    pending = deque()
+
+    def tee(rows):
+        for row in rows:
+            pending.append(row)
+            yield row
+
+    def write_and_record(results):
+        write(results)
+        chunk = [pending.popleft() for _ in results]
+        history.append_scenarios(models, chunk, results, aircraft=aircraft)
+
+    return tee(rows), write_and_record
+
+
+def batch_models(index, config, cache):
+    from termcolor import colored, cprint
+
+    # {key: AircraftModel} with immatriculation and file name keys
+    if config != "":
+        model = wnb.get_aircraft_model(wnb.load_aircraft_config(config, cache=cache))
+        return {model.immat: model}, model.immat
+    fleet = wnb.Fleet(index, cache=cache)
+    errors = fleet.load_all()
+    for name, error in errors.items():
+        cprint(colored("%s: %s" % (name, error), "red"), file=sys.stderr)
+    models = {}
+    for name in fleet.names:
+        if name not in errors:
+            model = fleet.model(name)
+            models[name] = models[model.immat] = model
+    return models, None
+
+
+def translate(cfg, catalog):
     for i, load in enumerate(cfg.loads):
-        # txt = '.'.join(['messages', cfg.loads[i].designation])  # i18n with namespace
         txt = cfg.loads[i].designation
-        cfg.loads[i].designation = i18n.t(txt)
+        cfg.loads[i].designation = catalog.t(txt)
 
 
 @click.command()
@@ -136,44 +249,153 @@ def translate(cfg):
     default=DEFAULT_BACKEND,
     help="Plotting backend - must be in %s" % ALLOWED_BACKENDS,
 )
-def load(xaxis, index, config, backend):
-    script_path, _ = os.path.split(os.path.abspath(__file__))
-    i18n.load_path.append(os.path.join(script_path, "translations"))
-    i18n.set("filename_format", "{locale}.{format}")  # remove i18n namespace
-    import locale
-
-    cur_locale = locale.getlocale()[0][:2]
-    i18n.set("locale", cur_locale)
+@click.option(
+    "--cache-dir",
+    default="",
+    help="Directory of the compiled aircraft configs cache (disabled if empty)",
+)
+@click.option(
+    "--feasible/--no-feasible",
+    default=False,
+    help="Overlay the region of G reachable over load ranges",
+)
+@click.option(
+    "--batch",
+    default="",
+    help="Non-interactive mode: CSV/JSONL file of loading scenarios ('-' for stdin)",
+)
+@click.option("--output", default="-", help="Batch results file ('-' for stdout)")
+@click.option(
+    "--input-format",
+    default="",
+    help="Batch input format - must be in %s (default: from file extension)"
+    % ALLOWED_BATCH_FORMATS,
+)
+@click.option(
+    "--output-format",
+    default="",
+    help="Batch output format - must be in %s (default: from file extension)"
+    % ALLOWED_BATCH_FORMATS,
+)
+@click.option(
+    "--chart-dir",
+    default="",
+    help="Batch mode: directory where a chart of each scenario is rendered",
+)
+@click.option(
+    "--chart-format",
+    default="png",
+    help="Batch chart format - must be in %s" % ALLOWED_CHART_FORMATS,
+)
+@click.option("--workers", default=0, help="Batch worker processes (0: no pool)")
+@click.option("--chunk-size", default=1000, help="Batch scenarios per chunk")
+@click.option(
+    "--result-cache",
+    default=1024,
+    help="Batch: results of the last loadings kept per process (0: disabled)",
+)
+@click.option(
+    "--history",
+    default="",
+    help="Loadsheet history database the results are appended to (disabled if empty)",
+)
+@click.option(
+    "--profile",
+    default="",
+    help="Print a stage breakdown or cProfile statistics - must be in %s"
+    % ALLOWED_PROFILE_MODES,
+)
+@click.option(
+    "--profile-output",
+    default="",
+    help="Dump cProfile (pstats) data to this file instead of printing it",
+)
+def load(profile, profile_output, **kwargs):
+    with profiling.session(profile, profile_output):
+        run(**kwargs)
+
+
+def run(
+    xaxis,
+    index,
+    config,
+    backend,
+    cache_dir,
+    feasible,
+    batch,
+    output,
+    input_format,
+    output_format,
+    chart_dir,
+    chart_format,
+    workers,
+    chunk_size,
+    result_cache,
+    history,
+):
+    from termcolor import colored, cprint
+
+    cache = cache_dir if cache_dir != "" else None
+    with profiling.stage("i18n"):
+        catalog = wnb.get_catalog(cache=cache)
 
     if xaxis not in ALLOWED_XAXIS:
         raise NotImplementedError(
-            i18n.t("unknown_xaxis").format(xaxis=xaxis, allowed_xaxis=ALLOWED_XAXIS)
+            catalog.t("unknown_xaxis").format(xaxis=xaxis, allowed_xaxis=ALLOWED_XAXIS)
         )
 
+    if batch != "":
+        if (index == "") == (config == ""):
+            raise NotImplementedError(catalog.t("error_index_config_both_empty"))
+        models, aircraft = batch_models(index, config, cache)
+        store = wnb.HistoryStore(history) if history != "" else None
+        try:
+            run_batch(
+                models,
+                aircraft,
+                batch,
+                output,
+                input_format,
+                output_format,
+                xaxis,
+                workers,
+                chunk_size,
+                chart_dir=chart_dir,
+                chart_format=chart_format,
+                result_cache_size=result_cache,
+                history=store,
+            )
+        finally:
+            if store is not None:
+                store.close()
+        return
+
     if index != "" and config == "":
-        index_path, _ = os.path.split(index)
-        index = load_aircrafts_index(index)
-        cfg = choose_config(index, index_path)
+        cfg = choose_config(wnb.Fleet(index, cache=cache))
     elif index == "" and config != "":
-        cfg = load_aircraft_config(config)
+        cfg = wnb.load_aircraft_config(config, cache=cache)
     else:
-        raise NotImplementedError(i18n.t("error_index_config_both_empty"))
+        raise NotImplementedError(catalog.t("error_index_config_both_empty"))
 
     if backend not in ALLOWED_BACKENDS:
         raise NotImplementedError(
-            i18n.t("unknown_backend").format(
+            catalog.t("unknown_backend").format(
                 backend=backend, allowed_backends=ALLOWED_BACKENDS
             )
         )
 
-    translate(cfg)
+    # compiled before translation: designations stay the data file ones
+    # (e.g. in the history, as in batch mode)
+    model = wnb.get_aircraft_model(cfg)
+    with profiling.stage("i18n"):
+        translate(cfg, catalog)
 
     # display_config_basic_format(cfg)
     display_config(cfg)
 
     loads = input_loads(cfg)
 
-    G = calculate_cg(cfg, loads)
+    G = wnb.calculate_cg(cfg, loads)
 
     print("Centrogram:")
     display_config_basic_format(cfg.centrogram, spaces=2)
@@ -197,15 +419,15 @@ def load(xaxis, index, config, backend):
         xG, yG = G.moment, G.mass
         x_label = "moment (kg.m)"
 
-    is_inside_centrogram = inside_centrogram(G, cfg.centrogram)
+    is_inside_centrogram = wnb.inside_centrogram(G, wnb.get_centrogram(cfg))
 
     if is_inside_centrogram:
-        text = colored(i18n.t("G_is_inside_centrogram"), "green", attrs=["reverse"])
+        text = colored(catalog.t("G_is_inside_centrogram"), "green", attrs=["reverse"])
         cprint(text)
         color_G = "green"
     else:
         text = colored(
-            "!!! %s !!!" % i18n.t("G_is_outside_centrogram"),
+            "!!! %s !!!" % catalog.t("G_is_outside_centrogram"),
             "red",
             attrs=["reverse", "blink"],
         )
@@ -213,20 +435,52 @@ def load(xaxis, index, config, backend):
         color_G = "red"
     print("")
 
-    if backend == "plotext":
-        import plotext.plot as plx
+    if history != "":
+        models = {model.immat: model}
+        row = dict(zip(model.designations, wnb.loads_to_values(loads).tolist()))
+        results = wnb.evaluate_scenarios(models, [row], aircraft=model.immat, xaxis=xaxis)
+        with wnb.HistoryStore(history) as store:
+            store.append_scenarios(models, [row], results, aircraft=model.immat)
+
+    if feasible:
+        region = wnb.feasible_region(cfg)
+        if region.always_legal(xaxis):
+            cprint(colored(catalog.t("always_legal"), "green"))
+        elif region.never_legal(xaxis):
+            cprint(colored(catalog.t("never_legal"), "red"))
+        else:
+            print(
+                catalog.t("legal_fraction").format(
+                    fraction=100 * region.legal_fraction(xaxis)
+                )
+            )
+        print("")
 
-        lst_x.append(xG)
-        lst_y.append(yG)
-        plx.scatter(lst_x, lst_y, axes=True, cols=60, rows=20)
+    if backend == "plotext":
+        with profiling.stage("plot"):
+            import plotext.plot as plx
+
+            if feasible:
+                for xs, ys in region.rings(xaxis):
+                    lst_x.extend(xs)
+                    lst_y.extend(ys)
+            lst_x.append(xG)
+            lst_y.append(yG)
+            plx.scatter(lst_x, lst_y, axes=True, cols=60, rows=20)
         plx.show()
     elif backend == "matplotlib":
-        import matplotlib.pyplot as plt
-
-        plt.plot(lst_x, lst_y)
-        plt.scatter(xG, yG, c=color_G)
-        plt.xlabel(x_label)
-        plt.ylabel(y_label)
+        with profiling.stage("plot"):
+            import matplotlib.pyplot as plt
+
+            if feasible:
+                for xs, ys in region.rings(xaxis):
+                    plt.plot(xs, ys, c="grey", linestyle="--")
+                for xs, ys in region.rings(xaxis, which="legal"):
+                    plt.fill(xs, ys, c="green", alpha=0.2)
+            plt.plot(lst_x, lst_y)
+            plt.scatter(xG, yG, c=color_G)
+            plt.xlabel(x_label)
+            plt.ylabel(y_label)
         plt.show()
 
 
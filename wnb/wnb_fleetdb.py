@@ -0,0 +1,44 @@
+"""
+Build a fleet database from an aircrafts index
+
+Only aircrafts whose config file changed since the last build are parsed
+again.
+
+$ python wnb/wnb_fleetdb.py --index data/index.yml --output fleet.wnbdb
+"""
+
+import os
+import sys
+
+import click
+
+if __name__ == "__main__" and not __package__:
+    # run as a script: "wnb" must be the package, not wnb/wnb.py
+    sys.path[0] = os.path.dirname(sys.path[0])
+
+from wnb import build_fleet_database
+
+
+@click.command()
+@click.option("--index", required=True, help="aircrafts-index file")
+@click.option("--output", required=True, help="Fleet database file")
+@click.option(
+    "--cache-dir",
+    default="",
+    help="Directory of the compiled aircraft configs cache (disabled if empty)",
+)
+def build(index, output, cache_dir):
+    cache = cache_dir if cache_dir != "" else None
+    report = build_fleet_database(index, output, cache=cache)
+    for name, error in report["errors"].items():
+        print("%s: %s" % (name, error), file=sys.stderr)
+    print(
+        "%s: %d aircrafts built, %d unchanged, %d errors"
+        % (output, len(report["built"]), len(report["reused"]), len(report["errors"]))
+    )
+    if report["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    build()
@@ -0,0 +1,76 @@
+"""
+Query and export the loadsheet history
+
+Loadsheets are appended by wnb_console.py and wnb_service.py (--history).
+
+$ python wnb/wnb_history.py --db loadsheets.sqlite --aircraft F-BUBK --since 2024-01-01
+$ python wnb/wnb_history.py --db loadsheets.sqlite --outside --format jsonl --output outside.jsonl
+$ python wnb/wnb_history.py --db loadsheets.sqlite --count
+"""
+
+import os
+import sys
+from datetime import datetime
+
+import click
+
+ALLOWED_HISTORY_FORMATS = ["csv", "jsonl"]
+
+if __name__ == "__main__" and not __package__:
+    # run as a script: "wnb" must be the package, not wnb/wnb.py
+    sys.path[0] = os.path.dirname(sys.path[0])
+
+from wnb import HistoryStore
+
+
+def parse_time(value):
+    # ISO 8601 date or date and time, UTC unless an offset is given
+    return datetime.fromisoformat(value) if value != "" else None
+
+
+@click.command()
+@click.option("--db", required=True, help="Loadsheet history database")
+@click.option("--aircraft", default="", help="Immatriculation (all aircrafts if empty)")
+@click.option("--since", default="", help="Start of the time range (ISO 8601)")
+@click.option("--until", default="", help="End of the time range, excluded (ISO 8601)")
+@click.option(
+    "--outside/--all",
+    default=False,
+    help="Only loadsheets outside of the centrogram or of an envelope",
+)
+@click.option("--count", is_flag=True, default=False, help="Only print the number of loadsheets")
+@click.option(
+    "--format",
+    "history_format",
+    default="csv",
+    help="Export format - must be in %s" % ALLOWED_HISTORY_FORMATS,
+)
+@click.option("--output", default="-", help="Export file ('-' for stdout)")
+def export(db, aircraft, since, until, outside, count, history_format, output):
+    if history_format not in ALLOWED_HISTORY_FORMATS:
+        raise NotImplementedError(
+            "unknown history format '%s' - not in %s"
+            % (history_format, ALLOWED_HISTORY_FORMATS)
+        )
+    filters = {
+        "aircraft": aircraft if aircraft != "" else None,
+        "start": parse_time(since),
+        "end": parse_time(until),
+        "outside": True if outside else None,
+    }
+    with HistoryStore(db) as store:
+        if count:
+            print(store.count(**filters))
+            return
+        outfile = sys.stdout if output == "-" else open(output, "w", newline="")
+        try:
+            n = store.export(outfile, fmt=history_format, **filters)
+        finally:
+            if outfile is not sys.stdout:
+                outfile.close()
+    if output != "-":
+        print("%s: %d loadsheets" % (output, n))
+
+
+if __name__ == "__main__":
+    export()
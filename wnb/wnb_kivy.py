@@ -2,15 +2,18 @@
 Python Kivy Weight and Balance
 
 Usage
-$ python wnb/wnb_kivy.py data/f-bubk.yml
-"""
+$ python wnb/wnb_kivy.py data/f-bubk.yml [cache_dir]
 
-import i18n
+cache_dir: directory of the compiled configs (and translations) cache
+"""
 
 import os
 import sys
 
 from kivy.app import App
+from kivy.clock import Clock
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.button import Button
 from kivy.uix.gridlayout import GridLayout
 from kivy.uix.label import Label
 from kivy.uix.textinput import TextInput
@@ -21,16 +24,29 @@ from kivy.uix.togglebutton import ToggleButton
 from math import sin
 from kivy_garden.graph import Graph, MeshLinePlot, ScatterPlot
 
+if __name__ == "__main__" and not __package__:
+    # run as a script: "wnb" must be the package, not wnb/wnb.py
+    sys.path[0] = os.path.dirname(sys.path[0])
+
 from wnb import (
     YAML_LOADER_DEFAULT,
     load_config,
     load_aircraft_config,
     create_loads_list,
     calculate_cg,
-    inside_centrogram,
+    feasible_region,
+    get_aircraft_model,
+    get_catalog,
+    get_centrogram,
+    optimize_loading,
+    ChangeMonitor,
+    reload_aircraft_config,
 )
+from wnb.model import LOAD_KIND_VOLUME
 
 ALLOWED_XAXIS = ["lever_arm", "moment"]
+# seconds between two checks of changes of the aircraft file
+RELOAD_INTERVAL = 1.0
 
 
 def define_load_slider_properties(slider_properties):
@@ -47,17 +63,19 @@ def define_load_slider_properties(slider_properties):
 
 
 class SlidersLayout(GridLayout):
-    sliders = []
-    lbl_values = []
-
-    def __init__(self, cfg, loads, **kwargs):
+    def __init__(self, cfg, loads, on_load_change=None, cache=None, **kwargs):
         super(SlidersLayout, self).__init__(**kwargs)
         self.cols = 3
         self.cfg = cfg
         self.loads = loads
-        for load in self.loads:
+        # on_load_change(i, old_value, new_value) is called on each slider move
+        self.on_load_change = on_load_change
+        self.sliders = []
+        self.lbl_values = []
+        self.values = []
+        for i, load in enumerate(self.loads):
             txt = load.designation
-            txt = i18n.t(txt)
+            txt = get_catalog(cache=cache).t(txt)
             lbl = Label(text=txt)
             self.add_widget(lbl)
             if hasattr(load, "mass"):
@@ -70,39 +88,64 @@ class SlidersLayout(GridLayout):
                 min=slider_properties.min,
                 max=slider_properties.max,
                 value=slider_properties.default,
+                step=slider_properties.step,
             )
             slider.disabled = not slider_properties.enabled
             self.sliders.append(slider)
             self.add_widget(self.sliders[-1])
             self.lbl_values.append(Label(text="Valeur"))
             self.add_widget(self.lbl_values[-1])
-        self.update()
+            self.values.append(slider.value)
+            self.update_load(i)
+            slider.bind(value=lambda slider, value, i=i: self.on_slider_value(i, value))
+
+    def on_slider_value(self, i, value):
+        old_value = self.values[i]
+        if value == old_value:
+            return
+        self.values[i] = value
+        self.update_load(i)
+        if self.on_load_change is not None:
+            self.on_load_change(i, old_value, value)
+
+    def update_load(self, i):
+        value = self.sliders[i].value
+        self.lbl_values[i].text = "%d" % value
+        if hasattr(self.loads[i], "mass"):
+            self.loads[i].mass.current_value = value
+            self.lbl_values[i].text += " kg"
+        elif hasattr(self.loads[i], "volume"):
+            self.loads[i].volume.current_value = value
+            self.lbl_values[i].text += " L"
 
     def update(self):
-        for i, slider in enumerate(self.sliders):
-            self.lbl_values[i].text = "%d" % slider.value
-            if hasattr(self.loads[i], "mass"):
-                self.loads[i].mass.current_value = slider.value
-                self.lbl_values[i].text += " kg"
-            elif hasattr(self.loads[i], "volume"):
-                self.loads[i].volume.current_value = slider.value
-                self.lbl_values[i].text += " L"
+        for i in range(len(self.sliders)):
+            self.on_slider_value(i, self.sliders[i].value)
 
 
 class AircraftLoadLayout(GridLayout):
-    def __init__(self, aircraft_config, **kwargs):
+    def __init__(self, aircraft_config, cache=None, **kwargs):
         super(AircraftLoadLayout, self).__init__(**kwargs)
         self.cols = 1
-        self.cfg = load_aircraft_config(aircraft_config)
+        if isinstance(aircraft_config, str):
+            aircraft_config = load_aircraft_config(aircraft_config, cache=cache)
+        self.cfg = aircraft_config
+        self.model = get_aircraft_model(self.cfg)
         self.loads = create_loads_list(self.cfg)
 
         acft = self.cfg.aircraft
         self.lbl_info = Label(text="%s (%s)" % (acft.designation, acft.immat))
         self.add_widget(self.lbl_info)
 
-        self.sliders = SlidersLayout(self.cfg, self.loads)
+        self.sliders = SlidersLayout(
+            self.cfg, self.loads, on_load_change=self.on_load_change, cache=cache
+        )
         self.add_widget(self.sliders)
 
+        # running totals, updated by delta on each slider move
+        G = calculate_cg(self.cfg, self.loads)
+        self.total_mass, self.total_moment = G.mass, G.moment
+
         self.lbl_center_gravity = Label(text="")
         self.add_widget(self.lbl_center_gravity)
 
@@ -124,58 +167,106 @@ class AircraftLoadLayout(GridLayout):
         self.mesh_line_plot = MeshLinePlot(color=[0, 0, 1, 1])
         self.graph.add_plot(self.mesh_line_plot)
 
+        # region of G reachable over load ranges
+        self.feasible_region = feasible_region(self.cfg)
+        self.feasible_plot = MeshLinePlot(color=[0.5, 0.5, 0.5, 1])
+        self.graph.add_plot(self.feasible_plot)
+
         self.add_widget(self.graph)
 
         self.btn_toggle = ToggleButton(text="lever arm / moment", group="xaxis",)
-        self.btn_toggle.bind(on_press=self.on_touch_move)
+        self.btn_toggle.bind(on_press=self.on_toggle_xaxis)
         self.add_widget(self.btn_toggle)
 
+        self.btn_optimize = Button(text="optimize fuel (max margin)")
+        self.btn_optimize.bind(on_press=self.on_optimize)
+        self.add_widget(self.btn_optimize)
+
         # point = Point(0.8, 400)
         # plot = ScatterPlot(color=(1,0,0,1), pointsize=5)
         self.scatter_plot = ScatterPlot(color=[1, 0, 0, 1], point_size=5)
         # plot.points.append((0.8, 400))
         self.graph.add_plot(self.scatter_plot)
 
+        # xaxis -> (centrogram mesh points, feasible region points, graph bounds)
+        self.axis_cache = {}
+        self.xaxis = None
+        # at most one redraw per frame, whatever the number of slider events
+        self.trigger_update_label_plot = Clock.create_trigger(
+            lambda dt: self.update_label_plot()
+        )
         self.update_label_plot()
 
-    def on_touch_move(self, touch):
-        # print("AircraftLoadLayout.on_touch_move")
-        self.sliders.update()
-        self.update_label_plot()
-
-    def update_label_plot(self):
-        G = calculate_cg(self.cfg, self.loads)
-
-        if self.btn_toggle.state == "normal":
-            self.graph.xlabel = "lever_arm"
-            self.scatter_plot.points = [(G.lever_arm, G.mass)]
-            self.mesh_line_plot.points = [
-                (pt.lever_arm, pt.mass) for pt in self.cfg.centrogram
-            ]
-        else:
-            self.graph.xlabel = "moment"
-            self.scatter_plot.points = [(G.moment, G.mass)]
-            self.mesh_line_plot.points = [
-                (pt.moment, pt.mass) for pt in self.cfg.centrogram
-            ]
-        self.mesh_line_plot.points.append(self.mesh_line_plot.points[0])
+    def on_load_change(self, i, old_value, new_value):
+        delta_mass = (new_value - old_value) * self.model.factors[i]
+        self.total_mass += delta_mass
+        self.total_moment += delta_mass * self.model.lever_arms[i]
+        self.trigger_update_label_plot()
+
+    def on_optimize(self, *args):
+        # liquid loads giving the largest margin, other loads as set
+        free = [
+            designation
+            for designation, kind, adjustable in zip(
+                self.model.designations, self.model.kinds, self.model.adjustable
+            )
+            if kind == LOAD_KIND_VOLUME and adjustable
+        ]
+        values = [slider.value for slider in self.sliders.sliders]
+        result = optimize_loading(self.model, values, free=free)
+        if result is None:
+            return
+        for slider, value in zip(self.sliders.sliders, result.values):
+            slider.value = float(value)
+
+    def on_toggle_xaxis(self, *args):
+        self.trigger_update_label_plot()
+
+    def axis_plot_data(self, xaxis):
+        try:
+            return self.axis_cache[xaxis]
+        except KeyError:
+            pass
+        centrogram = get_centrogram(self.cfg)
+        points = list(centrogram.vertices(xaxis))
+        points.append(points[0])
+        rings = self.feasible_region.rings(xaxis)
+        feasible_points = list(zip(*rings[0])) if rings else []
         delta_x_pc, delta_y_pc = 0.05, 0.05
-        self.graph.xmin = min(x[0] for x in self.mesh_line_plot.points) * (
-            1 - delta_x_pc
-        )
-        self.graph.xmax = max(x[0] for x in self.mesh_line_plot.points) * (
-            1 + delta_x_pc
+        bounds = (
+            min(x[0] for x in points) * (1 - delta_x_pc),
+            max(x[0] for x in points) * (1 + delta_x_pc),
+            min(x[1] for x in points) * (1 - delta_y_pc),
+            max(x[1] for x in points) * (1 + delta_y_pc),
         )
-        self.graph.ymin = min(x[1] for x in self.mesh_line_plot.points) * (
-            1 - delta_x_pc
-        )
-        self.graph.ymax = max(x[1] for x in self.mesh_line_plot.points) * (
-            1 + delta_x_pc
-        )
-        is_inside_centrogram = inside_centrogram(G, self.cfg.centrogram)
+        self.axis_cache[xaxis] = (points, feasible_points, bounds)
+        return self.axis_cache[xaxis]
+
+    def update_label_plot(self):
+        mass, moment = self.total_mass, self.total_moment
+        lever_arm = moment / mass
+
+        xaxis = "lever_arm" if self.btn_toggle.state == "normal" else "moment"
+        if xaxis != self.xaxis:
+            self.xaxis = xaxis
+            points, feasible_points, bounds = self.axis_plot_data(xaxis)
+            self.graph.xlabel = xaxis
+            self.mesh_line_plot.points = points
+            self.feasible_plot.points = feasible_points
+            (
+                self.graph.xmin,
+                self.graph.xmax,
+                self.graph.ymin,
+                self.graph.ymax,
+            ) = bounds
+        x = lever_arm if xaxis == "lever_arm" else moment
+        self.scatter_plot.points = [(x, mass)]
+
+        # same G as displayed: the running totals
+        is_inside_centrogram = self.model.centrogram.contains_point(x, mass, xaxis=xaxis)
         self.lbl_center_gravity.text = (
             "G: (mass=%.1f kg, lever_arm=%.3f m, moment=%.1f kg.m)"
-            % (G.mass, G.lever_arm, G.moment)
+            % (mass, lever_arm, moment)
         )
         if is_inside_centrogram:
             self.lbl_center_gravity.disabled = False
@@ -193,30 +284,47 @@ class AircraftSelectLayout(GridLayout):
 
 
 class MyApp(App):
-    def __init__(self, filename, **kwargs):
-        (config_type, config) = load_config(filename)
+    def __init__(self, filename, cache=None, **kwargs):
+        (config_type, config) = load_config(filename, cache=cache)
         if config_type != "aircraft-wnb-data":
             raise NotImplementedError("currently only aircraft-wnb-data supported")
 
         self.filename = filename
+        self.cache = cache
+        self.aircraft_config = config
         super(MyApp, self).__init__(**kwargs)
 
     def build(self):
-        return AircraftLoadLayout(self.filename)
+        # the aircraft file is reloaded (if valid) when it is edited
+        self.monitor = ChangeMonitor([self.filename])
+        Clock.schedule_interval(self.check_reload, RELOAD_INTERVAL)
+        self.layout = AircraftLoadLayout(self.aircraft_config, cache=self.cache)
+        self.container = BoxLayout()
+        self.container.add_widget(self.layout)
+        return self.container
+
+    def check_reload(self, dt):
+        if not self.monitor.changes():
+            return
+        report, cfg = reload_aircraft_config(self.filename)
+        if cfg is None:
+            for issue in report.issues:
+                print("%s: %s: %s" % (self.filename, issue.path, issue.message), file=sys.stderr)
+            return
+        self.aircraft_config = cfg
+        self.container.remove_widget(self.layout)
+        self.layout = AircraftLoadLayout(cfg, cache=self.cache)
+        self.container.add_widget(self.layout)
+
+    def on_stop(self):
+        self.monitor.close()
 
 
 def main():
     filename = sys.argv[1]  # "data/f-bubk.yml"
+    cache = sys.argv[2] if len(sys.argv) > 2 else None
 
-    script_path, _ = os.path.split(os.path.abspath(__file__))
-    i18n.load_path.append(os.path.join(script_path, "translations"))
-    i18n.set("filename_format", "{locale}.{format}")  # remove i18n namespace
-    import locale
-
-    cur_locale = locale.getlocale()[0][:2]
-    i18n.set("locale", cur_locale)
-
-    MyApp(filename).run()
+    MyApp(filename, cache=cache).run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,444 @@
+"""
+Weight and balance HTTP/JSON service
+
+Every aircraft of an index (or of a fleet database, see wnb_fleetdb.py) is
+loaded once at startup.
+
+$ python wnb/wnb_service.py --index data/index.yml --port 8080
+$ python wnb/wnb_service.py --fleet-db fleet.wnbdb --port 8080
+$ python wnb/wnb_service.py --index data/index.yml --reload  # hot reload of edited files
+
+GET  /aircrafts   list of aircrafts
+POST /cg          {"aircraft": "F-BUBK", "pilot": 80, "fuel": 60}
+POST /cg/batch    {"aircraft": "F-BUBK", "scenarios": [{"pilot": 80}, ...]}
+GET  /stats       stage timers and counters (see --profile), result cache statistics
+
+Loads missing from a scenario keep their default value. Results hold mass,
+moment, lever_arm, inside (centrogram) and margin. Batch scenarios which
+can't be evaluated (unknown aircraft, invalid value) get a result with an
+"error" message instead.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import click
+
+if __name__ == "__main__" and not __package__:
+    # run as a script: "wnb" must be the package, not wnb/wnb.py
+    sys.path[0] = os.path.dirname(sys.path[0])
+
+from wnb import (
+    Fleet,
+    FleetDatabase,
+    HistoryStore,
+    Reloader,
+    ResultCache,
+    evaluate_scenarios,
+    profiling,
+)
+from wnb.batch import _evaluate_chunk, _init_worker
+from wnb.reload import ALLOWED_WATCHERS, DEFAULT_DEBOUNCE, DEFAULT_INTERVAL
+
+ALLOWED_XAXIS = ["lever_arm", "moment"]
+
+# batches larger than this are computed in the executor
+EXECUTOR_THRESHOLD = 100
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+MAX_BODY_SIZE = 64 * 1024 * 1024
+# results of the last loadings kept per process (0: disabled)
+RESULT_CACHE_SIZE = 4096
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super(HTTPError, self).__init__(message)
+        self.status = status
+
+
+class LoadsheetService:
+    """Preloaded aircraft models and request handlers"""
+
+    def __init__(
+        self,
+        models,
+        workers=0,
+        executor_threshold=EXECUTOR_THRESHOLD,
+        result_cache_size=RESULT_CACHE_SIZE,
+        history=None,
+    ):
+        # models: {key: AircraftModel} or a FleetDatabase (mapped by workers)
+        worker_models = models
+        if isinstance(models, FleetDatabase):
+            models = models.models()
+        self.models = models
+        self.executor_threshold = executor_threshold
+        self.result_cache = ResultCache(result_cache_size) if result_cache_size else None
+        self.workers = workers
+        self.result_cache_size = result_cache_size
+        self.executor = self._make_executor(worker_models)
+        self.fleet = None
+        self.reloader = None
+        # HistoryStore loadsheets are appended to (None: not recorded)
+        self.history = history
+        self.routes = {
+            ("GET", "/aircrafts"): self.get_aircrafts,
+            ("POST", "/cg"): self.post_cg,
+            ("POST", "/cg/batch"): self.post_cg_batch,
+            ("GET", "/stats"): self.get_stats,
+        }
+
+    def _make_executor(self, models):
+        if not self.workers:
+            # default executor of the event loop (threads)
+            return None
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(models, None, "lever_arm", self.result_cache_size),
+        )
+
+    @staticmethod
+    def _fleet_models(fleet):
+        models = {}
+        for name in fleet.names:
+            if fleet.is_loaded(name):
+                model = fleet.model(name)
+                models[name] = models[model.immat] = model
+        return models
+
+    @classmethod
+    def from_index(cls, index, cache=None, **kwargs):
+        fleet = Fleet(index, cache=cache)
+        errors = fleet.load_all()
+        service = cls(cls._fleet_models(fleet), **kwargs)
+        service.fleet = fleet
+        service.errors = errors
+        return service
+
+    def watch(self, watcher="auto", debounce=DEFAULT_DEBOUNCE, interval=DEFAULT_INTERVAL):
+        """Hot-reload changed aircraft files (service created with `from_index`)"""
+        if self.fleet is None:
+            raise ValueError("only a service created from an index can be reloaded")
+        self.reloader = Reloader(
+            self.fleet,
+            watcher=watcher,
+            debounce=debounce,
+            interval=interval,
+            on_reload=self._on_reload,
+        )
+        return self.reloader.start()
+
+    def _on_reload(self, report):
+        # swapped, not updated: requests in progress keep the previous models
+        models = self._fleet_models(self.fleet)
+        self.models = models
+        self.errors = dict(self.fleet.errors, **report["errors"])
+        if self.executor is not None:
+            executor, self.executor = self.executor, self._make_executor(models)
+            executor.shutdown(wait=False)
+        for name, error in report["errors"].items():
+            print("%s: not reloaded: %s" % (name, error), file=sys.stderr)
+
+    @classmethod
+    def from_database(cls, filename, **kwargs):
+        service = cls(FleetDatabase(filename), **kwargs)
+        service.errors = {}
+        return service
+
+    def close(self):
+        if self.reloader is not None:
+            self.reloader.close()
+        if self.history is not None:
+            self.history.close()
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    async def handle(self, method, path, body=None):
+        """Route a request: return (status, JSON serializable response)"""
+        try:
+            path = path.split("?", 1)[0].rstrip("/") or "/"
+            try:
+                handler = self.routes[(method, path)]
+            except KeyError:
+                if any(route_path == path for _, route_path in self.routes):
+                    raise HTTPError(405, "method %s not allowed on %s" % (method, path))
+                raise HTTPError(404, "no route %s" % path)
+            if method == "POST":
+                try:
+                    body = json.loads(body or b"null")
+                except ValueError as error:
+                    raise HTTPError(400, "invalid JSON: %s" % error)
+            return 200, await handler(body)
+        except HTTPError as error:
+            return error.status, {"error": str(error)}
+        except (ValueError, TypeError, KeyError) as error:
+            return 400, {"error": str(error)}
+        except Exception as error:
+            # a bug must not drop the connection without a response
+            traceback.print_exc()
+            return 500, {"error": "%s: %s" % (type(error).__name__, error)}
+
+    async def get_aircrafts(self, body):
+        aircrafts = []
+        seen = set()
+        for model in self.models.values():
+            if model.immat in seen:
+                continue
+            seen.add(model.immat)
+            aircrafts.append(
+                {
+                    "immat": model.immat,
+                    "designation": model.designation,
+                    "loads": list(model.designations),
+                }
+            )
+        return {"aircrafts": aircrafts}
+
+    async def get_stats(self, body):
+        stats = {"enabled": profiling.is_enabled(), "stages": profiling.get_stats()}
+        if self.result_cache is not None:
+            # cache of the service process (workers have their own)
+            stats["result_cache"] = self.result_cache.stats()
+        return stats
+
+    def _check_xaxis(self, xaxis):
+        if xaxis not in ALLOWED_XAXIS:
+            raise HTTPError(
+                400, "unknown x-axis '%s' - not in %s" % (xaxis, ALLOWED_XAXIS)
+            )
+        return xaxis
+
+    async def post_cg(self, body):
+        if not isinstance(body, dict):
+            raise HTTPError(400, "a scenario object is expected")
+        xaxis = self._check_xaxis(body.get("xaxis", "lever_arm"))
+        models = self.models
+        results = evaluate_scenarios(
+            models, [body], xaxis=xaxis, result_cache=self.result_cache
+        )
+        if results[0].get("error"):
+            raise HTTPError(400, results[0]["error"])
+        await self._record(models, [body], results, None)
+        return results[0]
+
+    async def post_cg_batch(self, body):
+        if isinstance(body, list):
+            body = {"scenarios": body}
+        if not isinstance(body, dict) or not isinstance(body.get("scenarios"), list):
+            raise HTTPError(400, "a list of scenarios is expected")
+        scenarios = body["scenarios"]
+        aircraft = body.get("aircraft")
+        xaxis = self._check_xaxis(body.get("xaxis", "lever_arm"))
+        models = self.models
+        if len(scenarios) < self.executor_threshold:
+            results = evaluate_scenarios(
+                models,
+                scenarios,
+                aircraft=aircraft,
+                xaxis=xaxis,
+                result_cache=self.result_cache,
+            )
+        else:
+            loop = asyncio.get_running_loop()
+            executor = self.executor
+            if executor is None:
+                func = partial(
+                    evaluate_scenarios,
+                    models,
+                    scenarios,
+                    aircraft=aircraft,
+                    xaxis=xaxis,
+                    result_cache=self.result_cache,
+                )
+            else:
+                func = partial(_evaluate_chunk, scenarios, aircraft=aircraft, xaxis=xaxis)
+            results = await loop.run_in_executor(executor, func)
+        await self._record(models, scenarios, results, aircraft)
+        return {"results": results}
+
+    async def _record(self, models, scenarios, results, aircraft):
+        if self.history is None:
+            return
+        # SQLite insert and commit: disk I/O out of the event loop
+        await asyncio.get_running_loop().run_in_executor(
+            None,
+            partial(self.history.append_scenarios, models, scenarios, results, aircraft=aircraft),
+        )
+
+    async def handle_connection(self, reader, writer):
+        """Minimal HTTP/1.1 (keep-alive) connection handler"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "bad request line"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    # the end of the body is unknown: the connection can't be reused
+                    await self._respond(writer, 400, {"error": "bad Content-Length"}, False)
+                    break
+                if length > MAX_BODY_SIZE:
+                    await self._respond(writer, 413, {"error": "body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = (
+                    version == "HTTP/1.1"
+                    and headers.get("connection", "").lower() != "close"
+                )
+                status, response = await self.handle(method.upper(), path, body)
+                await self._respond(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, response, keep_alive):
+        payload = json.dumps(response).encode("utf-8")
+        head = (
+            "HTTP/1.1 %d %s\r\n"
+            "Content-Type: application/json\r\n"
+            "Content-Length: %d\r\n"
+            "Connection: %s\r\n\r\n"
+            % (
+                status,
+                HTTP_REASONS.get(status, ""),
+                len(payload),
+                "keep-alive" if keep_alive else "close",
+            )
+        )
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+    async def start(self, host="127.0.0.1", port=8080):
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+
+class ServiceClient:
+    """In-process client: calls the service handlers without any socket"""
+
+    def __init__(self, service):
+        self.service = service
+
+    async def get(self, path):
+        return await self.service.handle("GET", path)
+
+    async def post(self, path, data):
+        return await self.service.handle("POST", path, json.dumps(data).encode("utf-8"))
+
+
+@click.command()
+@click.option("--index", default="", help="aircrafts-index file")
+@click.option("--fleet-db", default="", help="Fleet database (instead of --index)")
+@click.option("--host", default="127.0.0.1")
+@click.option("--port", default=8080)
+@click.option("--workers", default=0, help="Worker processes for batches (0: threads)")
+@click.option(
+    "--cache-dir",
+    default="",
+    help="Directory of the compiled aircraft configs cache (disabled if empty)",
+)
+@click.option(
+    "--result-cache",
+    default=RESULT_CACHE_SIZE,
+    help="Results of the last loadings kept per process (0: disabled)",
+)
+@click.option(
+    "--reload/--no-reload",
+    default=False,
+    help="Reload changed aircraft files of the index without restart",
+)
+@click.option(
+    "--watcher",
+    default="auto",
+    help="File watcher of --reload - must be in %s" % ALLOWED_WATCHERS,
+)
+@click.option(
+    "--history",
+    default="",
+    help="Loadsheet history database computed loadsheets are appended to (disabled if empty)",
+)
+@click.option(
+    "--profile/--no-profile", default=False, help="Enable stage timers (GET /stats)"
+)
+def serve(
+    index,
+    fleet_db,
+    host,
+    port,
+    workers,
+    cache_dir,
+    result_cache,
+    reload,
+    watcher,
+    history,
+    profile,
+):
+    if profile:
+        profiling.enable()
+    if (index == "") == (fleet_db == ""):
+        raise click.UsageError("one of --index and --fleet-db is required")
+    if reload and fleet_db != "":
+        raise click.UsageError("--reload requires --index")
+    store = HistoryStore(history) if history != "" else None
+    if fleet_db != "":
+        service = LoadsheetService.from_database(
+            fleet_db, workers=workers, result_cache_size=result_cache, history=store
+        )
+    else:
+        cache = cache_dir if cache_dir != "" else None
+        service = LoadsheetService.from_index(
+            index, cache=cache, workers=workers, result_cache_size=result_cache, history=store
+        )
+    for name, error in service.errors.items():
+        print("%s: %s" % (name, error), file=sys.stderr)
+    if reload:
+        service.watch(watcher=watcher)
+
+    async def run():
+        server = await service.start(host, port)
+        immats = set(model.immat for model in service.models.values())
+        print("Serving %d aircrafts on http://%s:%d" % (len(immats), host, port))
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    serve()
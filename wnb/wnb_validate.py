@@ -0,0 +1,72 @@
+"""
+Validate weight and balance data files
+
+Every issue of every file is reported (exit status 1 if any).
+
+$ python wnb/wnb_validate.py --index data/index.yml
+$ python wnb/wnb_validate.py data/f-bubk.yml data/f-hppl.yml --format json
+"""
+
+import json
+import os
+import sys
+
+import click
+
+ALLOWED_REPORT_FORMATS = ["text", "json"]
+
+if __name__ == "__main__" and not __package__:
+    # run as a script: "wnb" must be the package, not wnb/wnb.py
+    sys.path[0] = os.path.dirname(sys.path[0])
+
+from wnb.validate import FleetReport, validate_files, validate_index
+
+
+def print_report(report, file=sys.stdout):
+    for issue in report.issues:
+        print("%s: %s: %s" % (report.index, issue.path or "-", issue.message), file=file)
+    for file_report in report.files:
+        for issue in file_report.issues:
+            print(
+                "%s: %s: %s" % (file_report.filename, issue.path or "-", issue.message),
+                file=file,
+            )
+    invalid = sum(not file_report.valid for file_report in report.files)
+    print(
+        "%d files checked, %d invalid, %d index issues"
+        % (len(report.files), invalid, len(report.issues)),
+        file=file,
+    )
+
+
+@click.command()
+@click.argument("files", nargs=-1)
+@click.option("--index", default="", help="aircrafts-index file (checks all its files)")
+@click.option("--workers", default=None, type=int, help="Worker processes (default: CPUs)")
+@click.option(
+    "--format",
+    "report_format",
+    default="text",
+    help="Report format - must be in %s" % ALLOWED_REPORT_FORMATS,
+)
+def validate(files, index, workers, report_format):
+    if report_format not in ALLOWED_REPORT_FORMATS:
+        raise NotImplementedError(
+            "unknown report format '%s' - not in %s" % (report_format, ALLOWED_REPORT_FORMATS)
+        )
+    if index != "":
+        report = validate_index(index, workers=workers)
+        report.files.extend(validate_files(list(files), workers=workers))
+    elif files:
+        report = FleetReport(None, [], validate_files(list(files), workers=workers))
+    else:
+        raise click.UsageError("give aircraft files and/or --index")
+    if report_format == "json":
+        print(json.dumps(report.to_dict(), indent=2))
+    else:
+        print_report(report)
+    sys.exit(0 if report.valid else 1)
+
+
+if __name__ == "__main__":
+    validate()